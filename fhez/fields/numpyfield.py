@@ -2,29 +2,80 @@
 # @Author: George Onoufriou <archer>
 # @Date:   2021-08-20T16:38:06+01:00
 # @Last modified by:   archer
-# @Last modified time: 2021-09-09T14:24:33+01:00
+# @Last modified time: 2021-11-01T10:21:47+00:00
 
+import bz2
+import lzma
+import zlib
+import base64
 import numpy as np
 import marshmallow as mar
 
+# compressors of binary encoded arrays by name
+compressors = {"zlib": zlib, "bz2": bz2, "lzma": lzma}
+
 
 class NumpyField(mar.fields.Field):
-    """Marshmallow field to serialise and deserialise numpy data."""
+    """Marshmallow field to serialise and deserialise numpy data.
+
+    Arrays are serialised as a list of numbers by default, or as their raw
+    little endian bytes with the "bytes" encoding, or those bytes as a base64
+    string, which unlike raw bytes can be dumped to json, with the "base64"
+    encoding. Binary encodings keep the exact dtype and values of the array,
+    may be compressed, and are decoded straight into a numpy buffer rather
+    than through a python object per element. Any encoding is deserialised
+    regardless of the encoding of the field.
+    """
+
+    encodings = ("list", "bytes", "base64")
+
+    def __init__(self, *args, encoding: str = None, compression: str = None,
+                 **kwargs):
+        """Initialise field with encoding and compression of arrays.
+
+        :arg encoding: one of :attr:`encodings`, default "list"
+        :type encoding: str
+        :arg compression: name of a :data:`compressors` to compress binary
+            encodings with, default none
+        :type compression: str
+        """
+        super().__init__(*args, **kwargs)
+        self.encoding = encoding if encoding is not None else "list"
+        if self.encoding not in self.encodings:
+            raise ValueError("encoding {} is not one of {}".format(
+                self.encoding, self.encodings))
+        if compression is not None and compression not in compressors:
+            raise ValueError("compression {} is not one of {}".format(
+                compression, tuple(compressors)))
+        if compression is not None and self.encoding == "list":
+            raise ValueError("cannot compress list encoded arrays")
+        self.compression = compression
 
     @property
     def schema(self):
-        """Get numpy field marshamllow schema."""
-        schema = {
-            "dtype": mar.fields.Str(),
-            "dshape": mar.fields.List(mar.fields.Int()),
-            "data": mar.fields.List(mar.fields.Float())
-        }
-        return mar.Schema.from_dict(schema)
+        """Get numpy field marshamllow schema, built once for all fields."""
+        if NumpyField.__dict__.get("_schema") is None:
+            schema = {
+                "dtype": mar.fields.Str(),
+                "dshape": mar.fields.List(mar.fields.Int()),
+                "data": mar.fields.List(mar.fields.Float())
+            }
+            NumpyField._schema = mar.Schema.from_dict(schema)
+        return NumpyField._schema
+
+    @property
+    def serialiser(self):
+        """Get instance of numpy field schema shared by all fields."""
+        if NumpyField.__dict__.get("_serialiser") is None:
+            NumpyField._serialiser = self.schema()
+        return NumpyField._serialiser
 
     def _serialize(self, value, attr, obj, **kwargs):
-        """Use marshmallow to serialise numpy as list of numbers."""
+        """Use marshmallow to serialise numpy as list of numbers or bytes."""
         if value is None:
             return None
+        if self.encoding != "list":
+            return self._serialize_binary(value)
 
         # define and set the to be stored data
         store = {
@@ -33,18 +84,58 @@ class NumpyField(mar.fields.Field):
             "data": value.flatten().tolist()
         }
         # now used marshmallow existing handler desired
-        serialised = self.schema().dump(store)
+        serialised = self.serialiser.dump(store)
         return serialised
 
+    def _serialize_binary(self, value):
+        """Serialise numpy as its raw little endian bytes."""
+        value = np.asarray(value)
+        if value.dtype.hasobject:
+            raise mar.ValidationError(
+                "cannot binary encode {} arrays".format(value.dtype))
+        dtype = value.dtype.newbyteorder("<")
+        data = np.ascontiguousarray(value, dtype=dtype).tobytes()
+        if self.compression is not None:
+            data = compressors[self.compression].compress(data)
+        if self.encoding == "base64":
+            data = base64.b64encode(data).decode("ascii")
+        return {
+            "dtype": dtype.str,
+            "dshape": list(value.shape),
+            "encoding": self.encoding,
+            "compression": self.compression,
+            "bytes": data,
+        }
+
     def _deserialize(self, value, attr, data, **kwargs):
-        """Use marshmallow to deserialise list of numbers back to numpy."""
+        """Use marshmallow to deserialise numbers or bytes back to numpy."""
         if value is None:
             return None
+        if "bytes" in value:
+            return self._deserialize_binary(value)
 
         # schema = mar.Schema.from_dict(NumpyField.schema)
-        deserial = self.schema().load(value)
+        deserial = self.serialiser.load(value)
         # deserial = value
 
         return np.array(deserial["data"],
                         dtype=np.dtype(deserial["dtype"])
                         ).reshape(tuple(deserial["dshape"]))
+
+    def _deserialize_binary(self, value):
+        """Deserialise raw little endian bytes back to numpy."""
+        try:
+            data = value["bytes"]
+            if value.get("encoding") == "base64":
+                data = base64.b64decode(data)
+            if value.get("compression") is not None:
+                data = compressors[value["compression"]].decompress(data)
+            dtype = np.dtype(value["dtype"])
+            shape = tuple(value["dshape"])
+        except (KeyError, TypeError, ValueError, OSError, zlib.error,
+                lzma.LZMAError) as e:
+            raise mar.ValidationError(
+                "invalid binary numpy data: {}".format(e))
+        # frombuffer of immutable bytes is read only, so own a copy instead
+        array = np.frombuffer(bytearray(data), dtype=dtype).reshape(shape)
+        return array.astype(dtype.newbyteorder("="), copy=False)
@@ -116,3 +116,39 @@ class NumpyFieldTest(unittest.TestCase):
         # check type is as original/ expected
         # self.assertTrue(np.issubdtype(sample["data"].dtype, np.integer))
         self.assertEqual(sample["data"].dtype, sample["data"].dtype)
+
+    def test_serialDeserialBinary(self):
+        """Check binary encodings round trip dtype, shape, and values."""
+        arrays = [self.data, self.data.astype(np.float32),
+                  (self.data * 100).astype(np.int16),
+                  self.data.astype(">f8"), self.data[:, ::2].T]
+        for (encoding, compression) in [("bytes", None), ("base64", None),
+                                        ("base64", "zlib"), ("bytes", "lzma")]:
+            field = NumpyField(encoding=encoding, compression=compression)
+            schema = mar.Schema.from_dict({"data": field})
+            for data in arrays:
+                out = schema().dump({"data": data})
+                self.assertNotIn("data", out["data"])
+                if encoding == "base64":
+                    out = schema().loads(schema().dumps({"data": data}))
+                    deserial = out
+                else:
+                    deserial = schema().load(out)
+                np.testing.assert_array_equal(deserial["data"], data)
+                self.assertEqual(deserial["data"].dtype,
+                                 data.dtype.newbyteorder("="))
+                self.assertTrue(deserial["data"].flags.writeable)
+        # list encoded data loads whatever the encoding of the field
+        listed = mar.Schema.from_dict({"data": NumpyField()})().dump(
+            {"data": arrays[0]})
+        deserial = mar.Schema.from_dict(
+            {"data": NumpyField(encoding="base64")})().load(listed)
+        np.testing.assert_array_equal(deserial["data"], arrays[0])
+        with self.assertRaises(ValueError):
+            NumpyField(encoding="hex")
+        with self.assertRaises(ValueError):
+            NumpyField(compression="zlib")
+        with self.assertRaises(mar.ValidationError):
+            schema().load({"data": {"dtype": "<f8", "dshape": [2],
+                                    "encoding": "base64", "compression": None,
+                                    "bytes": "not base64"}})
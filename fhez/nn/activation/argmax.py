@@ -28,6 +28,14 @@ class Argmax(Node):
         # is simply just the forward gradient
         return gradient
 
+    def forwards(self, xs):
+        """Calculate the argmax of a batch of examples along the last axis."""
+        return np.eye(np.shape(xs)[-1])[np.argmax(xs, axis=-1)]
+
+    def backwards(self, gradients):
+        """Pass gradients of a batch of examples back unmodified."""
+        return gradients
+
     @property
     def cost(self):
         """Get computational cost of this activation."""
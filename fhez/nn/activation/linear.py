@@ -63,7 +63,7 @@ class Linear(Node, Serialise):
 
     @m.setter
     def m(self, m):
-        self._m = np.array(m)
+        self._m = np.asarray(m)
 
     @property
     def c(self):
@@ -75,7 +75,7 @@ class Linear(Node, Serialise):
 
     @c.setter
     def c(self, c):
-        self._c = np.array(c)
+        self._c = np.asarray(c)
 
     def forward(self, x):
         """Get linear forward propogation."""
@@ -99,13 +99,18 @@ class Linear(Node, Serialise):
         # return the gradient with respect to input for immediate use
         return dfdx
 
+    @property
+    def parameter_names(self):
+        """Get names of trainable parameters."""
+        return ["m", "c"]
+
     def update(self):
         """Update any weights and biases for a single example."""
-        self.updater(parm_names=["m", "c"], it=1)
+        self.updater(parm_names=self.parameter_names, it=1)
 
     def updates(self):
         """Update any weights and biases based on an avg of all examples."""
-        self.updater(parm_names=["m", "c"])
+        self.updater(parm_names=self.parameter_names)
 
     @property
     def cost(self):
@@ -74,6 +74,20 @@ class RELU(Node):
         self.gradients.append({"dfdq": dfdq, "dfdx": dfdx})
         return dfdx
 
+    def forwards(self, xs):
+        """Calculate forward pass for a batch of examples simultaneously."""
+        # element wise so the batch is just one larger input
+        return self.forward(xs)
+
+    def backwards(self, gradients):
+        """Calculate backward pass for a batch, averaging its gradients."""
+        x = np.array(self.inputs.pop())
+        dfdx = self.local_dfdx(x, self.q) * gradients
+        dfdq = self.local_dfdq(x, self.q) * gradients
+        self.gradients.append({"dfdq": np.mean(dfdq, axis=0),
+                               "dfdx": np.mean(dfdx, axis=0)})
+        return dfdx
+
     def local_dfdx(self, x, q):
         """Calculate local derivative dfdx."""
         zeroth = 0.5
@@ -87,10 +101,15 @@ class RELU(Node):
         second = (4 * (x**2))/(3 * np.pi * (q**2))
         return zeroth - second
 
+    @property
+    def parameter_names(self):
+        """Get names of trainable parameters."""
+        return ["q"]
+
     def update(self):
         """Update node state/ weights for a single example."""
-        self.updater(parm_names=["q"], it=1)
+        self.updater(parm_names=self.parameter_names, it=1)
 
     def updates(self):
         """Update node state/ weights for multiple examples simultaneously."""
-        self.updater(parm_names=["q"])
+        self.updater(parm_names=self.parameter_names)
@@ -49,6 +49,23 @@ class Softmax(Node):
             dfdx += t
         return dfdx  # gradient with respect to all inputs
 
+    def forwards(self, xs):
+        """Calculate the soft maximum of a batch of examples over last axis."""
+        expo = np.exp(np.add(xs, 1e-8))
+        out = expo/np.sum(expo, axis=-1, keepdims=True)
+        self.inputs.append(out)  # NOTE appending x_softmaxed not x
+        return out
+
+    def backwards(self, gradients):
+        r"""Calculate the soft maximum derivative of a batch of examples.
+
+        Equivalent to :meth:`backward` for each example, as
+        :math:`\hat{p(y_i)}(g_i - \sum_{c}\hat{p(y_c)}g_c)`.
+        """
+        x = np.array(self.inputs.pop())
+        gradients = np.array(gradients)
+        return x * (gradients - np.sum(x * gradients, axis=-1, keepdims=True))
+
     @property
     def cost(self):
         """Get computational cost of this activation."""
@@ -42,6 +42,21 @@ class SoftmaxTest(unittest.TestCase):
         np.testing.assert_array_almost_equal(grad, grad_truth,
                                              decimal=3, verbose=True)
 
+    def test_batch(self):
+        """Check batched softmax matches each example individually."""
+        xs = np.random.rand(4, 3)
+        gradients = np.random.rand(4, 3)
+        softmax = Softmax()
+        py_hat = softmax.forwards(xs)
+        grads = softmax.backwards(gradients)
+        for i in range(len(xs)):
+            np.testing.assert_array_almost_equal(py_hat[i],
+                                                 softmax.forward(xs[i]),
+                                                 decimal=6, verbose=True)
+            np.testing.assert_array_almost_equal(
+                grads[i], softmax.backward(gradient=gradients[i]),
+                decimal=6, verbose=True)
+
     def test_forward(self):
         """Test softmax forward pass with known values."""
         a = [1.42, -0.4, 0.23]
@@ -26,6 +26,14 @@ class IO(Node, Serialise):
         """Pass gradient directly to output."""
         return gradient
 
+    def forwards(self, xs):
+        """Pass batch of inputs directly to output."""
+        return xs
+
+    def backwards(self, gradients):
+        """Pass batch of gradients directly to output."""
+        return gradients
+
     def update(self):
         """Do nothing."""
 
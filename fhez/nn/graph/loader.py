@@ -0,0 +1,181 @@
+"""Prefetching loader of inputs, reading and encrypting ahead of firing."""
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-31T09:47:15+00:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-31T09:47:15+00:00
+
+import queue
+import itertools
+import threading
+from collections import namedtuple
+import numpy as np
+
+# signals of one stimulation, to pass to Firing.stimulate, with fired the
+# activations of any neurons already encrypted, and size how many examples
+Batch = namedtuple("Batch", ["neurons", "signals", "fired", "size"])
+
+_END = object()
+
+
+def _open(source):
+    """Get .npy file at path memory mapped, else source unchanged."""
+    if isinstance(source, str):
+        return np.load(source, mmap_mode="r")
+    return source
+
+
+def _is_chunked(source):
+    """Get if source is a sequence of paths to .npy chunk files."""
+    return isinstance(source, (list, tuple)) and len(source) > 0 and all(
+        isinstance(path, str) for path in source)
+
+
+def _read(source, batch_size=None):
+    """Yield examples of source, or arrays of batch_size many examples.
+
+    Memory mapped arrays are only read from disk here, as each example or
+    batch is copied out of them.
+    """
+    source = _open(source)
+    if isinstance(source, np.ndarray):
+        if batch_size is not None:
+            for i in range(0, len(source), batch_size):
+                yield np.array(source[i:i+batch_size])
+            return
+        for i in range(len(source)):
+            example = source[i]
+            yield np.array(example) if isinstance(
+                example, np.memmap) else example
+        return
+    if _is_chunked(source):
+        # each chunk is only opened once the previous one is exhausted
+        examples = itertools.chain.from_iterable(
+            _read(path) for path in source)
+    else:
+        examples = iter(source)
+    if batch_size is None:
+        yield from examples
+        return
+    for batch in iter(lambda: list(itertools.islice(examples, batch_size)),
+                      []):
+        yield np.asarray(batch)
+
+
+class Loader(object):
+    """Lazily read, and encrypt, batches of inputs in a background thread.
+
+    Inputs may be arrays, memory mapped arrays, paths to .npy files which are
+    memory mapped, lists of paths to .npy files of consecutive chunks of
+    examples, or any other iterable of examples. A background thread reads
+    up to prefetch examples, or batches, ahead of the one being fired, so
+    reading from disk overlaps with firing the graph.
+
+    Neurons named in encrypt are fired ahead of time in the same thread,
+    such as a :class:`fhez.nn.operations.rotate.Rotate` input encrypting its
+    examples, so encryption also overlaps with firing the rest of the graph.
+    Their activations are given to the graph as fired, so they are not fired
+    twice. These nodes are fired from another thread than the rest of the
+    graph, so should not depend on the state left by their own backward.
+    """
+
+    def __init__(self, inputs: dict, batch_size: int = None,
+                 prefetch: int = None, graph=None, encrypt: list = None):
+        """Initialise loader of inputs.
+
+        :arg inputs: dictionary of input neuron names to their examples
+        :type inputs: dict
+        :arg batch_size: if given load batches of this many examples, for the
+            vectorised "forwards" of nodes, else one example at a time
+        :type batch_size: int
+        :arg prefetch: maximum number of loaded batches waiting to be fired
+        :type prefetch: int
+        :arg graph: graph whose input neurons named in encrypt to fire
+        :type graph: networkx.MultiDiGraph
+        :arg encrypt: names of input neurons to fire ahead of time
+        :type encrypt: list(str)
+        """
+        self.inputs = inputs
+        self.batch_size = batch_size
+        self.prefetch = prefetch if prefetch is not None else 2
+        if self.prefetch < 1:
+            raise ValueError("prefetch {} is less than 1".format(
+                self.prefetch))
+        self.graph = graph
+        self.encrypt = encrypt if encrypt is not None else []
+        if len(self.encrypt) > 0 and graph is None:
+            raise ValueError("cannot encrypt {} without a graph".format(
+                self.encrypt))
+
+    @property
+    def receptor(self):
+        """Get name of receptor loaded signals are for."""
+        return "forwards" if self.batch_size is not None else "forward"
+
+    def __len__(self):
+        """Get number of examples, if the first input has a length."""
+        source = _open(next(iter(self.inputs.values())))
+        if _is_chunked(source):
+            return sum(len(_open(path)) for path in source)
+        return len(source)
+
+    def __iter__(self):
+        """Yield each :class:`Batch` as soon as it has been loaded."""
+        loaded = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._load, args=(loaded, stop),
+                                  daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = loaded.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # release the loader if abandoned while it waits for room
+            stop.set()
+            while thread.is_alive():
+                try:
+                    loaded.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            thread.join()
+
+    def _load(self, loaded, stop):
+        """Read and encrypt each batch onto loaded until done or stopped."""
+        try:
+            neurons = list(self.inputs.keys())
+            columns = [_read(source, self.batch_size)
+                       for source in self.inputs.values()]
+            for signals in itertools.zip_longest(*columns):
+                if stop.is_set():
+                    return
+                fired = {}
+                for name in self.encrypt:
+                    node = self.graph.nodes[name]["node"]
+                    fired[name] = getattr(node, self.receptor)(
+                        signals[neurons.index(name)])
+                batch = Batch(
+                    neurons=[n for n in neurons if n not in fired],
+                    signals=[s for (n, s) in zip(neurons, signals)
+                             if n not in fired],
+                    fired=fired,
+                    size=len(signals[0]) if self.batch_size is not None
+                    else 1)
+                if not self._put(loaded, batch, stop):
+                    return
+            self._put(loaded, _END, stop)
+        except Exception as e:
+            self._put(loaded, e, stop)
+
+    def _put(self, loaded, item, stop):
+        """Put item on loaded once there is room, False if stopped first."""
+        while not stop.is_set():
+            try:
+                loaded.put(item, timeout=0.01)
+                return True
+            except queue.Full:
+                pass
+        return False
@@ -0,0 +1,113 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-31T09:47:15+00:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-31T09:47:15+00:00
+
+import os
+import copy
+import time
+import tempfile
+import threading
+import unittest
+import numpy as np
+
+from fhez.nn.graph.loader import Loader
+from fhez.nn.graph.utils import train, infer
+from fhez.nn.graph.prefab import cnn_classifier
+
+
+class LoaderTest(unittest.TestCase):
+    """Test prefetching loader of inputs."""
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.start_time = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.start_time
+        print('%s: %.3f' % (self.id(), t))
+
+    @property
+    def data_shape(self):
+        """Define desired data shape."""
+        return (28, 28)
+
+    def test_sources(self):
+        """Check memory mapped, chunked, and iterable inputs load the same."""
+        x = np.random.rand(7, *self.data_shape)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "x.npy")
+            np.save(path, x)
+            chunks = []
+            for (i, chunk) in enumerate(np.array_split(x, 3)):
+                chunks.append(os.path.join(directory, "x-{}.npy".format(i)))
+                np.save(chunks[-1], chunk)
+            for source in [x, path, chunks, iter(list(x))]:
+                loader = Loader({"x": source, "y": range(7)}, batch_size=3)
+                batches = list(loader)
+                self.assertEqual([b.size for b in batches], [3, 3, 1])
+                np.testing.assert_array_equal(
+                    np.concatenate([b.signals[0] for b in batches]), x)
+                np.testing.assert_array_equal(batches[-1].signals[1], [6])
+                self.assertEqual(batches[0].neurons, ["x", "y"])
+            self.assertEqual(len(Loader({"x": chunks})), 7)
+            examples = list(Loader({"x": path}))
+            self.assertEqual(len(examples), 7)
+            self.assertNotIsInstance(examples[0].signals[0], np.memmap)
+
+    def test_prefetch(self):
+        """Check loading stays at most prefetch batches ahead, and stops."""
+        drawn = []
+
+        def examples():
+            for i in range(100):
+                drawn.append(i)
+                yield i
+
+        threads = threading.active_count()
+        loader = Loader({"x": examples()}, prefetch=2)
+        for batch in loader:
+            time.sleep(0.05)
+            # the one being fired, two waiting, and one waiting for room
+            self.assertLessEqual(len(drawn), batch.signals[0] + 4)
+            if batch.signals[0] == 3:
+                break
+        self.assertLessEqual(len(drawn), 8)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_error(self):
+        """Check errors while loading are raised by the consumer."""
+        def examples():
+            yield 1
+            raise KeyError("unreadable")
+
+        with self.assertRaises(KeyError):
+            list(Loader({"x": examples()}))
+
+    def test_encrypt(self):
+        """Check training and inferring with inputs encrypted ahead of time."""
+        graph = cnn_classifier(10, dense=True)
+        loaded = copy.deepcopy(graph)
+        inputs = {
+            "x": np.random.rand(6, *self.data_shape),
+            "y": np.array([1, 2, 3, 4, 5, 6])
+        }
+        train(graph=graph, inputs=inputs, batch_size=3, batched=True)
+        loader = Loader(inputs, batch_size=3, graph=loaded, encrypt=["x"])
+        batch = next(iter(loader))
+        self.assertEqual(list(batch.fired.keys()), ["x"])
+        self.assertEqual(batch.neurons, ["y"])
+        train(graph=loaded, inputs=loader, batch_size=3)
+        for name in ["CC-products", "Dense"]:
+            np.testing.assert_array_almost_equal(
+                loaded.nodes[name]["node"].weights,
+                graph.nodes[name]["node"].weights,
+                decimal=6,
+                verbose=True)
+        truth = infer(graph=graph, inputs=inputs)
+        out = infer(graph=loaded, inputs=Loader(
+            inputs, graph=loaded, encrypt=["x"]))
+        np.testing.assert_array_almost_equal(out["y_hat"], truth["y_hat"],
+                                             decimal=4,
+                                             verbose=True)
@@ -6,9 +6,56 @@
 
 import abc
 from collections import deque
+import numpy as np
 from fhez.nn.optimiser.optimiser import DefaultOptimiser
 
 
+class Accumulator(object):
+    """Running sum and count of each named gradient, in place of a stack.
+
+    Appending a dictionary of gradients adds each to its sum, so memory is
+    constant however many examples are accumulated, and popping gets the
+    average of each gradient over everything appended since the last pop.
+    """
+
+    def __init__(self):
+        """Initialise empty sums and counts."""
+        self.sums = {}
+        self.counts = {}
+
+    def append(self, gradients: dict):
+        """Add each gradient in dictionary to its running sum."""
+        for key, value in gradients.items():
+            total = self.sums.get(key)
+            if total is None:
+                # copy so in place sums never modify a callers array
+                total = np.array(value, dtype=np.result_type(value, 0.0)) \
+                    if isinstance(value, np.ndarray) else value
+            elif isinstance(total, np.ndarray) and \
+                    np.shape(total) == np.shape(value):
+                np.add(total, value, out=total)
+            else:
+                total = total + value
+            self.sums[key] = total
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def pop(self):
+        """Get average of each gradient and reset."""
+        averages = {key: value / self.counts[key]
+                    for key, value in self.sums.items()}
+        self.clear()
+        return averages
+
+    def clear(self):
+        """Forget all accumulated gradients."""
+        self.sums = {}
+        self.counts = {}
+
+    def __len__(self):
+        """Get number of gradients accumulated."""
+        return max(self.counts.values(), default=0)
+
+
 class Node(abc.ABC):
     """Abstract class for neural network nodes for traversal/ computation."""
 
@@ -37,6 +84,27 @@ class Node(abc.ABC):
         """Disable caching."""
         self.is_cache_enabled = False
 
+    @property
+    def is_accumulating(self):
+        """Get whether gradients are accumulated as running sums."""
+        if self.__dict__.get("_is_accumulating") is None:
+            # stack of every gradient by default
+            self._is_accumulating = False
+        return self._is_accumulating
+
+    @is_accumulating.setter
+    def is_accumulating(self, state: bool):
+        """Set whether to accumulate gradients as running sums."""
+        self._is_accumulating = state
+
+    def enable_accumulator(self):
+        """Accumulate gradients as running sums, see :class:`Accumulator`."""
+        self.is_accumulating = True
+
+    def disable_accumulator(self):
+        """Stack every gradient until updated."""
+        self.is_accumulating = False
+
     @property
     def cache(self):
         """Get caching dictionary of auxilary data."""
@@ -97,15 +165,28 @@ class Node(abc.ABC):
         or multiple gradients if implementing batch normalised gradient
         descent. This is a helper method that initialises a stack so that
         implementation can be offloaded and made-uniform between all subclasses
+
+        If accumulating this is instead an :class:`Accumulator` of the sum of
+        gradients, so memory does not grow with the batch size.
         """
-        if self.cache.get("_gradients") is None:
-            self.cache["_gradients"] = deque()
+        stack = Accumulator if self.is_accumulating else deque
+        if not isinstance(self.cache.get("_gradients"), stack):
+            self.cache["_gradients"] = stack()
         if self.is_cache_enabled:
             # if cache enabled return real stack
             return self.cache["_gradients"]
         # if cache disabled return dud que
         return deque()
 
+    @property
+    def parameter_names(self):
+        """Get names of trainable parameters, each with a dfd<name> gradient.
+
+        :return: list of attribute names of parameters, empty by default
+        :rtype: list(str)
+        """
+        return []
+
     @property
     def optimiser(self):
         """Get optimiser object, E.G Stocastic Gradient Descent."""
@@ -125,6 +206,29 @@ class Node(abc.ABC):
         a parameter dictionary. It will then infer from the dictionary the
         attributes with which to modify.
         """
+        gradients = self.average_gradients(it=it)
+
+        # get data based on name thanks to the magic of getattr
+        parameters = {}
+        for i in parm_names:
+            parameters[i] = getattr(self, i)
+        # call optimiser to calculate probably better weights
+        update = self.optimiser.optimise(parms=parameters, grads=gradients)
+        # use update dictionary to grab the new weights and set what we want
+        for key, value in update.items():
+            setattr(self, key, value)
+
+    def average_gradients(self, it=None):
+        """Pop it, or all, gradients and get the average of each.
+
+        :arg it: number of most recent gradients to average, ignored if
+            accumulating as every gradient is already summed
+        :type it: int
+        :return: dictionary of gradient names to their averages
+        :rtype: dict
+        """
+        if isinstance(self.gradients, Accumulator):
+            return self.gradients.pop()
         it = it if it is not None else len(self.gradients)
         # we store our gradients with names, this is because we want to be
         # able to identify, hold, or modify individual gradients easier
@@ -152,19 +256,7 @@ class Node(abc.ABC):
         avg_gradients = {}
         for key, value in batch_sums.items():
             avg_gradients[key] = value / grad_count[key]
-        # here only for compatibility but still wanted to be explicit they are
-        # averages
-        gradients = avg_gradients
-
-        # get data based on name thanks to the magic of getattr
-        parameters = {}
-        for i in parm_names:
-            parameters[i] = getattr(self, i)
-        # call optimiser to calculate probably better weights
-        update = self.optimiser.optimise(parms=parameters, grads=gradients)
-        # use update dictionary to grab the new weights and set what we want
-        for key, value in update.items():
-            setattr(self, key, value)
+        return avg_gradients
 
     # # # Abstract Methods
     # These abstract methods are intended to notify node implementers of any
@@ -188,8 +280,10 @@ class Node(abc.ABC):
     def backwards(self, gradients):
         """Calculate backward pass for multiple examples simultaneously."""
         accumulator = []
-        for i in gradients:
+        # inputs are popped FILO so gradients must be too to match examples
+        for i in reversed(gradients):
             accumulator.append(self.backward(gradient=i))
+        accumulator.reverse()
         return accumulator
 
     @abc.abstractmethod
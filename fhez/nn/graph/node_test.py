@@ -0,0 +1,104 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-29T09:15:37+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-29T09:15:37+01:00
+
+import copy
+import time
+import unittest
+import numpy as np
+
+from fhez.nn.graph.node import Accumulator
+from fhez.nn.graph.utils import train
+from fhez.nn.graph.prefab import cnn_classifier
+from fhez.nn.layer.dense import Dense
+
+
+class NodeTest(unittest.TestCase):
+    """Test node abstraction gradient handling."""
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.start_time = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.start_time
+        print('%s: %.3f' % (self.id(), t))
+
+    def test_accumulator(self):
+        """Check accumulator averages like gradients without keeping them."""
+        acc = Accumulator()
+        first = np.array([1, 2])
+        acc.append({"a": first, "b": 1.0})
+        acc.append({"a": np.array([3, 4])})
+        acc.append({"a": np.array([5, 6]), "b": 3.0})
+        self.assertEqual(len(acc), 3)
+        # callers arrays are never summed into
+        np.testing.assert_array_equal(first, [1, 2])
+        averages = acc.pop()
+        np.testing.assert_array_almost_equal(averages["a"], [3, 4])
+        self.assertEqual(averages["b"], 2.0)
+        self.assertEqual(len(acc), 0)
+        self.assertEqual(acc.pop(), {})
+
+    def test_updates(self):
+        """Check accumulated updates match updates of stacked gradients."""
+        stacked = Dense(weights=(4, 3))
+        accumulated = copy.deepcopy(stacked)
+        accumulated.enable_accumulator()
+        for node in [stacked, accumulated]:
+            for _ in range(5):
+                node.forward(np.random.rand(4))
+                node.backward(np.random.rand(3))
+        self.assertEqual(len(accumulated.gradients), 5)
+        self.assertEqual(len(accumulated.gradients.sums), 3)
+        np.random.seed(0)
+        xs = np.random.rand(5, 4)
+        gs = np.random.rand(5, 3)
+        for node in [stacked, accumulated]:
+            node.gradients.clear()
+            for (x, g) in zip(xs, gs):
+                node.forward(x)
+                node.backward(g)
+            node.updates()
+        np.testing.assert_array_almost_equal(accumulated.weights,
+                                             stacked.weights,
+                                             decimal=6,
+                                             verbose=True)
+        np.testing.assert_array_almost_equal(accumulated.bias,
+                                             stacked.bias,
+                                             decimal=6,
+                                             verbose=True)
+
+    def test_train(self):
+        """Check training with accumulated gradients matches stacked."""
+        graph = cnn_classifier(10, dense=True)
+        accumulated = copy.deepcopy(graph)
+        inputs = {
+            "x": np.random.rand(6, 28, 28),
+            "y": np.array([1, 2, 3, 4, 5, 6])
+        }
+        train(graph=graph, inputs=inputs, batch_size=3)
+        train(graph=accumulated, inputs=inputs, batch_size=3,
+              accumulate=True)
+        for name in ["CC-products", "Dense"]:
+            node = accumulated.nodes[name]["node"]
+            # train only accumulates for as long as it is training
+            self.assertFalse(node.is_accumulating)
+            np.testing.assert_array_almost_equal(
+                node.weights, graph.nodes[name]["node"].weights,
+                decimal=6,
+                verbose=True)
+
+    def test_train_enabled(self):
+        """Check train leaves accumulators it did not enable switched on."""
+        graph = cnn_classifier(10, dense=True)
+        graph.nodes["Dense"]["node"].enable_accumulator()
+        inputs = {
+            "x": np.random.rand(2, 28, 28),
+            "y": np.array([1, 2])
+        }
+        train(graph=graph, inputs=inputs, batch_size=2, accumulate=True)
+        self.assertTrue(graph.nodes["Dense"]["node"].is_accumulating)
+        self.assertFalse(graph.nodes["CC-products"]["node"].is_accumulating)
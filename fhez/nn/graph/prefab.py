@@ -12,6 +12,7 @@ from fhez.nn.graph.io import IO
 from fhez.nn.operations.sum import Sum
 from fhez.nn.operations.cc import CC  # Cross Correlation
 from fhez.nn.layer.ann import ANN  # Dense/ Artificial Neural Network
+from fhez.nn.layer.dense import Dense  # multi-output Dense
 from fhez.nn.activation.relu import RELU  # Rectified Linear Unit (approx)
 
 from fhez.nn.activation.softmax import Softmax
@@ -23,6 +24,7 @@ from fhez.nn.loss.mse import MSE  # Mean of the Squared Error
 from fhez.nn.operations.encrypt import Encrypt
 from fhez.nn.operations.decrypt import Decrypt
 from fhez.nn.operations.rotate import Rotate
+from fhez.nn.operations.pack import Pack
 
 from fhez.nn.operations.selector import Selector
 from fhez.nn.operations.distributor import Distributor
@@ -52,9 +54,9 @@ def cnn_regressor(data_shape, filter_length, stride=1):
     filter_shape = (filter_length, data_shape[1])
     stride = [stride, data_shape[1]]
     # creating window expression so we know how many nodes we need
-    windows = CC().windex(data_shape,
-                          filter_shape,
-                          stride)
+    _, windows = CC().windex_array(data_shape,
+                                   filter_shape,
+                                   stride)
 
     # INPUTS
     graph.add_node("x", group=0, node=Rotate())
@@ -98,8 +100,18 @@ def cnn_regressor(data_shape, filter_length, stride=1):
     return graph
 
 
-def cnn_classifier(k):
-    """Get simple 1 Layer CNN, with K number of densenets -> softmax -> CCE."""
+def cnn_classifier(k, dense: bool = None):
+    """Get simple 1 Layer CNN, with K number of densenets -> softmax -> CCE.
+
+    :arg k: number of classes
+    :type k: int
+    :arg dense: replace the K densenets, each with their own copy of the
+        convolution outputs, with one multi-output
+        :class:`fhez.nn.layer.dense.Dense` node fed every window sum packed
+        into one cyphertext, so all classes are regressed by one encrypted
+        matrix product
+    :type dense: bool
+    """
     graph = nx.MultiDiGraph()
     classes = np.arange(k)
 
@@ -110,7 +122,7 @@ def cnn_classifier(k):
     data_shape = (28, 28)
     cnn_weights_shape = (6, 6)
     stride = [4, 4]
-    windows = CC().windex(data_shape, cnn_weights_shape, stride)
+    _, windows = CC().windex_array(data_shape, cnn_weights_shape, stride)
 
     # CONSTRUCT CNN
     # with intermediary decrypted sum to save on some complexity later
@@ -128,24 +140,10 @@ def cnn_classifier(k):
         graph.add_edge("Rotate-{}".format(i), "CC-sop-{}".format(i),
                        weight=Sum().cost)
         graph.add_edge("CC-sop-{}".format(i), "CC-enqueue")
-    graph.add_node("CNN-RELU", group=1, node=RELU(q=10))
-    graph.add_edge("CC-enqueue", "CNN-RELU")
-    graph.add_node("CNN-distribute", group=6, node=Distributor())
-    graph.add_edge("CNN-RELU", "CNN-distribute")
-    # graph.add_edge("CNN-enqueue", "CNN-activation", weight=RELU().cost)
-
-    # CONSTRUCT DENSE FOR EACH CLASS
-    # we want to get the network to regress some prediction one for each class
-    graph.add_node("Dense-enqueue", group=6, node=Enqueue(length=k))
-    for i in classes:
-        graph.add_node("Dense-{}".format(i), group=2,
-                       node=ANN(weights=(len(windows),)))
-        graph.add_edge("CNN-distribute", "Dense-{}".format(i))
-        graph.add_node("Dense-RELU-{}".format(i), group=2, node=RELU(q=10))
-        graph.add_edge("Dense-{}".format(i), "Dense-RELU-{}".format(i))
-        graph.add_edge("Dense-RELU-{}".format(i), "Dense-enqueue")
-    graph.add_node("Decrypt", group=5, node=Decrypt())
-    graph.add_edge("Dense-enqueue", "Decrypt")
+    if dense is True:
+        _dense_head(graph, windows=len(windows), k=k)
+    else:
+        _densenet_heads(graph, windows=len(windows), k=k)
 
     # CONSTRUCT SELECTOR TO SELECT COMPUTATIONAL CIRCUITS
     # we need to be able to select different computational circuits depending
@@ -179,6 +177,55 @@ def cnn_classifier(k):
     return graph
 
 
+def _densenet_heads(graph, windows, k):
+    """Add activated convolution, and K densenets each regressing one class.
+
+    Ends in the "Decrypt" node, of the densenets enqueued outputs.
+    """
+    graph.add_node("CNN-RELU", group=1, node=RELU(q=10))
+    graph.add_edge("CC-enqueue", "CNN-RELU")
+    graph.add_node("CNN-distribute", group=6, node=Distributor())
+    graph.add_edge("CNN-RELU", "CNN-distribute")
+    # graph.add_edge("CNN-enqueue", "CNN-activation", weight=RELU().cost)
+
+    # CONSTRUCT DENSE FOR EACH CLASS
+    # we want to get the network to regress some prediction one for each class
+    graph.add_node("Dense-enqueue", group=6, node=Enqueue(length=k))
+    for i in range(k):
+        graph.add_node("Dense-{}".format(i), group=2,
+                       node=ANN(weights=(windows,)))
+        graph.add_edge("CNN-distribute", "Dense-{}".format(i))
+        graph.add_node("Dense-RELU-{}".format(i), group=2, node=RELU(q=10))
+        graph.add_edge("Dense-{}".format(i), "Dense-RELU-{}".format(i))
+        graph.add_edge("Dense-RELU-{}".format(i), "Dense-enqueue")
+    graph.add_node("Decrypt", group=5, node=Decrypt())
+    graph.add_edge("Dense-enqueue", "Decrypt")
+
+
+def _dense_head(graph, windows, k):
+    """Add activated convolution packed into one multi-output dense node.
+
+    Ends in the "Decrypt" node, of the dense nodes outputs.
+    """
+    # pack the window sums into one example so the activation, and the dense
+    # head, work on a single cyphertext rather than one per window
+    graph.add_node("CC-pack", group=5, node=Pack())
+    graph.add_edge("CC-enqueue", "CC-pack")
+    graph.add_node("CNN-RELU", group=1, node=RELU(q=10))
+    graph.add_edge("CC-pack", "CNN-RELU")
+
+    # CONSTRUCT DENSE FOR ALL CLASSES
+    # we want to get the network to regress some prediction one for each class
+    # all at once, rather than one pass of the cyphertext per class
+    graph.add_node("Dense", group=2, node=Dense(weights=(windows, k)))
+    graph.add_edge("CNN-RELU", "Dense", weight=Dense().cost)
+    graph.add_node("Dense-RELU", group=2, node=RELU(q=10))
+    graph.add_edge("Dense", "Dense-RELU")
+    # packed cyphertexts hold a (1, k) example so flatten it back to (k,)
+    graph.add_node("Decrypt", group=5, node=Decrypt(flatten=True))
+    graph.add_edge("Dense-RELU", "Decrypt")
+
+
 def basic():
     """Get a super basic graph for purposes of testing components.
 
@@ -3,8 +3,11 @@
 # @Last modified by:   archer
 # @Last modified time: 2021-09-16T12:31:08+01:00
 
+import copy
 import time
 import unittest
+import importlib.util
+from unittest import mock
 import numpy as np
 from fhez.nn.graph.prefab import cnn_classifier, basic
 from fhez.nn.traverse.firing import Firing
@@ -46,6 +49,42 @@ class PrefabTester(unittest.TestCase):
             "cache": True,
         }
 
+    def test_cnn_classifier(self):
+        """Check densenets are kept unless the dense head is asked for."""
+        graph = cnn_classifier(10)
+        self.assertIn("CNN-distribute", graph.nodes)
+        self.assertIn("Dense-9", graph.nodes)
+        self.assertNotIn("Dense", graph.nodes)
+        graph = cnn_classifier(10, dense=True)
+        self.assertIn("CC-pack", graph.nodes)
+        self.assertEqual(graph.nodes["Dense"]["node"].weights.shape,
+                         (36, 10))
+        self.assertNotIn("Dense-0", graph.nodes)
+
+    @unittest.skipIf(importlib.util.find_spec("seal") is None,
+                     "encrypted dense head needs SEAL python bindings")
+    def test_cnn_classifier_encrypted_head(self):
+        """Check packed window sums reach the dense head as one cyphertext."""
+        from fhez.rearray import ReArray
+        graph = cnn_classifier(10, dense=True)
+        plain = copy.deepcopy(graph)
+        pack = graph.nodes["CC-pack"]["node"]
+        pack.provider = ReArray
+        pack.parameters = self.reseal_args
+        x = self.data
+        # numpy dispatches through the remap class attribute, not the method
+        matmul = mock.Mock(side_effect=ReArray.matmul)
+        with mock.patch.dict(ReArray.remap["__call__"], {np.matmul: matmul}):
+            out = Firing(graph=graph).stimulate(
+                neurons=["x", "y"], signals=[x, 3], receptor="forward")
+        matmul.assert_called_once()
+        self.assertIsInstance(matmul.call_args[0][0], ReArray)
+        truth = Firing(graph=plain).stimulate(
+            neurons=["x", "y"], signals=[x, 3], receptor="forward")
+        self.assertEqual(out["y_hat"], truth["y_hat"])
+        np.testing.assert_array_almost_equal(out["Loss-CCE"],
+                                             truth["Loss-CCE"], decimal=2)
+
     def test_todo(self):
         """Todo note to fail tests so it cant be forgotten."""
         raise NotImplementedError("FHE prefab tests not completed.")
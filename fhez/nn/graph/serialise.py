@@ -8,23 +8,36 @@ import marshmallow as mar
 
 
 class Serialise(abc.ABC):
-    """Abstract base class to standardise serialisation across all nodes."""
+    """Abstract base class to standardise serialisation across all nodes.
+
+    The schema of each class is only built, and instantiated, once by
+    :attr:`serialiser` however many of its objects are (de)serialised.
+    """
 
     @property
     @abc.abstractmethod
     def schema(self):
         """Get Marshmallow schema for this class for (de)serialisation."""
 
+    @property
+    def serialiser(self):
+        """Get instance of the schema of this class, cached on the class."""
+        cls = self.__class__
+        # looked up on this class only so subclasses never get their parents
+        serialiser = cls.__dict__.get("_serialiser")
+        if serialiser is None:
+            serialiser = self.schema()
+            cls._serialiser = serialiser
+        return serialiser
+
     def __getstate__(self):
         """Get current state in basic inbuilt-objects for serialisation."""
-        schema = self.schema
-        serialised = schema().dump(self)
+        serialised = self.serialiser.dump(self)
         return serialised
 
     def __setstate__(self, d):
         """Set the current state of the class using input dict repr."""
-        schema = self.schema
-        deserialised = schema().load(d)
+        deserialised = self.serialiser.load(d)
         self.__dict__ = deserialised
 
     def __eq__(self, other):
@@ -35,5 +48,4 @@ class Serialise(abc.ABC):
 
     def __repr__(self):
         """Get string unambiguous representation of object."""
-        schema = self.schema
-        return schema().dumps(self)
+        return self.serialiser.dumps(self)
@@ -0,0 +1,59 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-11-01T14:05:32+00:00
+# @Last modified by:   archer
+# @Last modified time: 2021-11-01T14:05:32+00:00
+
+import copy
+import time
+import pickle
+import unittest
+import numpy as np
+import marshmallow as mar
+
+from fhez.nn.graph.io import IO
+from fhez.nn.operations.cc import CC
+
+
+class Counted(IO):
+    """IO node counting how many times its schema was built."""
+
+    built = 0
+
+    @property
+    def schema(self):
+        """Get schema of value, counting each build."""
+        Counted.built += 1
+        return mar.Schema.from_dict({"_value": mar.fields.Int()})
+
+
+class SerialiseTest(unittest.TestCase):
+    """Test serialisation base abstraction."""
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.start_time = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.start_time
+        print('%s: %.3f' % (self.id(), t))
+
+    def test_serialiser(self):
+        """Check schemas are built once per class however often used."""
+        nodes = []
+        for i in range(100):
+            node = Counted()
+            node._value = i
+            nodes.append(node)
+        loaded = pickle.loads(pickle.dumps(nodes))
+        copied = copy.deepcopy(nodes)
+        self.assertEqual([n._value for n in loaded], list(range(100)))
+        self.assertEqual([n._value for n in copied], list(range(100)))
+        self.assertEqual(repr(nodes[1]), '{"_value": 1}')
+        self.assertEqual(Counted.built, 1)
+        # subclasses have their own schemas not those of their parents
+        self.assertIsNot(nodes[0].serialiser, IO().serialiser)
+        cc = CC(weights=(3, 3), stride=[1, 1])
+        self.assertIs(cc.serialiser, CC(weights=(3, 3)).serialiser)
+        np.testing.assert_array_equal(pickle.loads(pickle.dumps(cc)).weights,
+                                      cc.weights)
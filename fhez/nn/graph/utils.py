@@ -4,9 +4,13 @@
 # @Last modified by:   archer
 # @Last modified time: 2021-10-13T10:36:00+01:00
 
+import copy
 import itertools
+from collections import deque
 import numpy as np
 from tqdm import tqdm
+from fhez.nn.graph.node import Node
+from fhez.nn.graph.loader import Loader
 from fhez.nn.traverse.firing import Firing
 
 
@@ -25,56 +29,208 @@ def assign_edge_costing(graph, objk=None):
                         node, objk, "cannot calculate cost."))
 
 
-def train(graph, inputs, batch_size, debug=False):
-    """Train neural network graph through backpropagation."""
+def train(graph, inputs, batch_size, debug=False, batched=False,
+          accumulate=False, optimiser=None, free_signals=False):
+    """Train neural network graph through backpropagation.
+
+    :arg batched: stimulate the graph with whole batches at once, which
+        nodes compute using their vectorised forwards and backwards
+    :type batched: bool
+    :arg accumulate: have nodes keep running sums of their gradients rather
+        than every examples, so memory does not grow with batch size, nodes
+        this enables are switched back once training returns
+    :type accumulate: bool
+    :arg optimiser: optimiser to update every node at once with, such as
+        :class:`fhez.nn.optimiser.fused.FusedAdam`, else each node updates
+        itself with its own optimiser
+    :arg free_signals: free edge signals as soon as they are consumed, see
+        :attr:`fhez.nn.traverse.firing.Firing.free_signals`
+    :type free_signals: bool
+    :arg inputs: dictionary of input neuron names to their examples, or a
+        :class:`fhez.nn.graph.loader.Loader` of them, in which case batched
+        is taken from whether the loader loads batches
+    """
+    # only nodes enabled here are disabled again, once done
+    enabled = []
+    if accumulate is True:
+        for (_, data) in graph.nodes(data=True):
+            node = data["node"]
+            if isinstance(node, Node) and not node.is_accumulating:
+                node.enable_accumulator()
+                enabled.append(node)
+    try:
+        if optimiser is not None:
+            optimiser.register(graph)
+
+        # setting up our graph in both normal and reversed directions for
+        # forward and backward pass
+        forward = Firing(graph=graph, free_signals=free_signals)
+        # we want them linked, so the reverse is a view not a copy
+        backward = Firing(graph=graph.reverse(copy=False),
+                          free_signals=free_signals)
+
+        if isinstance(inputs, Loader):
+            return _train_loader(graph=graph, loader=inputs,
+                                 batch_size=batch_size, forward=forward,
+                                 backward=backward, optimiser=optimiser)
+        if batched is True:
+            return _train_batched(graph=graph, inputs=inputs,
+                                  batch_size=batch_size, forward=forward,
+                                  backward=backward, optimiser=optimiser)
+
+        neurons = list(inputs.keys())
+        train = list(inputs.values())
+        # external counter as I want to rework this in future to work
+        # with generators + its more efficient to use itertools than to
+        # iterate over the training set manually using a counter + lookup
+        # on each iteration which would start from head of list
+        i = 0
+        with tqdm(total=len(inputs[neurons[0]]), desc="Learn") as pbar:
+            for signals in itertools.zip_longest(*train):
+                # forward pass over all avaliable nodes on graph
+                out = forward.stimulate(
+                    neurons=neurons,
+                    signals=list(signals),
+                    receptor="forward")
+                # backward pass using output from forward pass to select
+                # the nodes they came from to pass them back in but as
+                # losses (or ignored if not a loss)
+                backward.stimulate(
+                    neurons=list(out.keys()),
+                    signals=list(out.values()),
+                    receptor="backward")
+                # if we happen to be at the end of a batch update using avg of
+                # our calculated gradients in all backward passes
+                # (internal state of the graph nodes so no need to do it
+                # ourselves)
+                if i % batch_size == 0:
+                    _update(graph=graph, optimiser=optimiser)
+                # iterate counter to keep track of batch sizes
+                pbar.update(1)
+                i += 1
+        return out
+    finally:
+        for node in enabled:
+            node.disable_accumulator()
+
+
+def _train_batched(graph, inputs, batch_size, forward, backward,
+                   optimiser=None):
+    """Train neural network graph one whole batch at a time."""
     neurons = list(inputs.keys())
+    length = len(inputs[neurons[0]])
+    with tqdm(total=length, desc="Learn") as pbar:
+        for i in range(0, length, batch_size):
+            signals = [np.asarray(v[i:i+batch_size]) for v in inputs.values()]
+            out = forward.stimulate(
+                neurons=neurons,
+                signals=signals,
+                receptor="forwards")
+            backward.stimulate(
+                neurons=list(out.keys()),
+                signals=list(out.values()),
+                receptor="backwards")
+            # each node holds its batch averaged gradients ready to update
+            _update(graph=graph, optimiser=optimiser)
+            pbar.update(len(signals[0]))
+    return out
 
-    # setting up our graph in both normal and reversed directions for
-    # forward and backward pass
-    forward = Firing(graph=graph)
-    backward = Firing(graph=graph.reverse(copy=False))  # we want them linked
 
-    train = list(inputs.values())
-    # external counter as I want to rework this in future to work
-    # with generators + its more efficient to use itertools than to
-    # iterate over the training set manually using a counter + lookup
-    # on each iteration which would start from head of list
+def _train_loader(graph, loader, batch_size, forward, backward,
+                  optimiser=None):
+    """Train neural network graph on what loader prefetches for it."""
+    batched = loader.batch_size is not None
+    gradient = "backwards" if batched else "backward"
     i = 0
-    with tqdm(total=len(inputs[neurons[0]]), desc="Learn") as pbar:
-        for signals in itertools.zip_longest(*train):
-            # forward pass over all avaliable nodes on graph
+    out = None
+    with tqdm(total=_length(loader), desc="Learn") as pbar:
+        for batch in loader:
             out = forward.stimulate(
-                neurons=neurons,
-                signals=list(signals),
-                receptor="forward")
-            # backward pass using output from forward pass to select
-            # the nodes they came from to pass them back in but as
-            # losses (or ignored if not a loss)
+                neurons=batch.neurons,
+                signals=batch.signals,
+                receptor=loader.receptor,
+                fired=batch.fired)
             backward.stimulate(
                 neurons=list(out.keys()),
                 signals=list(out.values()),
-                receptor="backward")
-            # if we happen to be at the end of a batch update using avg of
-            # our calculated gradients in all backward passes
-            # (internal state of the graph nodes so no need to do it
-            # ourselves)
-            if i % batch_size == 0:
-                for node_meta in graph.nodes(data=True):
-                    node = node_meta[1]["node"]
-                    node.updates()
-            # iterate counter to keep track of batch sizes
-            pbar.update(1)
+                receptor=gradient)
+            # loaded batches are already averaged, else update as train does
+            if batched or i % batch_size == 0:
+                _update(graph=graph, optimiser=optimiser)
+            pbar.update(batch.size)
             i += 1
     return out
 
 
-def infer(graph, inputs):
-    """Use neural network graph to infer some outcomes from inputs."""
-    neurons = list(inputs.keys())
+def _length(inputs):
+    """Get number of examples of inputs or None if unknown."""
+    try:
+        return len(inputs)
+    except TypeError:
+        return None
+
+
+def _update(graph, optimiser=None):
+    """Update every node in graph, in one step if given an optimiser."""
+    if optimiser is not None:
+        optimiser.step()
+        return
+    for node_meta in graph.nodes(data=True):
+        node = node_meta[1]["node"]
+        node.updates()
 
+
+def infer(graph, inputs, batch_size=None, free_signals=False):
+    """Use neural network graph to infer some outcomes from inputs.
+
+    :arg batch_size: if given stimulate the graph with batches of this many
+        examples at once, rather than one example at a time
+    :type batch_size: int
+    :arg free_signals: free edge signals as soon as they are consumed, see
+        :attr:`fhez.nn.traverse.firing.Firing.free_signals`
+    :type free_signals: bool
+    :arg inputs: dictionary of input neuron names to their examples, or a
+        :class:`fhez.nn.graph.loader.Loader` of them, in which case
+        batch_size is taken from the loader
+    """
     # setting up our graph in both normal and reversed directions for
     # forward and backward pass
-    forward = Firing(graph=graph)
+    forward = Firing(graph=graph, free_signals=free_signals)
+
+    if isinstance(inputs, Loader):
+        activations = {}
+        with tqdm(total=_length(inputs), desc="Infer") as pbar:
+            for batch in inputs:
+                out = forward.stimulate(
+                    neurons=batch.neurons,
+                    signals=batch.signals,
+                    receptor=inputs.receptor,
+                    fired=batch.fired)
+                pbar.update(batch.size)
+                for example in _split(out, batched=inputs.batch_size
+                                      is not None):
+                    for key, value in example.items():
+                        activations.setdefault(key, []).append(value)
+        return activations
+
+    neurons = list(inputs.keys())
+
+    if batch_size is not None:
+        activations = {}
+        length = len(inputs[neurons[0]])
+        with tqdm(total=length, desc="Infer") as pbar:
+            for i in range(0, length, batch_size):
+                signals = [np.asarray(v[i:i+batch_size])
+                           for v in inputs.values()]
+                out = forward.stimulate(
+                    neurons=neurons,
+                    signals=signals,
+                    receptor="forwards")
+                pbar.update(len(signals[0]))
+                # split batches back into examples just like unbatched
+                for key, value in out.items():
+                    activations.setdefault(key, []).extend(list(value))
+        return activations
 
     train = list(inputs.values())
     # external counter as I want to rework this in future to work
@@ -98,3 +254,103 @@ def infer(graph, inputs):
                     activations[key] = []
                 activations[key].append(value)
     return activations
+
+
+def stream(graph, inputs, window: int = None, batch_size: int = None,
+           executor=None):
+    """Lazily infer outcomes of inputs, yielding outputs of each in order.
+
+    Inputs are drawn from their iterables only once there is room in the
+    window of in-flight stimulations, and no more are drawn until the caller
+    has taken the oldest outputs, so arbitrarily long streams run in memory
+    bounded by the window rather than by the dataset. Node caches are
+    disabled while streaming, as inference never backpropagates.
+
+    :arg inputs: dictionary of input neuron names to iterables of examples
+    :type inputs: dict
+    :arg window: maximum number of stimulations in flight at once
+    :type window: int
+    :arg batch_size: if given stimulate the graph with batches of this many
+        examples at once, rather than one example at a time
+    :type batch_size: int
+    :arg executor: executor to stimulate window many copies of the graph with
+        concurrently, else stimulate one at a time
+    :type executor: concurrent.futures.Executor
+    :return: generator of dictionaries of output neuron names to activations
+    """
+    window = window if window is not None else 1
+    if window < 1:
+        raise ValueError("window {} is less than 1".format(window))
+    neurons = list(inputs.keys())
+    examples = itertools.zip_longest(*inputs.values())
+    if batch_size is not None:
+        receptor = "forwards"
+        units = (
+            [np.asarray(column) for column in zip(*batch)]
+            for batch in iter(
+                lambda: list(itertools.islice(examples, batch_size)), []))
+    else:
+        receptor = "forward"
+        units = (list(signals) for signals in examples)
+
+    if executor is None:
+        graphs = [graph]
+    else:
+        # each in-flight stimulation needs its own edges and node state
+        graphs = [copy.deepcopy(graph) for _ in range(window)]
+    states = _disable_caches(graph)
+    for g in graphs:
+        _disable_caches(g)
+    idle = [Firing(graph=g, free_signals=True) for g in graphs]
+    batched = batch_size is not None
+    in_flight = deque()
+    try:
+        if executor is None:
+            for signals in units:
+                yield from _split(idle[0].stimulate(
+                    neurons=neurons, signals=signals, receptor=receptor),
+                    batched=batched)
+            return
+        while True:
+            if len(in_flight) == window:
+                # backpressure, wait on the oldest before drawing any more
+                firing, future = in_flight.popleft()
+                out = future.result()
+                idle.append(firing)
+                yield from _split(out, batched=batched)
+            signals = next(units, None)
+            if signals is None:
+                break
+            firing = idle.pop()
+            in_flight.append((firing, executor.submit(
+                firing.stimulate, neurons=neurons, signals=signals,
+                receptor=receptor)))
+        while len(in_flight) > 0:
+            _, future = in_flight.popleft()
+            yield from _split(future.result(), batched=batched)
+    finally:
+        for (_, future) in in_flight:
+            future.cancel()
+        for (node, state) in states:
+            node.is_cache_enabled = state
+
+
+def _disable_caches(graph):
+    """Disable cache of every node in graph, returning previous states."""
+    states = []
+    for (_, data) in graph.nodes(data=True):
+        node = data.get("node")
+        if node is not None:
+            states.append((node, node.is_cache_enabled))
+            node.disable_cache()
+    return states
+
+
+def _split(out, batched=False):
+    """Yield outputs of a stimulation per example."""
+    if batched is not True:
+        yield out
+        return
+    keys = list(out.keys())
+    for values in zip(*out.values()):
+        yield dict(zip(keys, values))
@@ -5,10 +5,11 @@
 
 import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
-from fhez.nn.graph.utils import train, infer, assign_edge_costing
-from fhez.nn.graph.prefab import orbweaver
+from fhez.nn.graph.utils import train, infer, stream, assign_edge_costing
+from fhez.nn.graph.prefab import orbweaver, cnn_classifier
 
 
 class UtilsTester(unittest.TestCase):
@@ -61,6 +62,85 @@ class UtilsTester(unittest.TestCase):
         }
         train(graph=graph, inputs=inputs, batch_size=3)
 
+    def test_train_batched(self):
+        """Check training loop stimulating whole batches at once."""
+        graph = cnn_classifier(10, dense=True)
+        inputs = {
+            "x": np.random.rand(6, *self.data_shape),
+            "y": np.array([1, 2, 3, 4, 5, 6])
+        }
+        out = train(graph=graph, inputs=inputs, batch_size=3, batched=True)
+        self.assertEqual(np.shape(out["Loss-CCE"]), (3,))
+
+    def test_infer_batched(self):
+        """Check batched inference gives the same activations as unbatched."""
+        graph = orbweaver()
+        inputs = {
+            "x": np.random.rand(5, *self.data_shape),
+            "y": np.array([1, 2, 3, 4, 5])
+        }
+        truth = infer(graph=graph, inputs=inputs)
+        activations = infer(graph=graph, inputs=inputs, batch_size=2)
+        for key, value in truth.items():
+            self.assertEqual(len(activations[key]), len(value))
+            np.testing.assert_array_almost_equal(activations[key], value,
+                                                 decimal=4,
+                                                 verbose=True)
+
+    def test_free_signals(self):
+        """Check freeing signals as they are consumed leaves results alone."""
+        graph = orbweaver()
+        inputs = {
+            "x": np.random.rand(3, *self.data_shape),
+            "y": np.array([1, 2, 3])
+        }
+        truth = infer(graph=graph, inputs=inputs)
+        activations = infer(graph=graph, inputs=inputs, free_signals=True)
+        for key, value in truth.items():
+            np.testing.assert_array_almost_equal(activations[key], value,
+                                                 decimal=4,
+                                                 verbose=True)
+        train(graph=graph, inputs=inputs, batch_size=3, free_signals=True)
+
+    def test_stream(self):
+        """Check streamed inference matches inference in bounded memory."""
+        graph = orbweaver()
+        x = np.random.rand(7, *self.data_shape)
+        y = np.arange(7)
+        truth = infer(graph=graph, inputs={"x": x, "y": y})
+        cached = [len(d["node"].inputs) for (_, d) in graph.nodes(data=True)]
+        drawn = []
+
+        def examples():
+            for example in x:
+                drawn.append(example)
+                yield example
+
+        with ThreadPoolExecutor(2) as executor:
+            for kwargs in [{}, {"batch_size": 3},
+                           {"executor": executor, "window": 2},
+                           {"executor": executor, "window": 2,
+                            "batch_size": 2}]:
+                drawn.clear()
+                outputs = stream(graph=graph, inputs={"x": examples(),
+                                                      "y": iter(y)},
+                                 **kwargs)
+                first = next(outputs)
+                # only what fits in the window has been drawn
+                self.assertLessEqual(len(drawn), kwargs.get(
+                    "window", 1) * kwargs.get("batch_size", 1))
+                outputs = [first] + list(outputs)
+                self.assertEqual(len(outputs), len(y))
+                for key, value in truth.items():
+                    np.testing.assert_array_almost_equal(
+                        [o[key] for o in outputs], value, decimal=4,
+                        verbose=True)
+        # caches are restored, and nothing was cached while streaming
+        for (_, data) in graph.nodes(data=True):
+            self.assertTrue(data["node"].is_cache_enabled)
+        self.assertEqual([len(d["node"].inputs)
+                          for (_, d) in graph.nodes(data=True)], cached)
+
     def test_infer(self):
         """Check inference working as expected."""
         orbweaver()
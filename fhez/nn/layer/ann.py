@@ -112,13 +112,42 @@ class ANN(Node):
         self.gradients.append({"dfdw": dfdw, "dfdb": dfdb, "dfdx": dfdx})
         return dfdx
 
+    def forwards(self, xs):
+        """Compute forward pass of a batch of examples along the first axis."""
+        if np.shape(xs)[1] != len(self.weights):
+            raise ValueError("Mismatched shapes inp:{}, weights:{}".format(
+                np.shape(xs)[1],
+                len(self.weights)))
+        weighted = np.multiply(xs, self.weights)
+        sum = np.sum(weighted, axis=1)  # sum over only each examples first
+        self.inputs.append(xs)
+        return np.add(sum, self.bias)
+
+    def backwards(self, gradients):
+        """Compute backward pass of a batch, averaging its gradients."""
+        x = np.array(self.inputs.pop())
+        gradients = np.array(gradients)
+        # each examples gradient applies to all of its inputs
+        expanded = np.expand_dims(gradients, axis=1)
+        dfdx = np.multiply(self.weights, expanded)
+        dfdw = np.mean(np.multiply(x, expanded), axis=0)
+        dfdb = np.mean(gradients, axis=0)
+        self.gradients.append({"dfdw": dfdw, "dfdb": dfdb,
+                               "dfdx": np.mean(dfdx, axis=0)})
+        return dfdx
+
+    @property
+    def parameter_names(self):
+        """Get names of trainable parameters."""
+        return ["w", "b"]
+
     def update(self):
         """Update weights and bias of the network stocastically."""
-        self.updater(parm_names=["w", "b"], it=1)
+        self.updater(parm_names=self.parameter_names, it=1)
 
     def updates(self):
         """Update weights and bias as one batch all together."""
-        self.updater(parm_names=["w", "b"])
+        self.updater(parm_names=self.parameter_names)
 
     @property
     def cost(self):
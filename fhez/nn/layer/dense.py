@@ -0,0 +1,142 @@
+"""Dense multi-output neural network layer as node abstraction."""
+# @Author: GeorgeRaven <archer>
+# @Date:   2021-10-22T10:12:41+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-22T10:12:41+01:00
+# @License: please see LICENSE file in project root
+
+import logging as logger
+import numpy as np
+from fhez.nn.graph.node import Node
+
+
+class Dense(Node):
+    """Fully connected layer computing all k outputs in a single node.
+
+    Where :class:`fhez.nn.layer.ann.ANN` computes one output per node, and so
+    one full pass over the cyphertext per output, Dense computes all k at
+    once as a matrix product. Encrypted inputs (a :class:`fhez.rearray.ReArray`
+    of examples (batch, n)) use the diagonal encrypted matrix product.
+    """
+
+    def __init__(self, weights: np.array = None, bias: np.array = None):
+        """Initialise dense layer of (inputs, outputs) weights."""
+        if weights is not None:
+            self.weights = weights
+        if bias is not None:
+            self.bias = bias
+
+    @property
+    def w(self):
+        """Shorthand for weights."""
+        return self.weights
+
+    @w.setter
+    def w(self, w):
+        self.weights = w
+
+    @property
+    def weights(self):
+        """Get the current (inputs, outputs) weights."""
+        if self.__dict__.get("_weights") is None:
+            logger.warning("{}.weights called before initialisation".format(
+                self.__class__.__name__))
+            self._weights = np.array([[]])
+        return self._weights
+
+    @weights.setter
+    def weights(self, weights: np.ndarray):
+        """Set the weights or let them self initialise given a shape tuple."""
+        if isinstance(weights, tuple):
+            weights = np.random.rand(*weights)
+        self._weights = weights
+
+    @property
+    def b(self):
+        """Shorthand for bias."""
+        return self.bias
+
+    @b.setter
+    def b(self, b):
+        self.bias = b
+
+    @property
+    def bias(self):
+        """Get bias of each output."""
+        if self.__dict__.get("_bias") is None:
+            self._bias = np.zeros(np.shape(self.weights)[-1])
+        return self._bias
+
+    @bias.setter
+    def bias(self, bias):
+        self._bias = bias
+
+    def forward(self, x):
+        r"""Compute forward pass of all outputs.
+
+        .. math::
+
+            a^{(i)<k>} = \sum_{t=0}^{T_x-1}(x^{(i)<t>}w^{<t,k>})+b^{<k>}
+
+        """
+        self.inputs.append(x)
+        return np.add(np.matmul(x, self.weights), self.bias)
+
+    def backward(self, gradient):
+        r"""Compute backward pass of all outputs.
+
+        .. math::
+
+            \frac{df}{db^{<k>}} = 1 \frac{dg}{dx^{<k>}}
+
+            \frac{df}{dw^{<t,k>}} = x^{(i)<t>} \frac{dg}{dx^{<k>}}
+
+            \frac{df}{dx^{(i)<t>}} = \sum_k w^{<t,k>} \frac{dg}{dx^{<k>}}
+        """
+        dfdx, dfdw, dfdb = self._backward(gradient)
+        self.gradients.append({"dfdw": dfdw, "dfdb": dfdb, "dfdx": dfdx})
+        return dfdx
+
+    def _backward(self, gradient):
+        """Get dfdx, and dfdw and dfdb summed over any batch."""
+        n, k = np.shape(self.weights)
+        x = np.reshape(np.array(self.inputs.pop()), (-1, n))
+        gradient = np.array(gradient)
+        # dfdx
+        dfdx = np.matmul(gradient, np.transpose(self.weights))
+        # dfdw and dfdb summed over any batch
+        gradient = np.reshape(gradient, (-1, k))
+        dfdw = np.matmul(np.transpose(x), gradient)
+        dfdb = np.sum(gradient, axis=0)
+        return dfdx, dfdw, dfdb
+
+    def forwards(self, xs):
+        """Compute forward pass of a batch of (batch, inputs) examples."""
+        return self.forward(xs)
+
+    def backwards(self, gradients):
+        """Compute backward pass of a batch, averaging its gradients."""
+        dfdx, dfdw, dfdb = self._backward(gradients)
+        # backward sums over the batch so make it an average per example
+        n = len(dfdx)
+        self.gradients.append({"dfdw": dfdw / n, "dfdb": dfdb / n,
+                               "dfdx": np.mean(dfdx, axis=0)})
+        return dfdx
+
+    @property
+    def parameter_names(self):
+        """Get names of trainable parameters."""
+        return ["w", "b"]
+
+    def update(self):
+        """Update weights and bias of the network stocastically."""
+        self.updater(parm_names=self.parameter_names, it=1)
+
+    def updates(self):
+        """Update weights and bias as one batch all together."""
+        self.updater(parm_names=self.parameter_names)
+
+    @property
+    def cost(self):
+        """Get cost of this node."""
+        return 2
@@ -0,0 +1,104 @@
+"""Dense multi-output layer tests."""
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-22T10:12:41+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-22T10:12:41+01:00
+import unittest
+import logging as logger
+import numpy as np
+import time
+
+import seal
+from fhez.rearray import ReArray
+from fhez.nn.layer.dense import Dense
+
+
+class Dense_Tests(unittest.TestCase):
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.startTime = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.startTime
+        print('%s: %.3f' % (self.id(), t))
+
+    @property
+    def reseal_args(self):
+        """Get some reseal arguments for encryption."""
+        return {
+            "scheme": seal.scheme_type.CKKS,
+            "poly_modulus_degree": 8192*2,
+            "coefficient_modulus":
+                [45, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 45],
+            "scale": pow(2.0, 30),
+            "cache": True,
+        }
+
+    def test_init(self):
+        """Check self initialisation of weights and bias from shape."""
+        dense = Dense(weights=(5, 3))
+        self.assertEqual(dense.weights.shape, (5, 3))
+        np.testing.assert_array_equal(dense.bias, np.zeros(3))
+
+    def test_forward(self):
+        """Check every output is computed at once."""
+        weights = np.arange(15).reshape(5, 3) / 10
+        bias = np.array([1, 2, 3])
+        x = np.arange(5)
+        dense = Dense(weights=weights, bias=bias)
+        np.testing.assert_array_almost_equal(dense.forward(x),
+                                             x @ weights + bias,
+                                             decimal=4,
+                                             verbose=True)
+
+    def test_forward_enc(self):
+        """Check encrypted forward pass matches plaintext."""
+        weights = np.random.rand(30, 10)
+        x = np.random.rand(2, 30)
+        dense = Dense(weights=weights)
+        acti = dense.forward(ReArray(x, **self.reseal_args))
+        self.assertIsInstance(acti, ReArray)
+        np.testing.assert_array_almost_equal(np.array(acti), x @ weights,
+                                             decimal=1,
+                                             verbose=True)
+
+    def test_backward(self):
+        """Check gradients of inputs, weights and bias."""
+        weights = np.arange(6).reshape(3, 2) / 10
+        x = np.array([1, 2, 3])
+        grad = np.array([0.5, -1])
+        dense = Dense(weights=weights)
+        dense.forward(x)
+        dfdx = dense.backward(grad)
+        grads = dense.gradients.pop()
+        np.testing.assert_array_almost_equal(dfdx, weights @ grad,
+                                             decimal=4,
+                                             verbose=True)
+        np.testing.assert_array_almost_equal(grads["dfdw"],
+                                             np.outer(x, grad),
+                                             decimal=4,
+                                             verbose=True)
+        np.testing.assert_array_almost_equal(grads["dfdb"], grad,
+                                             decimal=4,
+                                             verbose=True)
+
+    def test_updates(self):
+        """Check parameters can be updated from the gradients."""
+        dense = Dense(weights=(3, 2))
+        dense.forward(np.array([1, 2, 3]))
+        dense.backward(np.array([0.5, -1]))
+        dense.updates()
+        self.assertEqual(dense.weights.shape, (3, 2))
+        self.assertEqual(np.shape(dense.bias), (2,))
+
+
+if __name__ == "__main__":
+    logger.basicConfig(  # filename="{}.log".format(__file__),
+        level=logger.INFO,
+        format="%(asctime)s %(levelname)s:%(message)s",
+        datefmt="%Y-%m-%dT%H:%M:%S")
+    # run all the unit-tests
+    print("now testing:", __file__, "...")
+    unittest.main()
@@ -84,6 +84,25 @@ class CCE(Loss):
         dfdpy = dfdpy * inp["y"]  # multiply each by actual probability
         return dfdpy * gradient
 
+    def forwards(self, signal):
+        """Calculate cross entropy of a batch of y_hat and y examples."""
+        # THE ORDER IS DEPENDENT ON THE ORDER OF EDGES!
+        y_hat = signal[0]
+        y = signal[1]
+        y_hat_clipped = np.clip(y_hat, 1e-07, 1-1e-07)
+        self.inputs.append({"y": y, "y_hat": y_hat_clipped})
+        return -np.sum(y * np.log(y_hat_clipped), axis=-1)
+
+    def backwards(self, gradients: np.ndarray):
+        r"""Calculate gradients of a batch with respect to :math:`\hat{y}`."""
+        inp = self.inputs.pop()
+        y_hat = np.array(inp["y_hat"])
+        dfdpy = -1 / y_hat * np.array(inp["y"])
+        # each examples loss gradient applies to all of its classes
+        gradients = np.array(gradients)
+        return dfdpy * np.reshape(gradients, np.shape(gradients) + (1,) * (
+            y_hat.ndim - np.ndim(gradients)))
+
     @property
     def cost(self):
         """Get 0 cost of plaintext loss calculation."""
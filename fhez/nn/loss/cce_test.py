@@ -106,3 +106,19 @@ class CrossEntropyTest(unittest.TestCase):
         np.testing.assert_array_almost_equal(class_grads, true_grad,
                                              decimal=5,
                                              verbose=True)
+
+    def test_batch(self):
+        """Check batched cross entropy matches each example individually."""
+        y_hat = np.array([[0.7, 0.2, 0.1], [0.1, 0.1, 0.8]])
+        y = np.array([[1, 0, 0], [0, 1, 0]])
+        gradients = np.array([1.0, 0.5])
+        loss = CategoricalCrossEntropy()
+        losses = loss.forwards([y_hat, y])
+        grads = loss.backwards(gradients)
+        for i in range(len(y)):
+            np.testing.assert_array_almost_equal(
+                losses[i], loss.forward(y=y[i], y_hat=y_hat[i]),
+                decimal=6, verbose=True)
+            np.testing.assert_array_almost_equal(
+                grads[i], loss.backward(gradients[i]),
+                decimal=6, verbose=True)
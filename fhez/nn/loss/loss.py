@@ -71,6 +71,18 @@ class Loss(abc.ABC):
         """Loss funcs have no params so do nothing."""
         return NotImplemented
 
+    def forwards(self, signal):
+        """Calculate losses of a batch given a batch of y_hat and of y."""
+        # signal is ordered by edge, each holding the whole batch
+        return np.array([self.forward(s) for s in zip(*signal)])
+
+    def backwards(self, gradients):
+        r"""Calculate gradients of a batch with respect to :math:`\hat{y}`."""
+        # inputs are popped FILO so gradients must be too to match examples
+        accumulator = [self.backward(g) for g in reversed(gradients)]
+        accumulator.reverse()
+        return np.array(accumulator)
+
     # ABSTRACT METHODS
 
     @abc.abstractmethod
@@ -52,6 +52,32 @@ class MSE(Loss):
             return np.mean(local_grads, axis=0) * gradient
         return np.mean(local_grads) * gradient
 
+    def forwards(self, signal):
+        """Calculate the loss of each example in a batch given their truths."""
+        # THE ORDER IS DEPENDENT ON THE ORDER OF EDGES!
+        y_hat = np.array(signal[0])
+        y = np.array(signal[1])
+        self.inputs.append({"y": y, "y_hat": y_hat})
+        return np.mean(np.reshape((y - y_hat)**2, (len(y_hat), -1)), axis=1)
+
+    def backwards(self, gradients):
+        r"""Calculate MSE gradient of a batch with respect to :math:`\hat{y}`.
+
+        Equivalent to :meth:`backward` for each example.
+        """
+        inp = self.inputs.pop()
+        y = inp["y"]
+        y_hat = inp["y_hat"]
+        local_grads = -2 * (y - y_hat)
+        # as backward but for each example along the leading batch axis
+        if y_hat.ndim > 1:
+            local_grads = np.sum(local_grads, axis=1)
+        if y_hat.ndim > 2:
+            local_grads = np.mean(local_grads, axis=1)
+        gradients = np.array(gradients)
+        return local_grads * np.reshape(gradients, np.shape(gradients) + (
+            1,) * (np.ndim(local_grads) - np.ndim(gradients)))
+
     def update(self):
         """Do nothing as there are no parameters to update."""
         return NotImplemented
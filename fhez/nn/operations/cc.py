@@ -5,7 +5,9 @@
 # @Last modified time: 2021-09-21T20:05:18+01:00
 # @License: please see LICENSE file in project root
 
-import copy
+import collections.abc
+import functools
+import warnings
 import numpy as np
 import marshmallow as mar
 from fhez.nn.graph.node import Node
@@ -13,6 +15,40 @@ from fhez.nn.graph.serialise import Serialise
 from fhez.fields.numpyfield import NumpyField
 
 
+@functools.lru_cache(maxsize=128)
+def _windex_array(data: tuple, filter: tuple, stride: tuple):
+    """Get window bounds and slices of shapes, see CC.windex_array."""
+    # first index of windows in each dimension, that still fit in the data
+    heads = [np.arange(0, d - f + 1, s) for d, f, s in zip(data, filter,
+                                                            stride)]
+    # every combination of heads in row major order like nested loops
+    starts = np.stack(np.meshgrid(*heads, indexing="ij"),
+                      axis=-1).reshape(-1, len(stride))
+    bounds = np.stack([starts, starts + np.array(filter, dtype=int)],
+                      axis=-1)
+    bounds.setflags(write=False)  # shared so must not be modified
+    return bounds, WindowSlices(bounds)
+
+
+class WindowSlices(collections.abc.Sequence):
+    """Read only view of window bounds as slice tuples to index data with."""
+
+    def __init__(self, bounds: np.ndarray):
+        """Wrap (n_windows, ndim, 2) array of window [start, stop)."""
+        self.bounds = bounds
+
+    def __len__(self):
+        """Get number of windows."""
+        return len(self.bounds)
+
+    def __getitem__(self, index):
+        """Get slice tuple of window, or view of a slice of windows."""
+        if isinstance(index, slice):
+            return WindowSlices(self.bounds[index])
+        return tuple(slice(start, stop)
+                     for start, stop in self.bounds[index].tolist())
+
+
 class CC(Node, Serialise):
     """Convolutional Neural Network."""
 
@@ -62,13 +98,22 @@ class CC(Node, Serialise):
         """Compute convolutional filter forward pass and sums."""
         self.inputs.append(x)
         if self.windows is None:
-            # self.windows = self.windex(data=x.shape[1:],
-            #                            filter=self.weights.shape[1:],
-            #                            stride=self.stride[1:])
-            self.windows = self.windex(data=x.shape,
-                                       filter=self.weights.shape,
-                                       stride=self.stride)
-            self.windows = list(map(self.windex_to_slice, self.windows))
+            self.window_bounds, self.windows = self.windex_array(
+                data=x.shape, filter=self.weights.shape, stride=self.stride)
+
+        if self._is_vectorisable(x):
+            # plaintext fast path, only the window sized products are computed
+            # then placed in the otherwise bias only outputs
+            products = np.einsum("i...,...->i...", self._window_view(x),
+                                 self.weights)
+            n = len(self.windows)
+            activated = np.empty((n,) + x.shape,
+                                 dtype=np.result_type(products, self.bias))
+            activated[...] = self.bias
+            flat = activated.reshape(n, x.size)  # view of each output
+            flat[np.arange(n)[:, None], self._window_positions(x.shape)] += \
+                products.reshape(n, -1)
+            return activated
 
         activated = []
         # apply each window and do it by index so can state progress
@@ -93,6 +138,21 @@ class CC(Node, Serialise):
         x = np.array(self.inputs.pop())
         # gradient_kernel = gradient * self.weights
         x_grad_product = x * gradient
+        # b is broadcast to the size of the kernel in forward and is also
+        # broadcast multiple times once for each window.
+        dfdb = np.sum(len(self.windows) * gradient)
+        if self._is_vectorisable(x_grad_product):
+            # plaintext fast path of the same sums over windows as below
+            dfdw = np.einsum("i...->...", self._window_view(x_grad_product))
+            # how much each element of x was weighted across every window
+            positions = self._window_positions(x.shape)
+            coverage = np.bincount(
+                positions.ravel(),
+                weights=np.tile(np.ravel(self.weights), len(positions)),
+                minlength=x.size).reshape(x.shape)
+            dfdx = coverage * gradient
+            self.gradients.append({"dfdw": dfdw, "dfdx": dfdx, "dfdb": dfdb})
+            return dfdx
         # calculate the gradient of inputs by adding the kernel grads together
         # in the positions those gradients were used.
         dfdx = np.zeros(x.shape)
@@ -102,19 +162,66 @@ class CC(Node, Serialise):
             primer[self.windows[i]] = self.weights
             dfdw += x_grad_product[self.windows[i]]
             dfdx += (primer * gradient)
-        # b is broadcast to the size of the kernel in forward and is also
-        # broadcast multiple times once for each window.
-        dfdb = np.sum(len(self.windows) * gradient)
         self.gradients.append({"dfdw": dfdw, "dfdx": dfdx, "dfdb": dfdb})
         return dfdx
 
+    def forwards(self, xs):
+        """Compute convolutional filter forward pass of a batch of examples.
+
+        Each examples outputs are as :meth:`forward`, giving a
+        (batch, n_windows, \*example_shape) array.
+        """
+        xs = np.array(xs)
+        self.inputs.append(xs)
+        if self.windows is None:
+            self.window_bounds, self.windows = self.windex_array(
+                data=xs.shape[1:], filter=self.weights.shape,
+                stride=self.stride)
+        products = np.einsum("bi...,...->bi...", self._window_view(xs),
+                             self.weights)
+        n = len(self.windows)
+        size = xs[0].size
+        activated = np.empty((len(xs), n) + xs.shape[1:],
+                             dtype=np.result_type(products, self.bias))
+        activated[...] = self.bias
+        flat = activated.reshape(len(xs), n, size)
+        flat[:, np.arange(n)[:, None], self._window_positions(xs.shape[1:])] \
+            += products.reshape(len(xs), n, -1)
+        return activated
+
+    def backwards(self, gradients):
+        """Compute filter and input gradients of a batch of examples.
+
+        Each examples input gradient is as :meth:`backward`, while filter
+        and bias gradients are averaged over the batch.
+        """
+        x = np.array(self.inputs.pop())
+        gradients = np.array(gradients)
+        dfdb = np.sum(len(self.windows) * gradients) / len(x)
+        dfdw = np.einsum("bi...->...",
+                         self._window_view(x * gradients)) / len(x)
+        positions = self._window_positions(x.shape[1:])
+        coverage = np.bincount(
+            positions.ravel(),
+            weights=np.tile(np.ravel(self.weights), len(positions)),
+            minlength=x[0].size).reshape(x.shape[1:])
+        dfdx = coverage * gradients
+        self.gradients.append({"dfdw": dfdw, "dfdx": np.mean(dfdx, axis=0),
+                               "dfdb": dfdb})
+        return dfdx
+
+    @property
+    def parameter_names(self):
+        """Get names of trainable parameters."""
+        return ["w", "b"]
+
     def update(self):
         """Update node state/ weights for a single example."""
-        self.updater(parm_names=["w", "b"], it=1)
+        self.updater(parm_names=self.parameter_names, it=1)
 
     def updates(self):
         """Update node state/ weights for multiple examples simultaneously."""
-        self.updater(parm_names=["w", "b"])
+        self.updater(parm_names=self.parameter_names)
 
     @property
     def w(self):
@@ -201,12 +308,52 @@ class CC(Node, Serialise):
         """Set current list of windows into the data."""
         self.cache["windows"] = windows
 
+    @property
+    def window_bounds(self):
+        """Get (n_windows, ndim, 2) array of [start, stop) of windows."""
+        return self.cache.get("window_bounds")
+
+    @window_bounds.setter
+    def window_bounds(self, bounds):
+        self.cache["window_bounds"] = bounds
+
     # UTILITY
 
+    def _is_vectorisable(self, x):
+        """Check if x is plaintext our windows can be viewed into directly."""
+        return isinstance(x, np.ndarray) and x.dtype != object and \
+            x.ndim == np.ndim(self.weights)
+
+    def _window_starts(self):
+        """Get (n_windows, ndim) array of the first index of each window."""
+        if self.window_bounds is not None:
+            return self.window_bounds[:, :, 0]
+        return np.array([[s.start for s in window] for window in self.windows],
+                        dtype=int).reshape(len(self.windows), -1)
+
+    def _window_view(self, x: np.ndarray):
+        """Get (\*batch, n_windows, \*filter_shape) array of windows of x."""
+        batch = x.ndim - np.ndim(self.weights)
+        view = np.lib.stride_tricks.sliding_window_view(
+            x, np.shape(self.weights), axis=tuple(range(batch, x.ndim)))
+        return view[(slice(None),) * batch + tuple(self._window_starts().T)]
+
+    def _window_positions(self, shape: tuple):
+        """Get (n_windows, filter_size) flat indices of each window in x."""
+        positions = self.cache.get("window_positions")
+        if positions is None or positions[0] != shape:
+            starts = np.ravel_multi_index(self._window_starts().T, shape)
+            offsets = np.ravel_multi_index(
+                np.indices(np.shape(self.weights)).reshape(len(shape), -1),
+                shape)
+            positions = (shape, starts[:, None] + offsets[None, :])
+            self.cache["window_positions"] = positions
+        return positions[1]
+
     def windex(self, data: list, filter: list, stride: list,
-               dimension: int = 0, partial: list = []):
+               dimension: int = None, partial: list = None):
         """
-        Recursive window index or Windex.
+        Window index or Windex.
 
         This function takes 3 lists; data, filter, and stride.
         Data is a regular multidimensional list, so in the case of a 32x32
@@ -248,51 +395,48 @@ class CC(Node, Serialise):
           neural networks, cutting the time per epoch down.
         - we want to use pure list slicing so that we can work with non-
           standard data, E.G Fully Homomorphically Encrypted lists.
+
+        This list form is built from :meth:`windex_array`, which is far
+        quicker and smaller where the windows are only to be sliced with.
+
+        .. note::
+
+            dimension and partial are deprecated. They were only used to
+            recurse, which windex no longer does, so they are ignored and
+            raise a DeprecationWarning if given.
+        """
+        if dimension is not None or partial is not None:
+            warnings.warn(
+                "windex no longer recurses, dimension and partial are "
+                "ignored and will be removed", DeprecationWarning,
+                stacklevel=2)
+        bounds, _ = self.windex_array(data, filter, stride)
+        return [[list(range(start, stop)) for start, stop in window]
+                for window in bounds.tolist()]
+
+    def windex_array(self, data: list, filter: list, stride: list):
+        """Get array of window bounds, and slices, without recursion.
+
+        Windows are the same and in the same order as :meth:`windex`. The
+        result is cached and shared between all CC nodes, so nodes with the
+        same data, filter, and stride shapes only calculate it once.
+
+        :arg data: data or its shape
+        :arg filter: filter or its shape
+        :arg stride: stride in each dimension
+        :return: (n_windows, ndim, 2) read only integer array of [start, stop)
+            of each window in each dimension, and a WindowSlices view of the
+            windows as slice tuples to index data with
+        :rtype: tuple
         """
-        # get shapes of structural lists
         d_shape = data if isinstance(data, tuple) else self.probe_shape(
             data)
         f_shape = filter if isinstance(filter, tuple) else self.probe_shape(
             filter)
-        # if we are not at the end/ last dimension
-        if len(stride) > dimension:
-            # creating a list matching dimension len so we can slice
-            window_heads = list(range(d_shape[dimension]))
-            # using dimension list to calculate strides using slicing
-            window_heads = window_heads[::stride[dimension]]
-            # creating window container to hold each respective window
-            windows = []
-            # iterate through first index/ head of window
-            for window_head in window_heads:
-                # copy partial window up till now to branch it to mutliple
-                # windows
-                current_partial_window = copy.deepcopy(partial)
-                # create index range of window in this dimension
-                window = list(range(window_head, window_head +
-                                    f_shape[dimension]))
-                # if window end "-1" is within data bounds
-                if (window[-1]) < d_shape[dimension]:
-                    # add this dimensions window indexes to partial
-                    current_partial_window.append(window)
-                    # pass partial to recurse and build it up further
-                    subwindow = self.windex(data, filter, stride, dimension+1,
-                                            current_partial_window)
-                    # logger.debug("subwindow {}: {}".format(dimension,
-                    #                                        subwindow))
-                    # since we want to create a flat list we want to extend if
-                    # the list is still building the partial window or append
-                    # if concatenating the partial windows to a single list
-                    if (len(stride)-1) > dimension:
-                        windows.extend(subwindow)
-                    else:
-                        windows.append(subwindow)
-                else:
-                    # discarding illegal windows that are out of bounds
-                    pass
-            return windows
-        else:
-            # this is the end of the sequence, can do no more so return
-            return partial
+        stride = tuple(int(i) for i in np.ravel(stride))
+        return _windex_array(tuple(int(i) for i in d_shape[:len(stride)]),
+                             tuple(int(i) for i in f_shape[:len(stride)]),
+                             stride)
 
     def windex_to_slice(self, window):
         """Convert x sides of window expression into slices to slice np."""
@@ -145,6 +145,70 @@ class CCTest(unittest.TestCase):
                                              decimal=1,
                                              verbose=True)
 
+    def test_vectorised(self):
+        """Check plaintext fast path matches the generic per window path."""
+        class Generic(CC):
+            def _is_vectorisable(self, x):
+                return False
+
+        data = np.random.rand(9, 7)
+        weights = np.random.rand(3, 2)
+        gradient = np.random.rand(9, 7)
+        fast = CC(weights=weights, stride=[2, 3], bias=self.bias)
+        generic = Generic(weights=weights, stride=[2, 3], bias=self.bias)
+        np.testing.assert_array_almost_equal(fast.forward(x=data),
+                                             generic.forward(x=data),
+                                             decimal=6,
+                                             verbose=True)
+        fast.backward(gradient=gradient)
+        generic.backward(gradient=gradient)
+        fast_grads = fast.gradients.pop()
+        generic_grads = generic.gradients.pop()
+        for key in ["dfdw", "dfdx", "dfdb"]:
+            np.testing.assert_array_almost_equal(fast_grads[key],
+                                                 generic_grads[key],
+                                                 decimal=6,
+                                                 verbose=True)
+
+    def test_batch(self):
+        """Check batched CC matches each example, averaging gradients."""
+        xs = np.random.rand(3, 7, 5)
+        gradients = np.random.rand(3, 7, 5)
+        batched = CC(weights=(3, 2), stride=[2, 3], bias=0.5)
+        cc = CC(weights=batched.weights, stride=[2, 3], bias=0.5)
+        activations = batched.forwards(xs)
+        dfdx = batched.backwards(gradients)
+        self.assertEqual(len(batched.gradients), 1)
+        for i in range(len(xs)):
+            np.testing.assert_array_almost_equal(activations[i],
+                                                 cc.forward(xs[i]),
+                                                 decimal=6, verbose=True)
+            np.testing.assert_array_almost_equal(dfdx[i],
+                                                 cc.backward(gradients[i]),
+                                                 decimal=6, verbose=True)
+        average = batched.gradients.pop()
+        for key in ["dfdw", "dfdb"]:
+            np.testing.assert_array_almost_equal(
+                average[key], np.mean([g[key] for g in cc.gradients], axis=0),
+                decimal=6, verbose=True)
+
+    def test_windex_array(self):
+        """Check array window index matches list windex and is shared."""
+        cc = CC()
+        bounds, slices = cc.windex_array((4, 5), (2, 2), [2, 1])
+        self.assertEqual(bounds.shape, (8, 2, 2))
+        self.assertEqual(bounds[1].tolist(), [[0, 2], [1, 3]])
+        self.assertEqual(slices[1], (slice(0, 2), slice(1, 3)))
+        windows = cc.windex((4, 5), (2, 2), [2, 1])
+        self.assertEqual(len(windows), len(slices))
+        self.assertEqual(list(map(cc.windex_to_slice, windows)), list(slices))
+        with self.assertWarns(DeprecationWarning):
+            self.assertEqual(cc.windex((4, 5), (2, 2), [2, 1], 0, []),
+                             windows)
+        # nodes with the same shapes share one result
+        other, _ = CC().windex_array((4, 5), (2, 2), np.array([2, 1]))
+        self.assertIs(bounds, other)
+
     def test_getstate_setstate(self):
         """Check setstate getstate functionality."""
         weights = self.filt
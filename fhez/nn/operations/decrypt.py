@@ -16,14 +16,56 @@ class Decrypt(Node):
         """Return no depth/ cost/ **0** of decryption."""
         return 0
 
+    def __init__(self, flatten=None):
+        """Configure decryptor.
+
+        :arg flatten: flatten decrypted examples to one dimension, such as
+            the (1, n) cyphertext of one example packed by
+            :class:`fhez.nn.operations.pack.Pack`, and unflatten gradients
+        :type flatten: bool
+        """
+        if flatten is not None:
+            self.flatten = flatten
+
+    @property
+    def flatten(self):
+        """Get if plaintext should be flattened to 1D flag."""
+        return self.__dict__.get("_flatten")
+
+    @flatten.setter
+    def flatten(self, flatten):
+        """Set if plaintext should be flattened to 1D."""
+        self._flatten = flatten
+
     def forward(self, x):
         """Decrypt cyphertext using numpy ufunc API."""
-        return np.array(x)
+        t = np.array(x)
+        if self.flatten:
+            self.original_shape = t.shape
+            t = t.flatten()
+        return t
 
     def backward(self, gradient):
-        """Pass gradients back unmodified."""
+        """Pass gradients back unmodified, unless flattened."""
+        if self.flatten:
+            return np.reshape(gradient, self.original_shape)
         return gradient
 
+    def forwards(self, xs):
+        """Decrypt a batch of cyphertexts using numpy ufunc API."""
+        t = np.array(xs)
+        if self.flatten:
+            self.original_shape = t.shape[1:]
+            t = np.reshape(t, (len(t), -1))
+        return t
+
+    def backwards(self, gradients):
+        """Pass gradients of a batch back unmodified, unless flattened."""
+        if self.flatten:
+            return np.reshape(gradients,
+                              (len(gradients),) + tuple(self.original_shape))
+        return gradients
+
     def update(self):
         """Do nothing as decryption has no deep-learning parameterisation."""
         return NotImplemented
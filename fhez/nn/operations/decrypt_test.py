@@ -66,3 +66,14 @@ class DecryptTest(unittest.TestCase):
         np.testing.assert_array_almost_equal(local_grad, grad,
                                              decimal=1,
                                              verbose=True)
+
+    def test_flatten(self):
+        """Check single packed example is flattened and gradient restored."""
+        x = np.random.rand(1, 10)
+        cyphertext = ReArray(x, **self.reseal_args)
+        node = Decrypt(flatten=True)
+        plaintext = node.forward(cyphertext)
+        np.testing.assert_array_almost_equal(plaintext, x.flatten(),
+                                             decimal=4,
+                                             verbose=True)
+        self.assertEqual(node.backward(np.ones(10)).shape, (1, 10))
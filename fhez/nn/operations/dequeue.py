@@ -78,6 +78,21 @@ class Dequeue(Node):
         """Accumulate inputs into a single queue, then return when full."""
         return np.sum(gradient, axis=0)  # we know gradients must add
         # this could theoretically cause problems if there is only one output
+
+    def forwards(self, xs):
+        """Distribute each output of a batch to respective outputs via yield.
+
+        .. warning::
+
+            This **YIELDS** like :meth:`forward`, each output being the
+            whole batch of that output.
+        """
+        for i in range(np.shape(xs)[1]):
+            yield xs[:, i]
+
+    def backwards(self, gradients):
+        """Accumulate batches of gradients from each output."""
+        return np.sum(gradients, axis=0)
         # but if forward only had one output then why the hell would you
         # dequeue. As such I am assuming there is always multiple gradients +
         # multiple forward outputs
@@ -88,6 +88,24 @@ class Enqueue(Node):
         for _ in range(len(queue)):
             yield queue.popleft()  # yield dequeued gradient FIFO
 
+    def forwards(self, xs):
+        """Stack each inputs batch into one batch of (batch, length, ...)."""
+        return np.stack(xs, axis=1)
+
+    def backwards(self, gradients):
+        """Distribute each inputs batch of gradients in order via yield.
+
+        .. warning::
+
+            This **YIELDS** like :meth:`backward`, each output being the
+            whole batch of gradients of that input.
+        """
+        msg = "length gradient ({}) != self.length ({})".format(
+            np.shape(gradients)[1], self.length)
+        assert np.shape(gradients)[1] == self.length, msg
+        for i in range(self.length):
+            yield gradients[:, i]
+
     def update(self):
         """Update nothing as enqueueing is not parameterisable."""
         return NotImplemented
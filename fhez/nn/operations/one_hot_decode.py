@@ -36,6 +36,18 @@ class OneHotDecode(Node, Serialise):
         x = self.inputs.pop()
         return x * gradient
 
+    def forwards(self, xs):
+        """Decode a batch of sparse matrices to their classes."""
+        self.inputs.append(xs)
+        return np.argmax(xs, axis=-1)
+
+    def backwards(self, gradients):
+        """Map the gradient of each example of a batch backward."""
+        x = np.array(self.inputs.pop())
+        gradients = np.array(gradients)
+        return x * np.reshape(gradients, np.shape(gradients) + (1,) * (
+            x.ndim - np.ndim(gradients)))
+
     def update(self):
         """Do nothing as nothing to update."""
         return NotImplemented
@@ -55,6 +55,17 @@ class OneHotEncode(Node, Serialise):
         x = self.inputs.pop()
         return gradient[x]
 
+    def forwards(self, xs):
+        """Encode a batch of inputs to a batch of sparse matrices."""
+        targets = np.reshape(xs, -1)
+        self.inputs.append(targets)
+        return np.eye(self.length)[targets]
+
+    def backwards(self, gradients):
+        """Map only the gradient of each examples encoded class backward."""
+        targets = self.inputs.pop()
+        return np.array(gradients)[np.arange(len(targets)), targets]
+
     def update(self):
         """Do nothing as nothing to update."""
         return NotImplemented
@@ -0,0 +1,58 @@
+"""Pack a list of values into one array of examples as computational node."""
+# @Author: George Onoufriou <archer>
+# @Date:   2021-11-02T10:31:08+00:00
+# @Last modified by:   archer
+# @Last modified time: 2021-11-02T10:31:08+00:00
+
+import numpy as np
+from fhez.nn.operations.rotate import Rotate
+
+
+class Pack(Rotate):
+    """Pack enqueued values into one (batch, n) array of examples.
+
+    Enqueued values, such as the sum of each window of a convolution, arrive
+    as a list with one (possibly encrypted) value each. Pack turns them into
+    one example of n features, re-encrypting them all into a single
+    cyphertext if given a provider or encryptor as :class:`Rotate` would, so
+    the next node, such as :class:`fhez.nn.layer.dense.Dense`, can work on
+    every value at once with one encrypted matrix product.
+
+    Without a provider or encryptor values are decrypted, if need be, and
+    returned as a flat plaintext array.
+    """
+
+    def __init__(self, encryptor=None, provider=None, **kwargs):
+        """Configure provider and encryption parameters, as Rotate."""
+        super().__init__(axis=0, encryptor=encryptor, provider=provider,
+                         **kwargs)
+
+    @property
+    def is_encrypting(self):
+        """Get if values will be encrypted."""
+        return self.provider is not None or self.encryptor is not None
+
+    def forward(self, x):
+        """Pack list of n values into one (1, n) example, or plaintext (n,)."""
+        t = np.array(x)  # cyphertexts will decrypt here
+        self.original_shape = t.shape
+        if not self.is_encrypting:
+            return np.reshape(t, (-1,))
+        return self._rotate(np.reshape(t, (1, -1)), axis=0)
+
+    def forwards(self, xs):
+        """Pack batch of enqueued values into one (batch, n) array."""
+        t = np.array(xs)
+        self.original_shape = t.shape[1:]
+        return self._rotate(np.reshape(t, (len(t), -1)), axis=0,
+                            batched=True)
+
+    def backward(self, gradient):
+        """Unpack gradient back into the shape of the enqueued values."""
+        return np.reshape(np.array(gradient), self.original_shape)
+
+    def backwards(self, gradients):
+        """Unpack batch of gradients into the shape of the enqueued values."""
+        gradients = np.array(gradients)
+        return np.reshape(gradients,
+                          (len(gradients),) + tuple(self.original_shape))
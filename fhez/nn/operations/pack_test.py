@@ -0,0 +1,85 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-11-02T10:31:08+00:00
+# @Last modified by:   archer
+# @Last modified time: 2021-11-02T10:31:08+00:00
+
+import time
+import unittest
+import numpy as np
+from fhez.rearray import ReArray
+from fhez.nn.operations.pack import Pack
+
+
+class PackTest(unittest.TestCase):
+    """Test pack operation node."""
+
+    @property
+    def data(self):
+        """Get some generated enqueued values."""
+        return list(np.random.rand(36))
+
+    @property
+    def reseal_args(self):
+        """Get some reseal arguments for encryption."""
+        return {
+            "scheme": 2,  # seal.scheme_type.CKK,
+            "poly_modulus_degree": 8192*2,  # 438
+            # "coefficient_modulus": [60, 40, 40, 60],
+            "coefficient_modulus":
+                [45, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 45],
+            "scale": pow(2.0, 30),
+            "cache": True,
+        }
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.startTime = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.startTime
+        print('%s: %.3f' % (self.id(), t))
+
+    def test_forward(self):
+        """Check enqueued values are packed into one cyphertext example."""
+        x = self.data
+        node = Pack(provider=ReArray, **self.reseal_args)
+        cyphertext = node.forward(x)
+        self.assertIsInstance(cyphertext, ReArray)
+        self.assertEqual(cyphertext.shape, (1, len(x)))
+        np.testing.assert_array_almost_equal(np.array(cyphertext),
+                                             np.array([x]),
+                                             decimal=4,
+                                             verbose=True)
+
+    def test_forward_plaintext(self):
+        """Check unconfigured pack flattens values into plaintext."""
+        x = self.data
+        node = Pack()
+        plaintext = node.forward(x)
+        self.assertIsInstance(plaintext, np.ndarray)
+        np.testing.assert_array_equal(plaintext, np.array(x))
+
+    def test_forwards(self):
+        """Check batch of enqueued values are packed one example each."""
+        xs = np.random.rand(5, 36)
+        node = Pack(provider=ReArray, **self.reseal_args)
+        cyphertext = node.forwards(xs)
+        self.assertIsInstance(cyphertext, ReArray)
+        np.testing.assert_array_almost_equal(np.array(cyphertext), xs,
+                                             decimal=4,
+                                             verbose=True)
+
+    def test_backward(self):
+        """Check gradients are unpacked back to the enqueued shape."""
+        node = Pack()
+        node.forward(np.random.rand(6, 6))
+        gradient = node.backward(np.random.rand(1, 36))
+        self.assertEqual(gradient.shape, (6, 6))
+
+    def test_backwards(self):
+        """Check batch of gradients are unpacked back to enqueued shape."""
+        node = Pack()
+        node.forwards(np.random.rand(5, 6, 6))
+        gradients = node.backwards(np.random.rand(5, 36))
+        self.assertEqual(gradients.shape, (5, 6, 6))
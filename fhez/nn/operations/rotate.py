@@ -138,6 +138,24 @@ class Rotate(Node):
             # TODO: record original shape in a queue so it can mutate
             self.original_shape = t.shape
             t = t.flatten()
+        return self._rotate(t, axis=self.axis)
+
+    def forwards(self, xs):
+        """Rotate keys of a batch of examples on the desired axis.
+
+        As :meth:`forward`, but each example is along the leading axis, so an
+        axis 0 encryptor encrypts the whole batch at once.
+        """
+        t = np.array(xs)
+        if self.sum_axis is not None:
+            t = np.sum(t, axis=self.sum_axis + 1)
+        if self.flatten is not None:
+            self.original_shape = t.shape[1:]
+            t = np.reshape(t, (len(t), -1))
+        return self._rotate(t, axis=self.axis, batched=True)
+
+    def _rotate(self, t, axis, batched=False):
+        """Encrypt t on axis, offset by the batch axis if batched."""
         if self.provider is None and self.encryptor is None:
             # in the case where no encryption provider has been specified
             # assume we are to just leave it as a plaintext
@@ -152,16 +170,18 @@ class Rotate(Node):
                 self.encryptor = self.provider(np.array([1]),
                                                **self.parameters)
 
-        if self.axis == 0:
+        if axis == 0:
             return self.encryptor(t)
-        elif self.axis == 1:
+        elif axis == 1:
+            # each batched encryption is of that axis over every example
+            t = np.moveaxis(t, 1, 0) if batched else t
             accumulator = []
             for i in range(len(t)):
                 accumulator.append(self.encryptor(t[i]))
             return accumulator
         else:
             raise ValueError("{}.forward() got unsupported axis {}, {}".format(
-                self.__class__.__name__, self.axis, type(self.axis)))
+                self.__class__.__name__, axis, type(axis)))
         # cyphertext = self.provider(x, **self.parameters)
         # return cyphertext
 
@@ -171,6 +191,13 @@ class Rotate(Node):
             return np.reshape(gradient, self.original_shape)
         return gradient
 
+    def backwards(self, gradients):
+        """Pass gradients of a batch back unmodified."""
+        if self.flatten is not None:
+            return np.reshape(gradients,
+                              (len(gradients),) + tuple(self.original_shape))
+        return gradients
+
     def update(self):
         """Do nothing as encryption has no deep-learning parameterisation."""
         return NotImplemented
@@ -49,6 +49,15 @@ class Selector(Node):
             else:
                 return t
 
+    def forwards(self, xs):
+        """Select batches of inputs to pass forward, as with forward."""
+        # selection is over inputs not examples so batches are no different
+        return self.forward(xs)
+
+    def backwards(self, gradients):
+        """Select batches of gradients to pass backward, as with backward."""
+        return self.backward(gradients)
+
     @property
     def cost(self):
         """Get computational cost of this node."""
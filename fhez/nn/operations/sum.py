@@ -32,6 +32,17 @@ class Sum(Node):
         distributed = np.broadcast_to(grad, shp)
         return distributed
 
+    def forwards(self, xs):
+        """Sum each example of a batch, assuming first dim is the batch."""
+        self.inputs.append(np.shape(xs))
+        return np.sum(xs, axis=tuple(range(1, np.ndim(xs))))
+
+    def backwards(self, gradients):
+        """Distribute each examples gradient to its inputs."""
+        shp = self.inputs.pop()
+        grad = np.reshape(gradients, (shp[0],) + (1,) * (len(shp) - 1))
+        return np.broadcast_to(grad, shp)
+
     def update(self):
         """Do nothing since sum is not parameterisable."""
         return NotImplemented
@@ -0,0 +1,118 @@
+"""Adam fused over one flat buffer of every parameter in a graph."""
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-29T15:52:08+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-29T15:52:08+01:00
+
+import numpy as np
+from fhez.nn.graph.node import Node
+from fhez.nn.optimiser.adam import Adam
+
+
+class FusedAdam(Adam):
+    """Adam updating every parameter of a graph in one vectorised step.
+
+    Registering a graph copies the parameters of each of its nodes into one
+    contiguous buffer, with matching gradient and moment buffers, and gives
+    the nodes views into it in place of their own arrays. Each :meth:`step`
+    then gathers the nodes averaged gradients into the gradient buffer, and
+    updates every parameter with a handful of whole buffer operations,
+    rather than a python loop of dictionaries per node and parameter.
+
+    Every parameter shares one iteration count, so unlike :class:`Adam`
+    parameters without a gradient in a step still have their moments
+    decayed, as if their gradient were zero. Parameters also keep their
+    shape, a gradient broadcast over more elements than its parameter, such
+    as the per element gradients of a scalar RELU q, is summed back into it.
+    """
+
+    @property
+    def entries(self):
+        """Get list of (node, name, slice, shape) of each parameter."""
+        if self.__dict__.get("_entries") is None:
+            self._entries = []
+        return self._entries
+
+    def register(self, graph):
+        """Move every parameter of every node in graph into flat buffers.
+
+        :arg graph: neural network graph to optimise
+        :type graph: networkx.MultiDiGraph
+        """
+        entries = []
+        values = []
+        start = 0
+        for (_, data) in graph.nodes(data=True):
+            node = data.get("node")
+            if not isinstance(node, Node):
+                continue
+            for name in node.parameter_names:
+                value = np.asarray(getattr(node, name), dtype=float)
+                entries.append((node, name,
+                                slice(start, start + value.size),
+                                value.shape))
+                values.append(value.ravel())
+                start += value.size
+        self.parameters = np.concatenate(values) if values else np.zeros(0)
+        self.gradients = np.zeros_like(self.parameters)
+        self.m = np.zeros_like(self.parameters)
+        self.v = np.zeros_like(self.parameters)
+        self.t = 0
+        self._entries = entries
+        self._views = []
+        for (node, name, span, shape) in entries:
+            view = self.parameters[span].reshape(shape)
+            setattr(node, name, view)
+            self._views.append(view)
+
+    def step(self):
+        """Update every registered parameter with its nodes gradients."""
+        self.apply(self.gather())
+
+    def gather(self):
+        """Get flat buffer of every registered nodes averaged gradients.
+
+        Popping the gradients of the nodes as :meth:`Node.updates` would.
+        """
+        gradients = self.gradients
+        gradients[...] = 0
+        averages = {}
+        for ((node, name, span, shape), view) in zip(self.entries,
+                                                     self._views):
+            if getattr(node, name) is not view:
+                # parameter was replaced, so take it back into the buffer
+                self.parameters[span] = np.ravel(getattr(node, name))
+                setattr(node, name, view)
+            if id(node) not in averages:
+                averages[id(node)] = node.average_gradients()
+            gradient = averages[id(node)].get("dfd{}".format(name))
+            if gradient is not None:
+                gradients[span] = _unbroadcast(gradient, shape).ravel()
+        return gradients
+
+    def apply(self, gradients):
+        """Update every registered parameter in one vectorised Adam step.
+
+        :arg gradients: flat buffer of gradients laid out as the parameters
+        :type gradients: numpy.ndarray
+        """
+        self.t += 1
+        self.m *= self.beta_1
+        self.m += (1 - self.beta_1) * gradients
+        self.v *= self.beta_2
+        self.v += (1 - self.beta_2) * np.square(gradients)
+        m_hat = self.m / (1 - self.beta_1 ** self.t)
+        v_hat = self.v / (1 - self.beta_2 ** self.t)
+        self.parameters -= (self.alpha * m_hat) / (np.sqrt(v_hat) +
+                                                   self.epsilon)
+
+
+def _unbroadcast(gradient, shape):
+    """Sum gradient over any axes it was broadcast along to get shape."""
+    gradient = np.asarray(gradient, dtype=float)
+    while gradient.ndim > len(shape):
+        gradient = gradient.sum(axis=0)
+    for (axis, size) in enumerate(shape):
+        if size == 1 and gradient.shape[axis] != 1:
+            gradient = gradient.sum(axis=axis, keepdims=True)
+    return np.broadcast_to(gradient, shape)
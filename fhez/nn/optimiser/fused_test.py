@@ -0,0 +1,89 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-29T15:52:08+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-29T15:52:08+01:00
+
+import copy
+import time
+import unittest
+import numpy as np
+import networkx as nx
+
+from fhez.nn.optimiser.fused import FusedAdam
+from fhez.nn.layer.dense import Dense
+from fhez.nn.graph.utils import train
+from fhez.nn.graph.prefab import cnn_classifier
+
+
+class FusedAdamTest(unittest.TestCase):
+    """Test Adam fused over a flat parameter buffer."""
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.start_time = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.start_time
+        print('%s: %.3f' % (self.id(), t))
+
+    def test_register(self):
+        """Check nodes parameters become views of one buffer."""
+        graph = cnn_classifier(10, dense=True)
+        weights = graph.nodes["Dense"]["node"].weights.copy()
+        optimiser = FusedAdam()
+        optimiser.register(graph)
+        size = sum(np.size(getattr(node, name))
+                   for (node, name, _, _) in optimiser.entries)
+        self.assertEqual(optimiser.parameters.size, size)
+        for (node, name, span, shape) in optimiser.entries:
+            self.assertEqual(np.shape(getattr(node, name)), shape)
+            self.assertTrue(np.shares_memory(getattr(node, name),
+                                             optimiser.parameters))
+        np.testing.assert_array_equal(graph.nodes["Dense"]["node"].weights,
+                                      weights)
+
+    def test_step(self):
+        """Check fused steps match each node updating with its own Adam."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("a", node=Dense(weights=(4, 3)))
+        graph.add_node("b", node=Dense(weights=(3, 2)))
+        fused = copy.deepcopy(graph)
+        optimiser = FusedAdam()
+        optimiser.register(fused)
+        np.random.seed(0)
+        for _ in range(3):
+            for name in ["a", "b"]:
+                x = np.random.rand(graph.nodes[name]["node"].weights.shape[0])
+                g = np.random.rand(graph.nodes[name]["node"].weights.shape[1])
+                for g_ in [graph, fused]:
+                    g_.nodes[name]["node"].forward(x)
+                    g_.nodes[name]["node"].backward(g)
+            for (_, data) in graph.nodes(data=True):
+                data["node"].updates()
+            optimiser.step()
+        for name in ["a", "b"]:
+            for parameter in ["weights", "bias"]:
+                np.testing.assert_array_almost_equal(
+                    getattr(fused.nodes[name]["node"], parameter),
+                    getattr(graph.nodes[name]["node"], parameter),
+                    decimal=6,
+                    verbose=True)
+            self.assertEqual(len(fused.nodes[name]["node"].gradients), 0)
+
+    def test_train(self):
+        """Check graph trains with one fused optimiser."""
+        graph = cnn_classifier(10, dense=True)
+        weights = graph.nodes["Dense"]["node"].weights.copy()
+        inputs = {
+            "x": np.random.rand(6, 28, 28),
+            "y": np.array([1, 2, 3, 4, 5, 6])
+        }
+        optimiser = FusedAdam()
+        train(graph=graph, inputs=inputs, batch_size=3, optimiser=optimiser)
+        self.assertEqual(optimiser.t, 2)
+        self.assertTrue(np.shares_memory(graph.nodes["Dense"]["node"].weights,
+                                         optimiser.parameters))
+        self.assertFalse(np.allclose(graph.nodes["Dense"]["node"].weights,
+                                     weights))
+        self.assertEqual(np.shape(graph.nodes["CNN-RELU"]["node"].q), ())
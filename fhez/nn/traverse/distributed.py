@@ -0,0 +1,383 @@
+"""Distributed traversal, firing partitions of a graph on worker processes."""
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-27T14:21:09+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-27T14:21:09+01:00
+
+import abc
+import types
+import pickle
+import itertools
+import threading
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+from concurrent.futures import Executor, Future
+from fhez.nn.traverse.firing import Firing, _fire
+
+
+class Codec(abc.ABC):
+    """Abstract encoding of messages to and from bytes for a transport."""
+
+    @abc.abstractmethod
+    def encode(self, message):
+        """Get bytes of message."""
+
+    @abc.abstractmethod
+    def decode(self, data: bytes):
+        """Get message back from its bytes."""
+
+
+class PickleCodec(Codec):
+    """Encode messages as pickles, the default codec of every transport.
+
+    Pickles serialise cyphertexts and SEAL objects with SEALs own binary
+    serialisation, but unpickling can run arbitrary code, so this codec must
+    only be used between trusted peers, such as local processes.
+    """
+
+    def encode(self, message):
+        """Get pickled bytes of any picklable message."""
+        return pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: bytes):
+        """Unpickle message, only ever from a trusted peer."""
+        return pickle.loads(data)
+
+
+class Transport(abc.ABC):
+    """Abstract bidirectional message transport between two processes.
+
+    Messages are encoded to bytes by the transports :class:`Codec`, so
+    implementations only need to move bytes, such as over pipes, sockets,
+    or a real network.
+
+    .. warning::
+
+        The default :class:`PickleCodec` trusts whoever is on the other end,
+        as decoding a malicious message can run arbitrary code. Only trusted
+        local peers are supported with it, anything else needs a codec that
+        is safe to decode untrusted bytes, and a transport that
+        authenticates its peer.
+    """
+
+    @abc.abstractmethod
+    def send_bytes(self, data: bytes):
+        """Send one whole message of bytes."""
+
+    @abc.abstractmethod
+    def recv_bytes(self):
+        """Receive one whole message of bytes, blocking until it arrives."""
+
+    @abc.abstractmethod
+    def close(self):
+        """Close this end of the transport."""
+
+    @property
+    def codec(self):
+        """Get codec of messages, defaulting to :class:`PickleCodec`."""
+        if self.__dict__.get("_codec") is None:
+            self._codec = PickleCodec()
+        return self._codec
+
+    @codec.setter
+    def codec(self, codec):
+        """Set codec of messages."""
+        self._codec = codec
+
+    def send(self, message):
+        """Send message encoded by codec."""
+        self.send_bytes(self.codec.encode(message))
+
+    def recv(self):
+        """Receive next message decoded by codec."""
+        return self.codec.decode(self.recv_bytes())
+
+
+class ConnectionTransport(Transport):
+    """Transport over a :class:`multiprocessing.connection.Connection`."""
+
+    def __init__(self, connection, codec: Codec = None):
+        """Wrap connection, such as either end of a pipe or socket.
+
+        :arg codec: codec of messages, defaults to :class:`PickleCodec`
+        :type codec: Codec
+        """
+        self.connection = connection
+        self.codec = codec
+
+    def send_bytes(self, data: bytes):
+        """Send one whole message of bytes."""
+        self.connection.send_bytes(data)
+
+    def recv_bytes(self):
+        """Receive one whole message of bytes, blocking until it arrives."""
+        return self.connection.recv_bytes()
+
+    def close(self):
+        """Close this end of the connection."""
+        self.connection.close()
+
+
+def pipe(codec: Codec = None):
+    """Get (coordinator, worker) transports over a local pipe."""
+    a, b = multiprocessing.Pipe()
+    return ConnectionTransport(a, codec), ConnectionTransport(b, codec)
+
+
+def local_socket(codec: Codec = None):
+    """Get (coordinator, worker) transports over a localhost socket."""
+    with Listener(("localhost", 0)) as listener:
+        client = Client(listener.address)
+        server = listener.accept()
+    return ConnectionTransport(server, codec), ConnectionTransport(client,
+                                                                   codec)
+
+
+def _serve(transport, nodes):
+    """Call methods of nodes as requested over transport, until None.
+
+    Requests are (ticket, node name, method name, args) and are answered
+    with (ticket, result, error). Receptors are fired as by
+    :func:`fhez.nn.traverse.firing._fire`, with generators exhausted into
+    lists so they can be sent back.
+    """
+    while True:
+        request = transport.recv()
+        if request is None:
+            break
+        ticket, name, method, args = request
+        try:
+            if method == "__dict__":
+                result = dict(nodes[name].__dict__)
+            elif method == "_fire":
+                receptor, signal, profile = args
+                activation, _, _, timing = _fire(
+                    getattr(nodes[name], receptor), signal, profile=profile)
+                is_generator = isinstance(activation, types.GeneratorType)
+                if is_generator:
+                    activation = list(activation)
+                result = (activation, is_generator, None, timing)
+            else:
+                result = getattr(nodes[name], method)(*args)
+            transport.send((ticket, result, None))
+        except Exception as e:
+            transport.send((ticket, None, e))
+    transport.close()
+
+
+class Cluster(Executor):
+    """Executor firing each partition of a graph on its own worker process.
+
+    Each worker is sent the nodes of its partition once when started, so
+    their parameters stay loaded there, and is then only sent the signals of
+    the nodes it should fire. Nodes that are not in any partition, and
+    anything other than firing a node, run in the calling process.
+    Use with :class:`DistributedFiring`, or as the executor of
+    :class:`fhez.nn.traverse.firing.Firing` over the same graph or its
+    reverse, so forward and backward passes fire the same remote nodes.
+    """
+
+    def __init__(self, graph=None, partitions: dict = None, transport=None,
+                 context=None):
+        """Initialise cluster of graph, started on first use.
+
+        :arg graph: neural network graph whose nodes to distribute
+        :type graph: networkx.MultiDiGraph
+        :arg partitions: dictionary of node names to the worker, of any
+            hashable name, that should own them
+        :type partitions: dict
+        :arg transport: function returning a new pair of (coordinator, worker)
+            :class:`Transport`, defaults to :func:`pipe`, such as
+            functools.partial(local_socket, codec=codec) to replace its codec
+        :arg context: multiprocessing context or start method name
+        """
+        self.graph = graph
+        self.partitions = partitions if partitions is not None else {}
+        self.transport = transport if transport is not None else pipe
+        self.context = context
+
+    @property
+    def workers(self):
+        """Get dictionary of started workers to their process and transport."""
+        if self.__dict__.get("_workers") is None:
+            self._workers = {}
+        return self._workers
+
+    def start(self):
+        """Start a worker process for every partition."""
+        if len(self.workers) > 0:
+            return
+        context = self.context
+        if context is None or isinstance(context, str):
+            context = multiprocessing.get_context(context)
+        self._owners = {}
+        self._futures = {}
+        self._lost = {}
+        self._tickets = itertools.count()
+        self._lock = threading.Lock()
+        self._sending = threading.Lock()
+        members = {}
+        for (name, worker) in self.partitions.items():
+            node = self.graph.nodes[name]["node"]
+            self._owners[id(node)] = (worker, name)
+            members.setdefault(worker, {})[name] = node
+        for (worker, nodes) in members.items():
+            local, remote = self.transport()
+            process = context.Process(target=_serve, args=(remote, nodes),
+                                      daemon=True)
+            process.start()
+            remote.close()
+            reader = threading.Thread(target=self._read,
+                                      args=(worker, local), daemon=True)
+            reader.start()
+            self.workers[worker] = (process, local, reader)
+
+    def _read(self, worker, transport):
+        """Resolve futures with the replies of a worker as they arrive.
+
+        Once the connection to the worker is lost every future still waiting
+        on it fails, as does every later request to it.
+        """
+        while True:
+            try:
+                ticket, result, error = transport.recv()
+            except (EOFError, OSError) as e:
+                self._lose(worker, e)
+                return
+            with self._lock:
+                (_, future) = self._futures.pop(ticket, (None, None))
+            if future is None:
+                continue  # already failed by a lost send
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _lose(self, worker, cause):
+        """Fail every pending future of worker whose connection was lost."""
+        error = ConnectionError("lost connection to worker {}: {}".format(
+            worker, repr(cause)))
+        with self._lock:
+            self._lost[worker] = error
+            tickets = [ticket for (ticket, (owner, _)) in
+                       self._futures.items() if owner == worker]
+            futures = [self._futures.pop(ticket)[1] for ticket in tickets]
+        for future in futures:
+            future.set_exception(error)
+
+    def _request(self, worker, name, method, args):
+        """Send request to worker, returning future of its reply."""
+        future = Future()
+        with self._lock:
+            if worker in self._lost:
+                # fail fast rather than wait on a worker that is gone
+                future.set_exception(self._lost[worker])
+                return future
+            ticket = next(self._tickets)
+            self._futures[ticket] = (worker, future)
+        # never hold the lock the reader needs while a send may block
+        try:
+            with self._sending:
+                self.workers[worker][1].send((ticket, name, method, args))
+        except (EOFError, OSError) as e:
+            self._lose(worker, e)
+        return future
+
+    def submit(self, fn, *args, **kwargs):
+        """Fire node on the worker that owns it, else call fn locally."""
+        self.start()
+        owner = None
+        if fn is _fire and not kwargs:
+            method, signal = args[0], args[1]
+            owner = self._owners.get(id(getattr(method, "__self__", None)))
+        if owner is None:
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        worker, name = owner
+        profile = args[3] if len(args) > 3 else False
+        return self._request(worker, name, "_fire",
+                             (method.__name__, signal, profile))
+
+    def call(self, node_name, method: str, *args):
+        """Call method of a remote node with args, and get its result."""
+        self.start()
+        worker = self.partitions[node_name]
+        return self._request(worker, node_name, method, args).result()
+
+    def updates(self):
+        """Update every remote node with its averaged gradients."""
+        futures = [self._request(worker, name, "updates", ())
+                   for (name, worker) in self.partitions.items()]
+        for future in futures:
+            future.result()
+
+    def pull(self):
+        """Copy state of every remote node back onto the local graph nodes."""
+        for name in self.partitions:
+            state = self.call(name, "__dict__")
+            self.graph.nodes[name]["node"].__dict__.update(state)
+
+    def shutdown(self, wait=True, **kwargs):
+        """Stop every worker process."""
+        if len(self.workers) == 0:
+            return
+        with self._lock:
+            lost = set(self._lost)
+        for (worker, (process, transport, reader)) in self.workers.items():
+            if worker in lost:
+                # cannot be asked to stop, but may still be running
+                process.terminate()
+                continue
+            try:
+                transport.send(None)
+            except (EOFError, OSError) as e:
+                self._lose(worker, e)
+                process.terminate()
+        for (process, transport, reader) in self.workers.values():
+            process.join()
+            transport.close()
+            reader.join()
+        self._workers = {}
+
+
+class DistributedFiring(Firing):
+    """Neuronal firing with partitions of the graph fired by worker processes.
+
+    Independent nodes fire concurrently, as with any executor, with signals
+    of remote nodes sent to and from their workers over a
+    :class:`Transport`, which can be swapped for one over a real network.
+    """
+
+    def __init__(self, graph=None, partitions: dict = None, transport=None,
+                 cluster: Cluster = None, context=None, **kwargs):
+        """Initialise firing of graph with a new or existing cluster.
+
+        :arg partitions: dictionary of node names to worker that owns them
+        :type partitions: dict
+        :arg transport: see :class:`Cluster`
+        :arg cluster: existing cluster to share, such as between a forward
+            and backward firing, else one is created and owned
+        :type cluster: Cluster
+        """
+        super().__init__(graph=graph, **kwargs)
+        if cluster is None:
+            cluster = Cluster(graph=graph, partitions=partitions,
+                              transport=transport, context=context)
+        self.executor = cluster
+
+    def close(self):
+        """Stop the clusters workers."""
+        self.executor.shutdown()
+
+    def __enter__(self):
+        """Start cluster for use as a context manager."""
+        self.executor.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop the clusters workers."""
+        self.close()
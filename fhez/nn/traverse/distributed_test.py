@@ -0,0 +1,184 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-27T14:21:09+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-27T14:21:09+01:00
+
+import os
+import copy
+import functools
+import time
+import unittest
+import numpy as np
+import networkx as nx
+
+from fhez.nn.graph.io import IO
+from fhez.nn.graph.prefab import cnn_classifier
+from fhez.nn.traverse.firing import Firing
+from fhez.nn.traverse.distributed import (Cluster, DistributedFiring,
+                                          PickleCodec, local_socket)
+
+
+class Pid(IO):
+    """IO node that returns the process it fired in."""
+
+    def forward(self, x):
+        """Get process id."""
+        return os.getpid()
+
+
+class Crash(IO):
+    """IO node that kills the process it fires in."""
+
+    def forward(self, x):
+        """Exit without replying."""
+        os._exit(1)
+
+
+class Tagged(PickleCodec):
+    """Codec that tags messages so any other codec cannot decode them."""
+
+    def encode(self, message):
+        """Get tagged pickle of message."""
+        return b"tag" + super().encode(message)
+
+    def decode(self, data: bytes):
+        """Untag and unpickle message."""
+        if not data.startswith(b"tag"):
+            raise ValueError("untagged message")
+        return super().decode(data[3:])
+
+
+class DistributedTest(unittest.TestCase):
+    """Test distributed traversal over local worker processes."""
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.start_time = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.start_time
+        print('%s: %.3f' % (self.id(), t))
+
+    @property
+    def data_shape(self):
+        """Define desired data shape."""
+        return (28, 28)
+
+    @property
+    def partitions(self):
+        """Get partitions of cnn classifier across workers."""
+        return {"CC-products": "cnn", "CNN-RELU": "cnn", "Dense": "dense",
+                "Dense-RELU": "dense", "Softmax": "head"}
+
+    def test_stimulate(self):
+        """Check distributed firing matches local firing on each transport."""
+        graph = cnn_classifier(10, dense=True)
+        x = np.random.rand(*self.data_shape)
+        truth = Firing(graph=graph).stimulate(neurons=["x", "y"],
+                                              signals=[x, 3])
+        for transport in [None, local_socket]:
+            with DistributedFiring(graph=graph, partitions=self.partitions,
+                                   transport=transport) as f:
+                self.assertEqual(len(f.executor.workers), 3)
+                out = f.stimulate(neurons=["x", "y"], signals=[x, 3])
+            for key, value in truth.items():
+                np.testing.assert_array_almost_equal(out[key], value,
+                                                     decimal=4,
+                                                     verbose=True)
+
+    def test_placement(self):
+        """Check nodes fire in the process of their partition."""
+        graph = nx.MultiDiGraph()
+        for name in ["a", "b", "c"]:
+            graph.add_node(name, node=Pid())
+        graph.add_edge("a", "b")
+        graph.add_edge("a", "c")
+        with DistributedFiring(graph=graph,
+                               partitions={"b": 0, "c": 1}) as f:
+            out = f.stimulate(neurons=["a"], signals=[None])
+            pids = {w: p.pid for (w, (p, _, _)) in f.executor.workers.items()}
+        self.assertEqual(out, {"b": pids[0], "c": pids[1]})
+
+    def test_train(self):
+        """Check training remote nodes matches training them locally."""
+        graph = cnn_classifier(10, dense=True)
+        remote = copy.deepcopy(graph)
+        x = np.random.rand(*self.data_shape)
+        out = Firing(graph=graph).stimulate(neurons=["x", "y"],
+                                            signals=[x, 3])
+        Firing(graph=graph.reverse(copy=False)).stimulate(
+            neurons=list(out.keys()), signals=list(out.values()),
+            receptor="backward")
+        for (_, data) in graph.nodes(data=True):
+            data["node"].updates()
+        with Cluster(graph=remote, partitions=self.partitions) as cluster:
+            forward = DistributedFiring(graph=remote, cluster=cluster)
+            backward = DistributedFiring(graph=remote.reverse(copy=False),
+                                         cluster=cluster)
+            out = forward.stimulate(neurons=["x", "y"], signals=[x, 3])
+            backward.stimulate(neurons=list(out.keys()),
+                               signals=list(out.values()),
+                               receptor="backward")
+            cluster.updates()
+            for (name, data) in remote.nodes(data=True):
+                if name not in self.partitions:
+                    data["node"].updates()
+            # local copies are stale until pulled back from their workers
+            cluster.pull()
+        for name in ["CC-products", "Dense"]:
+            np.testing.assert_array_almost_equal(
+                remote.nodes[name]["node"].weights,
+                graph.nodes[name]["node"].weights,
+                decimal=4,
+                verbose=True)
+
+    def test_error(self):
+        """Check errors in workers are raised by the coordinator."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", node=IO())
+        graph.add_node("y", node=IO())
+        graph.add_edge("x", "y")
+        with DistributedFiring(graph=graph, partitions={"y": 0}) as f:
+            with self.assertRaises(ValueError):
+                f.stimulate(neurons=["x"], signals=[np.inf])
+            with self.assertRaises(AttributeError):
+                f.executor.call("y", "nonexistent")
+            self.assertEqual(f.stimulate(neurons=["x"], signals=[1]),
+                             {"y": 1})
+
+    def test_lost(self):
+        """Check losing a worker fails its requests instead of hanging."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", node=IO())
+        graph.add_node("y", node=Crash())
+        graph.add_node("z", node=IO())
+        graph.add_edge("x", "y")
+        graph.add_edge("x", "z")
+        with DistributedFiring(graph=graph,
+                               partitions={"y": 0, "z": 1}) as f:
+            with self.assertRaises(ConnectionError):
+                f.stimulate(neurons=["x"], signals=[1])
+            # later requests to the lost worker fail straight away
+            with self.assertRaises(ConnectionError):
+                f.executor.call("y", "__dict__")
+            # while the other worker carries on
+            self.assertEqual(f.executor.call("z", "forward", 2), 2)
+
+    def test_codec(self):
+        """Check transports encode messages with their given codec."""
+        coordinator, worker = local_socket(codec=Tagged())
+        coordinator.send({"x": np.arange(3)})
+        self.assertEqual(worker.recv_bytes()[:3], b"tag")
+        coordinator.close()
+        worker.close()
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", node=IO())
+        graph.add_node("y", node=Pid())
+        graph.add_edge("x", "y")
+        transport = functools.partial(local_socket, codec=Tagged())
+        with DistributedFiring(graph=graph, partitions={"y": 0},
+                               transport=transport) as f:
+            out = f.stimulate(neurons=["x"], signals=[1])
+            pid = f.executor.workers[0][0].pid
+        self.assertEqual(out, {"y": pid})
@@ -5,18 +5,88 @@
 # @Last modified time: 2021-10-05T10:59:48+01:00
 
 import logging as logger
+import os
+import threading
 import types
 import itertools
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import numpy as np
+import networkx as nx
 from fhez.nn.traverse.traverser import Traverser
+from fhez.nn.traverse.profiler import Profiler
+
+
+Plan = namedtuple("Plan", ["graph", "signature", "names", "index",
+                           "methods", "inputs", "outputs", "edges",
+                           "targets"])
+Plan.__doc__ = """Compiled, topologically ordered, execution plan of a graph.
+
+Every list is positional with ``names``; ``inputs`` and ``outputs`` are the
+slot indices of each nodes in and out edges, into ``edges`` the data
+dictionaries of each edge, and ``targets`` the index of the node each edge
+leads to. ``graph`` and ``signature`` are kept so the plan can be checked
+against the graph it was compiled from.
+"""
+
+
+def _signature(graph):
+    """Get hash of the edges of graph and the identity of each node object.
+
+    Changes whenever an edge is added, removed, or rewired, or a node object
+    is added, removed, or replaced, even if the number of each stays the same.
+    """
+    return hash((tuple(graph.edges(keys=True)),
+                 tuple((name, id(data.get("node")))
+                       for (name, data) in graph.nodes(data=True))))
+
+
+def _fire(method, signal, cache=None, profile=False):
+    """Apply signal to a nodes receptor method, possibly in another process.
+
+    Nodes only pickle their parameters, so when shipped to another process
+    their cache (inputs, gradients) is sent alongside, generators are exhausted
+    into lists as they cannot be pickled, and the nodes new state is returned
+    so it can be restored onto the original node. If profiling the clocks,
+    process, and thread the node fired on are returned too.
+    """
+    start = Profiler.clock() if profile else None
+    state = None
+    if cache is not None:
+        method.__self__.cache = cache
+    activation = method(signal)
+    is_generator = False
+    if cache is not None:
+        is_generator = isinstance(activation, types.GeneratorType)
+        if is_generator:
+            activation = list(activation)
+        state = method.__self__.__dict__
+    timing = None
+    if profile:
+        timing = (start, Profiler.clock(), os.getpid(), threading.get_ident())
+    return activation, is_generator, state, timing
 
 
 class Firing(Traverser):
     """Simple exhaustive neuronal firing calculation."""
 
-    def __init__(self, graph=None):
+    def __init__(self, graph=None, compiled: bool = None, executor=None,
+                 free_signals: bool = None, profiler=None,
+                 validation: str = None, validation_interval: int = None):
         """Initialise a neuronal firing object, pre-populated."""
         self.graph = graph
+        if validation is not None:
+            self.validation = validation
+        if validation_interval is not None:
+            self.validation_interval = validation_interval
+        if profiler is not None:
+            self.profiler = profiler
+        if compiled is not None:
+            self.compiled = compiled
+        if executor is not None:
+            self.executor = executor
+        if free_signals is not None:
+            self.free_signals = free_signals
 
     @property
     def graph(self):
@@ -26,6 +96,117 @@ class Firing(Traverser):
     @graph.setter
     def graph(self, graph):
         self._graph = graph
+        self._plans = {}
+
+    @property
+    def compiled(self):
+        """Get whether to fire using compiled plans, or recursive traversal."""
+        if self.__dict__.get("_compiled") is None:
+            self._compiled = True
+        return self._compiled
+
+    @compiled.setter
+    def compiled(self, compiled: bool):
+        self._compiled = compiled
+
+    @property
+    def executor(self):
+        """Get executor to fire independent nodes concurrently with.
+
+        Any :class:`concurrent.futures.Executor` may be used, threads suit
+        nodes whose compute releases the GIL, like SEAL or large numpy calls.
+        A :class:`concurrent.futures.ProcessPoolExecutor` pickles each node to
+        its worker, and copies the nodes state back once it has fired.
+        The executor is owned by the caller, and None fires serially.
+        """
+        return self.__dict__.get("_executor")
+
+    @executor.setter
+    def executor(self, executor):
+        self._executor = executor
+
+    @property
+    def free_signals(self):
+        """Get whether to free edge signals as soon as they are consumed.
+
+        Every edge has exactly one reader, the node it leads to, so its signal
+        is dead as soon as that node has gathered it. Freeing it there bounds
+        peak memory by the signals still waiting on their reader, rather
+        than every signal of the graph, at the cost of them no longer being
+        left on the edges to :meth:`harvest`. Nodes still keep their own
+        inputs for backpropagation unless their cache is disabled.
+        """
+        if self.__dict__.get("_free_signals") is None:
+            self._free_signals = False
+        return self._free_signals
+
+    @free_signals.setter
+    def free_signals(self, free_signals: bool):
+        self._free_signals = free_signals
+
+    validations = ("always", "sampled", "terminal", "off")
+
+    @property
+    def validation(self):
+        """Get policy of which activations are checked to be finite.
+
+        Checking is a full extra pass over every activation, so it can be
+        limited to what development needs and turned off in production:
+
+        - "always" checks every node on every stimulation
+        - "sampled" checks every node, once every :attr:`validation_interval`
+          stimulations
+        - "terminal" checks only nodes with no successors, the outputs
+        - "off" checks nothing
+
+        Non finite activations raise ValueError when checked.
+        """
+        if self.__dict__.get("_validation") is None:
+            self._validation = "always"
+        return self._validation
+
+    @validation.setter
+    def validation(self, validation: str):
+        if validation not in self.validations:
+            raise ValueError("validation {} is not one of {}".format(
+                validation, self.validations))
+        self._validation = validation
+        self._stimulations = 0
+
+    @property
+    def validation_interval(self):
+        """Get number of stimulations between each "sampled" validation."""
+        if self.__dict__.get("_validation_interval") is None:
+            self._validation_interval = 100
+        return self._validation_interval
+
+    @validation_interval.setter
+    def validation_interval(self, validation_interval: int):
+        if validation_interval < 1:
+            raise ValueError("validation interval {} is less than 1".format(
+                validation_interval))
+        self._validation_interval = validation_interval
+
+    def _validating(self):
+        """Get which nodes to validate this stimulation, (all, terminal)."""
+        validation = self.validation
+        if validation == "always":
+            return (True, True)
+        if validation == "terminal":
+            return (False, True)
+        if validation == "sampled":
+            count = self.__dict__.get("_stimulations", 0)
+            self._stimulations = count + 1
+            sample = count % self.validation_interval == 0
+            return (sample, sample)
+        return (False, False)
+
+    @property
+    def plans(self):
+        """Get dictionary of compiled plans by receptor name."""
+        if self.__dict__.get("_plans") is None:
+            self._plans = {}
+        return self._plans
 
     @property
     def forward_name(self):
@@ -36,7 +217,7 @@ class Firing(Traverser):
         return "backward"
 
     def stimulate(self, neurons: np.ndarray, signals: np.ndarray,
-                  receptor="forward", debug=False):
+                  receptor="forward", debug=False, fired: dict = None):
         """Stimulate a set of receptors with a set of signals for response.
 
         Breadth first stimulation of neurons/ nodes.
@@ -50,12 +231,43 @@ class Firing(Traverser):
             receptor
         :type signals: np.ndarray or compatible
         :arg receptor: Name of function/ sequence of functions to call of nodes
+            where "forwards" or "backwards" carry whole batches of examples
+            along the leading axis of each signal
         :type receptor: str
+        :arg fired: node names to the activations they have already produced
+            for this stimulation, such as inputs encrypted ahead of time by a
+            :class:`fhez.nn.graph.loader.Loader`, which are carried on to
+            their successors without firing the nodes again
+        :type fired: dict
         """
         assert len(neurons) == len(signals), \
             "Signals and receptors length (axis=0) should match"
 
         receptor = receptor if receptor is not None else "forward"
+        fired = fired if fired is not None else {}
+        validate = self._validating()
+        plan = self.plan(receptor=receptor) if self.compiled else None
+        if plan is not None and self.executor is not None:
+            return self._execute_concurrent(plan=plan, neurons=neurons,
+                                            signals=signals,
+                                            receptor=receptor, debug=debug,
+                                            validate=validate, fired=fired)
+        if plan is not None:
+            slots = [None] * len(plan.edges)
+            outputs = {}
+            for (name, activation) in fired.items():
+                fanout = plan.outputs[plan.index[name]]
+                if len(fanout) == 0:
+                    outputs[name] = activation
+                for j in fanout:
+                    slots[j] = activation
+            skip = {plan.index[name] for name in fired}
+            outputs.update(self._execute(
+                plan=plan, neurons=neurons, signals=signals,
+                receptor=receptor, debug=debug, validate=validate,
+                order=[i for i in range(len(plan.names)) if i not in skip],
+                slots=slots))
+            return outputs
         # CLEAR GRAPH OF SPECIFIC RECEPTOR CACHE SO we dont use the existing
         # partial calculations this also reduces the need for catching
         # non existant key
@@ -63,55 +275,264 @@ class Firing(Traverser):
         for e in edges:
             e[2][receptor] = None
 
+        outputs = {}
+        for (name, activation) in fired.items():
+            self._propogate_signal(graph=self.graph, node_name=name,
+                                   signal_name=receptor, signal=activation)
+            if len(self.graph.edges(name)) == 0:
+                outputs[name] = activation
         # could use zip longest but zip will ensure atleast some can be
         # processed since it stops at the shortest of the two lists
-        outputs = {}
         for (neuron, signal) in zip(neurons, signals):
             out = self._carry_signal(
                 node_name=neuron, receptor=receptor,
-                bootstrap=signal, debug=debug)
+                bootstrap=signal, debug=debug, validate=validate)
             outputs.update(out)
+        # successors fed by neurons have already been carried once ready
+        successors = {s for name in fired for s in self.graph.successors(name)
+                      if all(p in fired for p in self.graph.predecessors(s))}
+        for successor in successors:
+            out = self._carry_signal(
+                node_name=successor, receptor=receptor, debug=debug,
+                validate=validate)
+            outputs.update(out if out is not None else {})
         return outputs
 
-    def _carry_signal(self, node_name, receptor: str,
-                      bootstrap: np.ndarray = None, outputs=None, debug=None):
-        """Bootstrap and recursiveley carry signal through successor nodes."""
+    def plan(self, receptor="forward"):
+        """Get the cached plan of the graph for receptor, compiling if stale.
+
+        Plans are recompiled whenever the graph is replaced, any of its edges
+        change, or any of its node objects are replaced. Rebinding the
+        receptor method of a node object is not detected, use
+        :meth:`compile` to force a new plan after doing so.
+
+        :arg receptor: Name of function to call of nodes
+        :type receptor: str
+        :return: compiled plan or None if the graph is cyclic
+        :rtype: Plan
+        """
         graph = self.graph
-        outputs = outputs if outputs is not None else {}
-        debug = debug if debug is not None else False
-        # get signal from edges behind us
-        signal = self._get_signal(graph=graph, node_name=node_name,
-                                  signal_name=receptor, bootstrap=bootstrap)
-        # if node is not ready I.E not all predecessors are processed skip
-        if signal is None:
+        plan = self.plans.get(receptor, False)
+        # cyclic graphs have no plan, but may since have become acyclic
+        source = self.__dict__.get("_sources", {}).get(receptor)
+        if plan is False or source is None or source[0] is not graph or (
+                source[1] != _signature(graph)):
+            plan = self.compile(receptor=receptor)
+        return plan
+
+    def compile(self, receptor="forward"):
+        """Compile graph into a flat, topologically ordered, plan for receptor.
+
+        Resolves each nodes receptor method and the slot indices of its in and
+        out edges once, so firing becomes a single loop over nodes without
+        querying the graph.
+
+        :arg receptor: Name of function to call of nodes
+        :type receptor: str
+        :return: compiled plan or None if the graph is cyclic
+        :rtype: Plan
+        """
+        graph = self.graph
+        signature = _signature(graph)
+        self.__dict__.setdefault("_sources", {})[receptor] = (graph, signature)
+        try:
+            names = list(nx.topological_sort(graph))
+        except nx.NetworkXUnfeasible:
+            logger.warning("graph is cyclic, falling back to recursion")
+            self.plans[receptor] = None
             return None
+        index = {name: i for i, name in enumerate(names)}
+        slots = {}
+        edges = []
+        targets = []
+        for (src, dst, key, data) in graph.edges(keys=True, data=True):
+            slots[(src, dst, key)] = len(edges)
+            edges.append(data)
+            targets.append(index[dst])
+        methods = []
+        inputs = []
+        outputs = []
+        for name in names:
+            methods.append(getattr(graph.nodes[name].get("node"), receptor,
+                                   None))
+            inputs.append(tuple(slots[e] for e in graph.in_edges(
+                name, keys=True)))
+            outputs.append(tuple(slots[e] for e in graph.out_edges(
+                name, keys=True)))
+        plan = Plan(graph=graph, signature=signature, names=names, index=index,
+                    methods=methods, inputs=inputs, outputs=outputs,
+                    edges=edges, targets=targets)
+        self.plans[receptor] = plan
+        return plan
+
+    def _execute(self, plan, neurons, signals, receptor: str, debug=False,
+                 validate=(True, True), order=None, slots=None):
+        """Fire plan in order, bootstrapping neurons with signals.
+
+        :arg order: indices of the only nodes of plan to fire, in order
+        :arg slots: signals of each edge in plan, such as those carried in
+            from nodes outside of order, which is modified in place
+        """
+        bootstrap = {}
+        for (neuron, signal) in zip(neurons, signals):
+            bootstrap[plan.index[neuron]] = signal
+        slots = slots if slots is not None else [None] * len(plan.edges)
+        order = order if order is not None else range(len(plan.names))
+        free = self.free_signals
+        profiler = self.profiler
+        outputs = {}
+        for i in order:
+            node_name = plan.names[i]
+            method = plan.methods[i]
+            inputs = plan.inputs[i]
+            fanout = plan.outputs[i]
+            signal = bootstrap.pop(i, None)
+            if signal is None:
+                # node is not ready until every predecessor has fired
+                if len(inputs) == 0:
+                    continue
+                signal = [slots[j] for j in inputs]
+                if any(s is None for s in signal):
+                    continue
+                if free:
+                    # this node is the only reader of its inputs
+                    for j in inputs:
+                        slots[j] = None
+                if len(signal) == 1:
+                    signal = signal[0]
+            if method is None:
+                raise AttributeError("{} has no node with receptor {}".format(
+                    node_name, receptor))
+            if profiler is not None:
+                start = profiler.clock()
+            activation = method(signal)
+            self._check_activation(node_name=node_name, signal=signal,
+                                   activation=activation, debug=debug,
+                                   validate=validate[len(fanout) == 0])
+            if activation is None:
+                pass
+            elif len(fanout) == 0:
+                msg = "output from this node: {} already exists".format(
+                    node_name)
+                assert outputs.get(node_name) is None, msg
+                outputs[node_name] = activation
+            elif isinstance(activation, types.GeneratorType):
+                # generators do their work as they are distributed
+                activation = [next(activation) for _ in fanout]
+                for (j, a) in zip(fanout, activation):
+                    slots[j] = a
+            else:
+                for j in fanout:
+                    slots[j] = activation
+            if profiler is not None:
+                profiler.record(node_name=node_name, receptor=receptor,
+                                start=start, signal=signal,
+                                activation=activation)
+        # leave signals on edges as recursive traversal would for harvesting
+        for (edge, signal) in zip(plan.edges, slots):
+            edge[receptor] = signal
+        return outputs
 
-        # some contextual logging
-        msg = "{}:".format(node_name)
-        if debug is True:
-            print(msg)
-        else:
-            logger.debug(msg)
+    def _execute_concurrent(self, plan, neurons, signals, receptor: str,
+                            debug=False, validate=(True, True), fired=None):
+        """Fire plan dispatching every ready node to the executor at once.
 
-        # get activation on application of signal to current node
-        activation = self._use_signal(graph=graph,
-                                      node_name=node_name, signal=signal,
-                                      receptor_name=receptor)
+        Nodes become ready as soon as their last predecessor has fired, so
+        independent branches run concurrently while each node still sees
+        exactly the same inputs it would when fired serially.
 
-        # some incredibly important logging
-        msg = "\trtype: {}, rshape: {}".format(
-            type(activation),
-            self.probe_shape(activation) if isinstance(
-                activation, (types.GeneratorType, type(None))
-            ) is not True else "?")
+        :arg fired: node names to activations carried on without firing them
+        """
+        executor = self.executor
+        ship = isinstance(executor, ProcessPoolExecutor)
+        bootstrap = {}
+        for (neuron, signal) in zip(neurons, signals):
+            bootstrap[plan.index[neuron]] = signal
+        slots = [None] * len(plan.edges)
+        free = self.free_signals
+        profiler = self.profiler
+        waiting = [len(inputs) for inputs in plan.inputs]
+        outputs = {}
+        pending = {}
+
+        def submit(i, signal):
+            method = plan.methods[i]
+            if method is None:
+                raise AttributeError("{} has no node with receptor {}".format(
+                    plan.names[i], receptor))
+            cache = method.__self__.cache if ship else None
+            future = executor.submit(_fire, method, signal, cache,
+                                     profiler is not None)
+            pending[future] = (i, signal)
+
+        def carry(i, activation):
+            fanout = plan.outputs[i]
+            if len(fanout) == 0:
+                outputs[plan.names[i]] = activation
+                return
+            generator = isinstance(activation, types.GeneratorType)
+            for j in fanout:
+                slots[j] = next(activation) if generator else activation
+                target = plan.targets[j]
+                waiting[target] -= 1
+                if waiting[target] == 0 and target not in bootstrap:
+                    inputs = [slots[k] for k in plan.inputs[target]]
+                    if free:
+                        for k in plan.inputs[target]:
+                            slots[k] = None
+                    submit(target, inputs[0] if len(inputs) == 1 else inputs)
+
+        fired = {plan.index[name]: a for (name, a) in (fired or {}).items()}
+        for (i, signal) in bootstrap.items():
+            submit(i, signal)
+        bootstrap = set(bootstrap) | set(fired)
+        for (i, activation) in fired.items():
+            carry(i, activation)
+        while len(pending) > 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, signal = pending.pop(future)
+                node_name = plan.names[i]
+                activation, is_generator, state, timing = future.result()
+                if state is not None:
+                    plan.methods[i].__self__.__dict__.update(state)
+                if timing is not None:
+                    profiler.record(node_name=node_name, receptor=receptor,
+                                    start=timing[0], signal=signal,
+                                    activation=activation, end=timing[1],
+                                    pid=timing[2], tid=timing[3])
+                if is_generator:
+                    activation = (a for a in activation)
+                fanout = plan.outputs[i]
+                self._check_activation(node_name=node_name, signal=signal,
+                                       activation=activation, debug=debug,
+                                       validate=validate[len(fanout) == 0])
+                if activation is None:
+                    continue
+                carry(i, activation)
+        for (edge, signal) in zip(plan.edges, slots):
+            edge[receptor] = signal
+        return outputs
 
-        if debug is True:
-            print(msg)
-        else:
-            logger.debug(msg)
+    def _check_activation(self, node_name, signal, activation, debug=False,
+                          validate=True):
+        """Log activation of node and raise if validated and not finite."""
+        # only build messages if they will be seen, probing shape is a pass
+        if debug is True or logger.root.isEnabledFor(logger.DEBUG):
+            log = print if debug is True else logger.debug
+            # some contextual logging
+            log("{}:".format(node_name))
+            # some incredibly important logging
+            log("\trtype: {}, rshape: {}".format(
+                type(activation),
+                self.probe_shape(activation) if isinstance(
+                    activation, (types.GeneratorType, type(None))
+                ) is not True else "?"))
 
         # TODO: check generators are finite when propagating to next edges
-        if isinstance(activation, types.GeneratorType):
+        if validate is not True:
+            pass
+        elif isinstance(activation, (types.GeneratorType, type(None))):
             pass
         # if all of the values in activation are finite values I.E not NaN/ inf
         elif np.isfinite(activation).all():  # TODO: add supporting ufunc spec!
@@ -126,6 +547,40 @@ class Firing(Traverser):
             raise ValueError("{} produced a non finite result".format(
                 node_name))
 
+    def _carry_signal(self, node_name, receptor: str,
+                      bootstrap: np.ndarray = None, outputs=None, debug=None,
+                      validate=None):
+        """Bootstrap and recursiveley carry signal through successor nodes."""
+        graph = self.graph
+        outputs = outputs if outputs is not None else {}
+        debug = debug if debug is not None else False
+        validate = validate if validate is not None else (True, True)
+        # get signal from edges behind us
+        signal = self._get_signal(graph=graph, node_name=node_name,
+                                  signal_name=receptor, bootstrap=bootstrap)
+        # if node is not ready I.E not all predecessors are processed skip
+        if signal is None:
+            return None
+        if bootstrap is None and self.free_signals:
+            # this node is the only reader of its inbound edges signals
+            for edge in graph.in_edges(node_name, data=True):
+                edge[2][receptor] = None
+
+        # get activation on application of signal to current node
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.clock()
+        activation = self._use_signal(graph=graph,
+                                      node_name=node_name, signal=signal,
+                                      receptor_name=receptor)
+        if profiler is not None:
+            profiler.record(node_name=node_name, receptor=receptor,
+                            start=start, signal=signal, activation=activation)
+        terminal = len(graph.edges(node_name, data=False)) == 0
+        self._check_activation(node_name=node_name, signal=signal,
+                               activation=activation, debug=debug,
+                               validate=validate[terminal])
+
         # if the node has not activated then there is no need to compute
         if activation is None:
             return None
@@ -134,7 +589,7 @@ class Firing(Traverser):
         self._propogate_signal(graph=graph, node_name=node_name,
                                signal_name=receptor, signal=activation)
 
-        if len(graph.edges(node_name, data=False)) == 0:
+        if terminal:
             # this is a terminating node so record output
             msg = "output from this node: {} already exists somehow".format(
                 node_name
@@ -143,6 +598,8 @@ class Firing(Traverser):
             assert activation is not None, "activation of node cannot be none"
             outputs[node_name] = activation  # modify reference dictionary
         else:
+            # now on the edges so do not hold on to them while recursing
+            bootstrap = signal = activation = None
             # recurse to all successors
             for next_node_name in self.graph.successors(node_name):
                 out = self._carry_signal(
@@ -150,7 +607,8 @@ class Firing(Traverser):
                     receptor=receptor,
                     bootstrap=None,
                     outputs=None,
-                    debug=debug)
+                    debug=debug,
+                    validate=validate)
                 outputs.update(out if out is not None else {})
         return outputs
 
@@ -3,8 +3,11 @@
 # @Last modified by:   archer
 # @Last modified time: 2021-09-22T09:42:16+01:00
 
+import copy
 import time
 import unittest
+import weakref
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import numpy as np
 import networkx as nx
 
@@ -14,6 +17,46 @@ from fhez.nn.graph.prefab import cnn_classifier
 from fhez.nn.traverse.firing import Firing
 
 
+class Sleeper(IO):
+    """IO node that takes a while to fire, releasing the GIL."""
+
+    def forward(self, x):
+        """Sleep then pass input through."""
+        time.sleep(0.1)
+        return x
+
+
+class Increment(IO):
+    """IO node that returns a new array, keeping only weak references."""
+
+    def __init__(self, activations: list):
+        """Share list of weak references to every activation."""
+        self.activations = activations
+
+    def forward(self, x):
+        """Record which earlier activations are alive then increment x."""
+        self.alive = [ref() is not None for ref in self.activations]
+        activation = np.add(x, 1)
+        self.activations.append(weakref.ref(activation))
+        return activation
+
+
+class Clip(IO):
+    """IO node that replaces non finite values of input."""
+
+    def forward(self, x):
+        """Get finite copy of x."""
+        return np.nan_to_num(x)
+
+
+class Boom(IO):
+    """IO node that must never be fired."""
+
+    def forward(self, x):
+        """Raise as this node should not have been fired."""
+        raise AssertionError("fired twice")
+
+
 class FiringTest(unittest.TestCase):
     """Test linear activation function."""
 
@@ -91,6 +134,256 @@ class FiringTest(unittest.TestCase):
             node = node_meta[1]["node"]
             node.updates()
 
+    def test_compiled(self):
+        """Check compiled plans fire identically to recursive traversal."""
+        graph = self.graph
+        data = self.data
+        recursive = Firing(graph=graph, compiled=False)
+        truth = recursive.stimulate(neurons=["x", "y"], signals=[data, 1])
+        compiled = Firing(graph=graph)
+        output = compiled.stimulate(neurons=["x", "y"], signals=[data, 1])
+        self.assertEqual(sorted(output), sorted(truth))
+        for key in truth:
+            np.testing.assert_array_almost_equal(output[key], truth[key],
+                                                 decimal=4,
+                                                 verbose=True)
+        # backward through the reversed graph must also match
+        reverse = graph.reverse(copy=False)
+        truth = Firing(graph=reverse, compiled=False).stimulate(
+            neurons=["Loss-CCE", "y_hat"], signals=[output["Loss-CCE"], 0],
+            receptor="backward")
+        grads = Firing(graph=reverse).stimulate(
+            neurons=["Loss-CCE", "y_hat"], signals=[output["Loss-CCE"], 0],
+            receptor="backward")
+        np.testing.assert_array_almost_equal(grads["x"], truth["x"],
+                                             decimal=4,
+                                             verbose=True)
+
+    def test_plan(self):
+        """Check plans are cached until the graph changes."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", node=IO())
+        graph.add_node("y", node=RELU())
+        graph.add_edge("x", "y")
+        graph.add_edge("x", "y")
+        f = Firing(graph=graph)
+        plan = f.plan()
+        self.assertEqual(plan.names, ["x", "y"])
+        self.assertEqual(plan.inputs, [(), (0, 1)])
+        self.assertEqual(plan.outputs, [(0, 1), ()])
+        self.assertIs(f.plan(), plan)
+        # rewiring an edge, keeping the number of edges, must recompile
+        graph.remove_edge("x", "y")
+        graph.add_edge("y", "x")
+        self.assertEqual(f.plan(), None)
+        graph.remove_edge("y", "x")
+        graph.add_edge("x", "y")
+        plan = f.plan()
+        # as must replacing a node object
+        graph.nodes["y"]["node"] = RELU()
+        self.assertIsNot(f.plan(), plan)
+        plan = f.plan()
+        # adding a node must recompile
+        graph.add_node("z", node=IO())
+        graph.add_edge("y", "z")
+        self.assertIsNot(f.plan(), plan)
+        output = f.stimulate(neurons=["x"], signals=[np.array([1, -1])])
+        np.testing.assert_array_almost_equal(
+            output["z"], RELU().forward(np.array([[1, -1], [1, -1]])),
+            decimal=1,
+            verbose=True)
+        # signals are left on edges for harvesting
+        crop = f.harvest(["z"])
+        np.testing.assert_array_almost_equal(crop[0][1], output["z"],
+                                             decimal=1,
+                                             verbose=True)
+
+    def test_plan_cyclic(self):
+        """Check cyclic graphs fall back to recursive traversal."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", node=IO())
+        graph.add_node("y", node=IO())
+        graph.add_edge("x", "y")
+        graph.add_edge("y", "x")
+        f = Firing(graph=graph)
+        self.assertIsNone(f.plan())
+
+    def test_executor(self):
+        """Check firing with thread and process pools matches serial."""
+        graph = self.graph
+        data = self.data
+        truth = Firing(graph=graph).stimulate(neurons=["x", "y"],
+                                              signals=[data, 1])
+        reverse = graph.reverse(copy=False)
+        truth_grads = Firing(graph=reverse).stimulate(
+            neurons=["Loss-CCE", "y_hat"], signals=[truth["Loss-CCE"], 0],
+            receptor="backward")
+        for executor in [ThreadPoolExecutor(4), ProcessPoolExecutor(2)]:
+            with executor:
+                output = Firing(graph=graph, executor=executor).stimulate(
+                    neurons=["x", "y"], signals=[data, 1])
+                self.assertEqual(sorted(output), sorted(truth))
+                for key in truth:
+                    np.testing.assert_array_almost_equal(output[key],
+                                                         truth[key],
+                                                         decimal=4,
+                                                         verbose=True)
+                # process pools must restore node caches for backward
+                grads = Firing(graph=reverse, executor=executor).stimulate(
+                    neurons=["Loss-CCE", "y_hat"],
+                    signals=[output["Loss-CCE"], 0],
+                    receptor="backward")
+                np.testing.assert_array_almost_equal(grads["x"],
+                                                     truth_grads["x"],
+                                                     decimal=4,
+                                                     verbose=True)
+
+    def test_executor_concurrent(self):
+        """Check independent branches are fired concurrently."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", node=IO())
+        for i in range(4):
+            graph.add_node("branch-{}".format(i), node=Sleeper())
+            graph.add_edge("x", "branch-{}".format(i))
+        with ThreadPoolExecutor(4) as executor:
+            f = Firing(graph=graph, executor=executor)
+            start = time.time()
+            output = f.stimulate(neurons=["x"], signals=[np.array([1])])
+            elapsed = time.time() - start
+        self.assertEqual(len(output), 4)
+        # serially this would take atleast 0.4s
+        self.assertLess(elapsed, 0.3)
+
+    def test_batched(self):
+        """Check batched stimulation matches stimulating each example."""
+        graph = cnn_classifier(10, dense=True)
+        batched_graph = copy.deepcopy(graph)
+        xs = np.random.rand(4, *self.data_shape)
+        ys = np.array([1, 3, 0, 9])
+        forward = Firing(graph=graph)
+        backward = Firing(graph=graph.reverse(copy=False))
+        outputs = []
+        grads = []
+        for (x, y) in zip(xs, ys):
+            out = forward.stimulate(neurons=["x", "y"], signals=[x, y])
+            outputs.append(out)
+            grads.append(backward.stimulate(neurons=list(out.keys()),
+                                            signals=list(out.values()),
+                                            receptor="backward"))
+        out = Firing(graph=batched_graph).stimulate(
+            neurons=["x", "y"], signals=[xs, ys], receptor="forwards")
+        for key in out:
+            np.testing.assert_array_almost_equal(
+                out[key], [o[key] for o in outputs],
+                decimal=4,
+                verbose=True)
+        grad = Firing(graph=batched_graph.reverse(copy=False)).stimulate(
+            neurons=list(out.keys()), signals=list(out.values()),
+            receptor="backwards")
+        np.testing.assert_array_almost_equal(grad["x"],
+                                             [g["x"] for g in grads],
+                                             decimal=4,
+                                             verbose=True)
+        # each batch accumulates into a single averaged gradient per node
+        for name in ["CC-products", "Dense", "CNN-RELU"]:
+            looped = graph.nodes[name]["node"].gradients
+            batched = batched_graph.nodes[name]["node"].gradients
+            self.assertEqual(len(batched), 1)
+            for key, value in batched[0].items():
+                np.testing.assert_array_almost_equal(
+                    value, np.mean([g[key] for g in looped], axis=0),
+                    decimal=4,
+                    verbose=True)
+
+    def test_free_signals(self):
+        """Check signals are freed once their only reader has gathered them."""
+        for compiled in [True, False]:
+            activations = []
+            graph = nx.MultiDiGraph()
+            graph.add_node("x", node=IO())
+            last = "x"
+            for i in range(4):
+                graph.add_node(i, node=Increment(activations))
+                graph.add_edge(last, i)
+                last = i
+            output = Firing(graph=graph, compiled=compiled).stimulate(
+                neurons=["x"], signals=[np.array([0])])
+            # without freeing every activation is still held by its edge
+            self.assertEqual(graph.nodes[3]["node"].alive, [True] * 3)
+            activations.clear()
+            output = Firing(graph=graph, compiled=compiled,
+                            free_signals=True).stimulate(
+                neurons=["x"], signals=[np.array([0])])
+            # only the input to the current node is still alive
+            self.assertEqual(graph.nodes[3]["node"].alive,
+                             [False, False, True])
+            np.testing.assert_array_almost_equal(output[3], [4],
+                                                 decimal=1,
+                                                 verbose=True)
+            for (_, _, edge) in graph.edges(data=True):
+                self.assertIsNone(edge["forward"])
+
+    def test_validation(self):
+        """Check non finite activations raise according to validation."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", node=IO())
+        graph.add_node("c", node=Clip())
+        graph.add_node("y", node=IO())
+        graph.add_edge("x", "c")
+        graph.add_edge("c", "y")
+        signal = np.array([1.0, np.inf])
+        for compiled in [True, False]:
+            f = Firing(graph=graph, compiled=compiled)
+            self.assertEqual(f.validation, "always")
+            with self.assertRaises(ValueError):
+                f.stimulate(neurons=["x"], signals=[signal])
+            # only the clipped, finite, output is checked
+            f.validation = "terminal"
+            out = f.stimulate(neurons=["x"], signals=[signal])
+            self.assertTrue(np.isfinite(out["y"]).all())
+            with self.assertRaises(ValueError):
+                f.stimulate(neurons=["c", "y"], signals=[signal, signal])
+            f.validation = "off"
+            f.stimulate(neurons=["c", "y"], signals=[signal, signal])
+            # checked on the first of every 2 stimulations
+            f = Firing(graph=graph, compiled=compiled, validation="sampled",
+                       validation_interval=2)
+            with self.assertRaises(ValueError):
+                f.stimulate(neurons=["x"], signals=[signal])
+            f.stimulate(neurons=["x"], signals=[signal])
+            with self.assertRaises(ValueError):
+                f.stimulate(neurons=["x"], signals=[signal])
+        with self.assertRaises(ValueError):
+            Firing(validation="sometimes")
+        with self.assertRaises(ValueError):
+            Firing(validation_interval=0)
+
+    def test_fired(self):
+        """Check activations fired ahead of time are carried, not refired."""
+        graph = nx.MultiDiGraph()
+        for name in ["x", "w"]:
+            graph.add_node(name, node=Boom())
+        for name in ["s", "z", "t"]:
+            graph.add_node(name, node=IO())
+        graph.add_edge("x", "s")
+        graph.add_edge("z", "t")
+        cnn = cnn_classifier(10)
+        x = np.random.rand(*self.data_shape)
+        truth = Firing(graph=cnn).stimulate(neurons=["x", "y"],
+                                            signals=[x, 3])
+        with ThreadPoolExecutor(2) as executor:
+            for kwargs in [{}, {"compiled": False}, {"executor": executor}]:
+                out = Firing(graph=graph, **kwargs).stimulate(
+                    neurons=["z"], signals=[2], fired={"x": 1, "w": 5})
+                self.assertEqual(out, {"s": 1, "t": 2, "w": 5})
+                out = Firing(graph=cnn, **kwargs).stimulate(
+                    neurons=["y"], signals=[3], fired={"x": x})
+                self.assertEqual(out.keys(), truth.keys())
+                np.testing.assert_array_almost_equal(out["y_hat"],
+                                                     truth["y_hat"],
+                                                     decimal=4,
+                                                     verbose=True)
+
     def test_get_signal_many(self):
         """Check get multi signal is working as expected.
 
@@ -0,0 +1,227 @@
+"""Data parallel training of a graph across local worker processes."""
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-30T10:12:44+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-30T10:12:44+01:00
+
+import os
+import itertools
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import numpy as np
+from fhez.nn.graph.node import Node
+from fhez.nn.traverse.firing import Firing
+from fhez.nn.optimiser.fused import FusedAdam
+
+
+def shards(length: int, batch_size: int, workers: int):
+    """Get each workers example indices and their count in every batch.
+
+    Every batch of batch_size examples is split as evenly as possible
+    across the workers, so each worker takes a contiguous part of it.
+
+    :return: list of (indices, counts) per worker
+    :rtype: list(tuple(list(int), list(int)))
+    """
+    out = [([], []) for _ in range(workers)]
+    for i in range(0, length, batch_size):
+        batch = np.arange(i, min(i + batch_size, length))
+        for (rank, part) in enumerate(np.array_split(batch, workers)):
+            out[rank][0].extend(part.tolist())
+            out[rank][1].append(len(part))
+    return out
+
+
+def _worker(rank, graph, inputs, counts, batched, epochs, optimiser, state,
+            name, barrier, connection):
+    """Train replica of graph on shard of inputs, all-reducing gradients.
+
+    Each batch the workers write their summed gradients, and how many
+    examples they came from, to their own row of the shared buffer. Once
+    every worker has written, each reduces the rows to the same average
+    and takes the same optimiser step, so the replicas never drift apart.
+    Rows alternate between two halves of the buffer each batch, so a
+    worker may write the next batch while others still read this one.
+    """
+    try:
+        for (_, data) in graph.nodes(data=True):
+            if isinstance(data["node"], Node):
+                data["node"].enable_accumulator()
+        optimiser.register(graph)
+        if state is not None:
+            (optimiser.m[...], optimiser.v[...], optimiser.t) = state
+        size = optimiser.parameters.size
+        memory = shared_memory.SharedMemory(name=name)
+        try:
+            rows = np.ndarray((2, barrier.parties, size + 1),
+                              dtype=np.float64, buffer=memory.buf)
+            forward = Firing(graph=graph, free_signals=True)
+            backward = Firing(graph=graph.reverse(copy=False),
+                              free_signals=True)
+            neurons = list(inputs.keys())
+            out = None
+            step = itertools.count()
+            for _ in range(epochs):
+                start = 0
+                for count in counts:
+                    part = {k: v[start:start + count]
+                            for (k, v) in inputs.items()}
+                    start += count
+                    for out in _learn(forward, backward, neurons, part,
+                                      batched):
+                        pass
+                    row = rows[next(step) % 2]
+                    row[rank, :size] = optimiser.gather() * count
+                    row[rank, size] = count
+                    barrier.wait()
+                    total = row.sum(axis=0)
+                    optimiser.apply(total[:size] / total[size])
+            del rows
+        finally:
+            memory.close()
+        if rank == 0:
+            connection.send((None, (out, optimiser.parameters, optimiser.m,
+                                    optimiser.v, optimiser.t)))
+        else:
+            connection.send((None, None))
+    except Exception as e:
+        # release the others from waiting on a worker that will never come
+        barrier.abort()
+        connection.send((e, None))
+    finally:
+        connection.close()
+
+
+def _learn(forward, backward, neurons, inputs, batched):
+    """Forward and backward pass every example of inputs, yielding outputs.
+
+    Gradients are left in the nodes for the caller to gather.
+    """
+    if len(inputs[neurons[0]]) == 0:
+        return
+    if batched is True:
+        signals = [np.asarray(v) for v in inputs.values()]
+        receptors = ("forwards", "backwards")
+        examples = [signals]
+    else:
+        receptors = ("forward", "backward")
+        examples = (list(signals) for signals in itertools.zip_longest(
+            *inputs.values()))
+    for signals in examples:
+        out = forward.stimulate(neurons=neurons, signals=signals,
+                                receptor=receptors[0])
+        backward.stimulate(neurons=list(out.keys()),
+                           signals=list(out.values()),
+                           receptor=receptors[1])
+        yield out
+
+
+def train(graph, inputs, batch_size, workers: int = None,
+          batched: bool = False, epochs: int = 1, optimiser=None,
+          context=None):
+    """Train neural network graph data parallel across worker processes.
+
+    Every worker trains its own replica of the graph on its share of each
+    batch. Their nodes accumulate gradients as running sums, which are
+    averaged across workers through shared memory, and applied by every
+    worker with the same :class:`fhez.nn.optimiser.fused.FusedAdam` step.
+    Once done the trained parameters are copied back into graph.
+
+    :arg graph: neural network graph to train, in place
+    :type graph: networkx.MultiDiGraph
+    :arg inputs: dictionary of input neuron names to their examples
+    :type inputs: dict
+    :arg batch_size: number of examples, across all workers, per update
+    :type batch_size: int
+    :arg workers: number of worker processes, defaults to cpu count
+    :type workers: int
+    :arg batched: stimulate each worker with its whole share of a batch at
+        once, using the nodes vectorised forwards and backwards
+    :type batched: bool
+    :arg epochs: number of passes over inputs
+    :type epochs: int
+    :arg optimiser: optimiser whose hyperparameters and, if it has already
+        stepped on this graph, moments to continue with
+    :type optimiser: fhez.nn.optimiser.fused.FusedAdam
+    :arg context: multiprocessing context or start method name
+    :return: outputs of the last example of the first worker
+    :rtype: dict
+    """
+    workers = workers if workers is not None else os.cpu_count()
+    optimiser = optimiser if optimiser is not None else FusedAdam()
+    if context is None or isinstance(context, str):
+        context = multiprocessing.get_context(context)
+    state = None
+    if getattr(optimiser, "t", 0) > 0:
+        state = (optimiser.m, optimiser.v, optimiser.t)
+    optimiser.register(graph)
+    if state is not None:
+        (optimiser.m[...], optimiser.v[...], optimiser.t) = state
+    size = optimiser.parameters.size
+    neurons = list(inputs.keys())
+    length = len(inputs[neurons[0]])
+
+    memory = shared_memory.SharedMemory(
+        create=True, size=max(2 * workers * (size + 1) * 8, 1))
+    barrier = context.Barrier(workers)
+    processes = []
+    try:
+        for (rank, (indices, counts)) in enumerate(
+                shards(length, batch_size, workers)):
+            part = {k: _take(v, indices) for (k, v) in inputs.items()}
+            local, remote = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(rank, graph, part, counts, batched, epochs, optimiser,
+                      state, memory.name, barrier, remote),
+                daemon=True)
+            process.start()
+            remote.close()
+            processes.append((process, local))
+        replies = _gather(processes, barrier)
+    finally:
+        memory.close()
+        memory.unlink()
+    errors = [e for (e, _) in replies if e is not None]
+    if errors:
+        # workers aborted by another raise broken barriers, not the cause
+        errors.sort(key=lambda e: isinstance(e, threading.BrokenBarrierError))
+        raise errors[0]
+    (out, parameters, m, v, t) = replies[0][1]
+    optimiser.parameters[...] = parameters
+    optimiser.m[...] = m
+    optimiser.v[...] = v
+    optimiser.t = t
+    return out
+
+
+def _take(examples, indices):
+    """Get examples at indices, as an array if examples were one."""
+    if isinstance(examples, np.ndarray):
+        return examples[indices]
+    return [examples[i] for i in indices]
+
+
+def _gather(processes, barrier):
+    """Get reply of every worker, in rank order, then join them."""
+    replies = {}
+    pending = {connection: (rank, process)
+               for (rank, (process, connection)) in enumerate(processes)}
+    while pending:
+        for connection in wait(list(pending.keys())):
+            (rank, process) = pending.pop(connection)
+            try:
+                replies[rank] = connection.recv()
+            except EOFError:
+                # died without replying so would leave the others waiting
+                barrier.abort()
+                process.join()
+                replies[rank] = (RuntimeError(
+                    "worker {} exited with code {} before replying".format(
+                        rank, process.exitcode)), None)
+            connection.close()
+    for (process, _) in processes:
+        process.join()
+    return [replies[rank] for rank in range(len(processes))]
@@ -0,0 +1,96 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-30T10:12:44+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-30T10:12:44+01:00
+
+import copy
+import time
+import unittest
+import numpy as np
+
+from fhez.nn.graph.prefab import cnn_classifier
+from fhez.nn.graph.utils import train as serial
+from fhez.nn.optimiser.fused import FusedAdam
+from fhez.nn.traverse.parallel import train, shards
+
+
+class ParallelTest(unittest.TestCase):
+    """Test data parallel training across worker processes."""
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.start_time = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.start_time
+        print('%s: %.3f' % (self.id(), t))
+
+    @property
+    def data_shape(self):
+        """Define desired data shape."""
+        return (28, 28)
+
+    @property
+    def inputs(self):
+        """Get random training examples."""
+        return {
+            "x": np.random.rand(10, *self.data_shape),
+            "y": np.arange(10) % 10
+        }
+
+    def assert_weights_equal(self, graph, other):
+        """Check weights of graphs trainable layers are equal."""
+        for name in ["CC-products", "Dense"]:
+            np.testing.assert_array_almost_equal(
+                graph.nodes[name]["node"].weights,
+                other.nodes[name]["node"].weights,
+                decimal=6,
+                verbose=True)
+
+    def test_shards(self):
+        """Check every example of every batch goes to exactly one worker."""
+        parts = shards(length=10, batch_size=4, workers=3)
+        self.assertEqual(parts[0], ([0, 1, 4, 5, 8], [2, 2, 1]))
+        self.assertEqual(parts[2], ([3, 7], [1, 1, 0]))
+        indices = sorted(i for (part, _) in parts for i in part)
+        self.assertEqual(indices, list(range(10)))
+
+    def test_train(self):
+        """Check data parallel training matches training in one process."""
+        graph = cnn_classifier(10, dense=True)
+        parallel = copy.deepcopy(graph)
+        inputs = self.inputs
+        serial(graph=graph, inputs=inputs, batch_size=4, batched=True,
+               optimiser=FusedAdam())
+        optimiser = FusedAdam()
+        out = train(graph=parallel, inputs=inputs, batch_size=4, workers=3,
+                    batched=True, optimiser=optimiser)
+        self.assertIn("y_hat", out)
+        self.assertEqual(optimiser.t, 3)
+        self.assert_weights_equal(graph, parallel)
+
+    def test_workers(self):
+        """Check example at a time training is the same on any workers."""
+        graph = cnn_classifier(10, dense=True)
+        parallel = copy.deepcopy(graph)
+        inputs = self.inputs
+        optimiser = FusedAdam()
+        train(graph=graph, inputs=inputs, batch_size=5, workers=1,
+              optimiser=optimiser)
+        train(graph=parallel, inputs=inputs, batch_size=5, workers=2)
+        self.assert_weights_equal(graph, parallel)
+        # the optimiser continues from its moments
+        train(graph=graph, inputs=inputs, batch_size=5, workers=2,
+              optimiser=optimiser)
+        self.assertEqual(optimiser.t, 4)
+
+    def test_error(self):
+        """Check an error in one worker is raised, not left waiting."""
+        graph = cnn_classifier(10)
+        inputs = {
+            "x": [np.random.rand(*self.data_shape), np.zeros((3, 3))],
+            "y": [1, 2]
+        }
+        with self.assertRaises(ValueError):
+            train(graph=graph, inputs=inputs, batch_size=2, workers=2)
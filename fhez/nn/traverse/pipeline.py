@@ -0,0 +1,339 @@
+"""Pipeline parallel traversal, firing each stage of a graph in a worker."""
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-26T10:02:41+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-26T10:02:41+01:00
+
+import queue
+import pickle
+import itertools
+import traceback
+import multiprocessing
+from collections import deque
+import networkx as nx
+from fhez.nn.traverse.traverser import Traverser
+from fhez.nn.traverse.firing import Firing
+
+
+def stages(graph, groups=None, max_stages=None):
+    """Partition graph into a chain of stages along its node groups.
+
+    Each node joins the stage of its latest predecessor, or the next stage if
+    that predecessor is in a different group, so groups are split wherever
+    they interleave and every edge leads to the same or a later stage.
+    Adjacent stages are then merged, balancing the total cost of their
+    nodes, until there are no more than max_stages.
+
+    :arg graph: acyclic neural network graph to partition
+    :type graph: networkx.MultiDiGraph
+    :arg groups: dictionary of node names to group, defaults to the "group"
+        attribute of each node, such as those set by the prefabs or the first
+        dictionary returned by
+        :func:`fhez.nn.parametrisation.autofhe.autoGroup`
+    :type groups: dict
+    :arg max_stages: maximum number of stages to partition into
+    :type max_stages: int
+    :return: list of stages, each a topologically ordered list of node names
+    :rtype: list(list(str))
+    """
+    if groups is None:
+        groups = {name: data.get("group")
+                  for (name, data) in graph.nodes(data=True)}
+    try:
+        names = list(nx.topological_sort(graph))
+    except nx.NetworkXUnfeasible:
+        raise ValueError("cannot pipeline a cyclic graph")
+    level = {}
+    for name in names:
+        level[name] = max(
+            (level[p] + int(groups.get(p) != groups.get(name))
+             for p in graph.predecessors(name)), default=0)
+    chain = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for name in names:
+        chain[level[name]].append(name)
+    if max_stages is not None and len(chain) > max_stages:
+        costs = [sum(graph.nodes[name]["node"].cost for name in stage)
+                 for stage in chain]
+        chain = [list(itertools.chain(*chain[start:end]))
+                 for (start, end) in _balance(costs, max_stages)]
+    return chain
+
+
+def _balance(costs, parts):
+    """Get (start, end) of contiguous parts minimising the most costly."""
+    n = len(costs)
+    prefix = [0] + list(itertools.accumulate(costs))
+    # best[k][i] is the least worst part cost of costs[:i] in k parts
+    best = [[float("inf")] * (n + 1) for _ in range(parts + 1)]
+    split = [[0] * (n + 1) for _ in range(parts + 1)]
+    best[0][0] = 0
+    for k in range(1, parts + 1):
+        for i in range(k, n + 1):
+            for j in range(k - 1, i):
+                worst = max(best[k - 1][j], prefix[i] - prefix[j])
+                if worst < best[k][i]:
+                    best[k][i] = worst
+                    split[k][i] = j
+    bounds = []
+    end = n
+    for k in range(parts, 0, -1):
+        start = split[k][end]
+        bounds.append((start, end))
+        end = start
+    return list(reversed(bounds))
+
+
+def _portable(error):
+    """Get error as it can be sent to another process, kept if it pickles.
+
+    Errors that cannot be pickled, or unpickled, would be lost with their
+    whole packet when put on a queue, so are replaced with a
+    :class:`RuntimeError` of their repr and traceback text instead.
+    """
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError("{}\n{}".format(repr(error), "".join(
+            traceback.format_exception(type(error), error,
+                                       error.__traceback__))))
+
+
+def _stage(graph, members, queue_in, queue_out):
+    """Fire members of graph for every packet from queue_in, until None.
+
+    Packets carry the signals of each edge still waiting on a later stage,
+    keyed by their slot in the compiled plan, along with the remaining input
+    signals, and the outputs of every stage so far.
+    """
+    for (_, data) in graph.nodes(data=True):
+        data["node"].disable_cache()
+    firing = Firing(graph=graph, free_signals=True)
+    receptor = firing.forward_name
+    plan = firing.plan(receptor=receptor)
+    order = [plan.index[name] for name in members]
+    while True:
+        packet = queue_in.get()
+        if packet is None:
+            queue_out.put(None)
+            return
+        if packet["error"] is None:
+            try:
+                neurons = [n for n in members if n in packet["inputs"]]
+                signals = [packet["inputs"].pop(n) for n in neurons]
+                slots = [None] * len(plan.edges)
+                for (j, signal) in packet["slots"].items():
+                    slots[j] = signal
+                packet["outputs"].update(firing._execute(
+                    plan=plan, neurons=neurons, signals=signals,
+                    receptor=receptor, validate=firing._validating(),
+                    order=order, slots=slots))
+                # consumed signals were freed, the rest are for later stages
+                packet["slots"] = {j: signal for (j, signal) in enumerate(
+                    slots) if signal is not None}
+            except Exception as e:
+                packet["error"] = _portable(e)
+        queue_out.put(packet)
+
+
+class Pipeline(Traverser):
+    """Pipeline parallel inference, with a worker process per graph stage.
+
+    Stages are connected in a chain by bounded queues, so while one example
+    is in the dense head the next is already in the convolution. Throughput
+    of a stream is then that of the slowest stage, rather than of every
+    stage one after the other. Nodes are pickled to their stage, and have
+    their caches disabled there, so this is for inference only.
+    """
+
+    def __init__(self, graph=None, groups=None, max_stages: int = None,
+                 maxsize: int = None, context=None, poll: float = None):
+        """Initialise a pipeline of graph, started on first use.
+
+        :arg groups: dictionary of node names to groups, see :func:`stages`
+        :arg max_stages: maximum number of stages, I.E worker processes
+        :arg maxsize: maximum number of examples queued between stages
+        :arg context: multiprocessing context or start method name
+        :arg poll: seconds between checks that every stage is still alive
+            while waiting on the pipeline
+        """
+        self.graph = graph
+        self.groups = groups
+        self.max_stages = max_stages
+        if maxsize is not None:
+            self.maxsize = maxsize
+        self.context = context
+        if poll is not None:
+            self.poll = poll
+
+    @property
+    def maxsize(self):
+        """Get maximum number of examples queued between any two stages."""
+        if self.__dict__.get("_maxsize") is None:
+            self._maxsize = 2
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize: int):
+        self._maxsize = maxsize
+
+    @property
+    def poll(self):
+        """Get seconds between checks that every stage is still alive."""
+        if self.__dict__.get("_poll") is None:
+            self._poll = 0.1
+        return self._poll
+
+    @poll.setter
+    def poll(self, poll: float):
+        self._poll = poll
+
+    @property
+    def stages(self):
+        """Get stages of graph each worker fires, see :func:`stages`."""
+        if self.__dict__.get("_stages") is None:
+            self._stages = stages(graph=self.graph, groups=self.groups,
+                                  max_stages=self.max_stages)
+        return self._stages
+
+    @property
+    def window(self):
+        """Get number of examples in flight that fit in the pipeline."""
+        return len(self.stages) * (self.maxsize + 1)
+
+    @property
+    def workers(self):
+        """Get list of running stage worker processes."""
+        if self.__dict__.get("_workers") is None:
+            self._workers = []
+        return self._workers
+
+    def start(self):
+        """Start a worker process for every stage, connected by queues."""
+        if len(self.workers) > 0:
+            return
+        context = self.context
+        if context is None or isinstance(context, str):
+            context = multiprocessing.get_context(context)
+        queues = [context.Queue(maxsize=self.maxsize)
+                  for _ in range(len(self.stages) + 1)]
+        for (i, members) in enumerate(self.stages):
+            worker = context.Process(
+                target=_stage, args=(self.graph, members, queues[i],
+                                     queues[i + 1]),
+                daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        self._queues = queues
+        self._in_flight = 0
+        self._failed = None
+
+    def close(self):
+        """Drain and stop every stage worker process.
+
+        If a stage has died the rest are terminated instead, raising
+        :class:`RuntimeError` unless a stream has already raised it.
+        """
+        if len(self.workers) == 0:
+            return
+        try:
+            if self._failed is None:
+                self._put(self._queues[0], None)
+                while self._get(self._queues[-1], closing=True) is not None:
+                    pass
+        finally:
+            if self._failed is not None:
+                for worker in self.workers:
+                    worker.terminate()
+            for worker in self.workers:
+                worker.join()
+            self._workers = []
+
+    def _check(self, closing=False):
+        """Raise if any stage has died, or exited early if not closing."""
+        for (i, worker) in enumerate(self.workers):
+            if worker.is_alive() or (closing and worker.exitcode == 0):
+                continue
+            # its examples are lost, so the rest can never come out
+            self._in_flight = 0
+            self._failed = RuntimeError(
+                "pipeline stage {} of {} exited with code {}".format(
+                    i, self.stages[i], worker.exitcode))
+            raise self._failed
+
+    def _get(self, tail, closing=False):
+        """Get next packet from tail, raising if a stage dies first."""
+        while True:
+            try:
+                return tail.get(timeout=self.poll)
+            except queue.Empty:
+                self._check(closing=closing)
+
+    def _put(self, head, packet):
+        """Put packet on head, raising if a stage dies first."""
+        while True:
+            try:
+                return head.put(packet, timeout=self.poll)
+            except queue.Full:
+                self._check()
+
+    def __enter__(self):
+        """Start pipeline for use as a context manager."""
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop pipeline workers."""
+        self.close()
+
+    def stream(self, inputs):
+        """Lazily infer outcomes of inputs, yielding outputs of each in order.
+
+        Inputs are drawn from their iterables only while there is room in the
+        pipeline, so arbitrarily long streams run in bounded memory.
+
+        :arg inputs: dictionary of input neuron names to iterables of examples
+        :type inputs: dict
+        :return: generator of dictionaries of output neuron names to
+            activations
+        """
+        self.start()
+        if self._failed is not None:
+            raise self._failed
+        neurons = list(inputs.keys())
+        head = self._queues[0]
+        tail = self._queues[-1]
+        try:
+            for signals in itertools.zip_longest(*inputs.values()):
+                if self._in_flight == self.window:
+                    yield self._take(tail)
+                self._put(head, {"inputs": dict(zip(neurons, signals)),
+                                 "slots": {}, "outputs": {}, "error": None})
+                self._in_flight += 1
+            while self._in_flight > 0:
+                yield self._take(tail)
+        finally:
+            # never leave examples of this stream for the next one to take
+            while self._in_flight > 0:
+                self._get(tail)
+                self._in_flight -= 1
+
+    def _take(self, tail):
+        """Get outputs of the oldest example in flight, raising its error."""
+        packet = self._get(tail)
+        self._in_flight -= 1
+        if packet["error"] is not None:
+            raise packet["error"]
+        return packet["outputs"]
+
+    def stimulate(self, neurons, signals, receptor="forward"):
+        """Stimulate neurons with a single example, through the pipeline.
+
+        :arg receptor: only "forward" is supported
+        """
+        if receptor != "forward":
+            raise ValueError("pipeline can only fire {} not {}".format(
+                "forward", receptor))
+        outputs = deque(self.stream(
+            {n: [s] for (n, s) in zip(neurons, signals)}), maxlen=1)
+        return outputs.pop()
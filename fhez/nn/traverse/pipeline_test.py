@@ -0,0 +1,153 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-26T10:02:41+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-26T10:02:41+01:00
+
+import os
+import time
+import unittest
+import numpy as np
+import networkx as nx
+
+from fhez.nn.graph.io import IO
+from fhez.nn.graph.prefab import cnn_classifier
+from fhez.nn.graph.utils import infer
+from fhez.nn.traverse.pipeline import Pipeline, stages
+
+
+class Sleeper(IO):
+    """IO node that takes a while to fire."""
+
+    def forward(self, x):
+        """Sleep then pass input through."""
+        time.sleep(0.1)
+        return x
+
+
+class Crash(IO):
+    """IO node that kills the process it fires in."""
+
+    def forward(self, x):
+        """Exit without passing anything on."""
+        os._exit(1)
+
+
+class Unpicklable(Exception):
+    """Exception that cannot be pickled to be sent between processes."""
+
+    def __init__(self):
+        """Hold a lambda, which pickle cannot serialise."""
+        super().__init__(lambda: None)
+
+
+class Raiser(IO):
+    """IO node that raises an unpicklable exception."""
+
+    def forward(self, x):
+        """Raise without passing anything on."""
+        raise Unpicklable()
+
+
+class PipelineTest(unittest.TestCase):
+    """Test pipeline parallel traversal."""
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.start_time = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.start_time
+        print('%s: %.3f' % (self.id(), t))
+
+    @property
+    def data_shape(self):
+        """Define desired data shape."""
+        return (28, 28)
+
+    def test_stages(self):
+        """Check stages are a chain every edge goes forward along."""
+        graph = cnn_classifier(10)
+        for max_stages in [None, 3]:
+            chain = stages(graph, max_stages=max_stages)
+            if max_stages is not None:
+                self.assertEqual(len(chain), max_stages)
+            stage = {name: i for (i, s) in enumerate(chain) for name in s}
+            self.assertEqual(len(stage), graph.number_of_nodes())
+            for (src, dst) in graph.edges():
+                self.assertLessEqual(stage[src], stage[dst])
+        # interleaved groups are split rather than merged
+        chain = stages(graph)
+        self.assertEqual(chain[0], ["x", "y", "One-hot-encoder"])
+        self.assertEqual(chain[1], ["CC-products"])
+
+    def test_stream(self):
+        """Check pipelined inference matches inference."""
+        graph = cnn_classifier(10)
+        x = np.random.rand(5, *self.data_shape)
+        y = np.arange(5)
+        truth = infer(graph=graph, inputs={"x": x, "y": y})
+        with Pipeline(graph=graph, max_stages=3) as pipeline:
+            outputs = list(pipeline.stream({"x": iter(x), "y": iter(y)}))
+            single = pipeline.stimulate(neurons=["x", "y"],
+                                        signals=[x[0], y[0]])
+        self.assertEqual(len(outputs), len(y))
+        for key, value in truth.items():
+            np.testing.assert_array_almost_equal(
+                [o[key] for o in outputs], value, decimal=4, verbose=True)
+            np.testing.assert_array_almost_equal(single[key], value[0],
+                                                 decimal=4, verbose=True)
+
+    def test_throughput(self):
+        """Check throughput approaches that of the slowest stage."""
+        graph = nx.MultiDiGraph()
+        names = ["a", "b", "c"]
+        for (i, name) in enumerate(names):
+            graph.add_node(name, group=i, node=Sleeper())
+        graph.add_edge("a", "b")
+        graph.add_edge("b", "c")
+        with Pipeline(graph=graph) as pipeline:
+            self.assertEqual(len(pipeline.stages), len(names))
+            start = time.time()
+            outputs = list(pipeline.stream({"a": range(6)}))
+            # serially this would take 6 * 3 * 0.1 seconds
+            self.assertLess(time.time() - start, 1.2)
+        self.assertEqual([o["c"] for o in outputs], list(range(6)))
+
+    def test_error(self):
+        """Check errors are raised in order and leave pipeline usable."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", group=0, node=IO())
+        graph.add_node("y", group=1, node=IO())
+        graph.add_edge("x", "y")
+        with Pipeline(graph=graph) as pipeline:
+            outputs = pipeline.stream({"x": [1.0, np.inf, 2.0]})
+            self.assertEqual(next(outputs)["y"], 1.0)
+            with self.assertRaises(ValueError):
+                next(outputs)
+            outputs = list(pipeline.stream({"x": [3.0]}))
+            self.assertEqual(outputs, [{"y": 3.0}])
+
+    def test_unpicklable_error(self):
+        """Check errors that cannot be pickled are still raised."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", group=0, node=IO())
+        graph.add_node("y", group=1, node=Raiser())
+        graph.add_edge("x", "y")
+        with Pipeline(graph=graph, poll=0.01) as pipeline:
+            with self.assertRaisesRegex(RuntimeError, "Unpicklable"):
+                pipeline.stimulate(neurons=["x"], signals=[1.0])
+
+    def test_dead_stage(self):
+        """Check a dead stage raises rather than blocking forever."""
+        graph = nx.MultiDiGraph()
+        graph.add_node("x", group=0, node=IO())
+        graph.add_node("y", group=1, node=Crash())
+        graph.add_edge("x", "y")
+        with Pipeline(graph=graph, poll=0.01) as pipeline:
+            with self.assertRaises(RuntimeError):
+                list(pipeline.stream({"x": range(20)}))
+            # the pipeline stays broken until closed
+            with self.assertRaises(RuntimeError):
+                pipeline.stimulate(neurons=["x"], signals=[1])
+        self.assertEqual(pipeline.workers, [])
@@ -0,0 +1,212 @@
+"""Per node profiling of graph traversal, exportable as a Chrome trace."""
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-25T09:12:03+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-25T09:12:03+01:00
+
+import os
+import json
+import time
+import threading
+import types
+import numpy as np
+
+
+def describe(signal):
+    """Describe the shape and cyphertexts of a signal without decrypting it.
+
+    Cyphertexts are found by duck typing, so that plaintext graphs do not need
+    SEAL, and lazily pending arithmetic is not forced just to be measured.
+
+    :arg signal: any signal passed between nodes
+    :return: shape, number of cyphertexts, bytes, and lowest modulus level
+    :rtype: dict
+    """
+    description = {"shape": None, "cyphertexts": 0, "bytes": 0,
+                   "level": None}
+    if signal is None or isinstance(signal, types.GeneratorType):
+        return description
+    if isinstance(signal, (list, tuple)):
+        description["shape"] = (len(signal),)
+        for i, item in enumerate(signal):
+            sub = describe(item)
+            if i == 0 and sub["shape"] is not None:
+                description["shape"] += tuple(sub["shape"])
+            _accumulate(description, sub)
+        return description
+    cyphertext = signal.__dict__.get("_cyphertext") if hasattr(
+        signal, "__dict__") else None
+    if isinstance(cyphertext, list):
+        # ReArray of ReSeal cyphertexts
+        description["shape"] = tuple(signal.shape)
+        for reseal in cyphertext:
+            _accumulate(description, _describe_reseal(reseal))
+        return description
+    if hasattr(signal, "__dict__") and "_ciphertext" in signal.__dict__:
+        return _describe_reseal(signal)
+    array = np.asarray(signal)
+    if array.dtype == object:
+        description["shape"] = array.shape
+        return description
+    description["shape"] = array.shape
+    description["bytes"] = array.nbytes
+    return description
+
+
+def _describe_reseal(reseal):
+    """Describe a single ReSeal cyphertext, if it has been computed."""
+    description = {"shape": None, "cyphertexts": 1, "bytes": 0,
+                   "level": None}
+    ciphertext = reseal.__dict__.get("_ciphertext")
+    if ciphertext is None or reseal.__dict__.get("_expression") is not None:
+        return description
+    # each polynomial has one 64 bit word per coefficient per remaining prime
+    description["bytes"] = ciphertext.size() * \
+        ciphertext.poly_modulus_degree() * \
+        ciphertext.coeff_modulus_size() * 8
+    description["level"] = reseal.context.get_context_data(
+        ciphertext.parms_id()).chain_index()
+    return description
+
+
+def _accumulate(description, sub):
+    """Add cyphertexts and bytes of sub into description, keep min level."""
+    description["cyphertexts"] += sub["cyphertexts"]
+    description["bytes"] += sub["bytes"]
+    if sub["level"] is not None:
+        description["level"] = sub["level"] if description["level"] is None \
+            else min(description["level"], sub["level"])
+
+
+class Profiler(object):
+    """Record wall time, CPU time and signal descriptions of each node."""
+
+    def __init__(self):
+        """Initialise an empty profiler."""
+        self.records = []
+
+    @property
+    def records(self):
+        """Get list of each nodes recorded firing."""
+        return self.__dict__.get("_records")
+
+    @records.setter
+    def records(self, records):
+        self._records = records
+
+    def clear(self):
+        """Forget all recorded firings."""
+        self.records = []
+
+    @staticmethod
+    def clock():
+        """Get current (wall, cpu) time of this thread."""
+        return (time.perf_counter(), time.thread_time())
+
+    def record(self, node_name, receptor, start, signal=None, activation=None,
+               end=None, pid=None, tid=None):
+        """Record a node having fired.
+
+        :arg node_name: name of node in graph
+        :arg receptor: name of method of node fired
+        :arg start: (wall, cpu) :meth:`clock` from when node began
+        :arg signal: input signal to node
+        :arg activation: output signal of node
+        :arg end: (wall, cpu) :meth:`clock` of when node finished, else now
+        :arg pid: process the node fired in, else this one
+        :arg tid: thread the node fired in, else this one
+        """
+        end = end if end is not None else self.clock()
+        self.records.append({
+            "node": node_name,
+            "receptor": receptor,
+            "start": start[0],
+            "wall": end[0] - start[0],
+            "cpu": end[1] - start[1],
+            "pid": pid if pid is not None else os.getpid(),
+            "tid": tid if tid is not None else threading.get_ident(),
+            "inputs": describe(signal),
+            "outputs": describe(activation),
+        })
+
+    def summary(self):
+        """Get per node and receptor summary, slowest total wall time first.
+
+        :return: list of summaries, with number of calls, total and mean wall
+            and CPU time, and the description of the last outputs
+        :rtype: list(dict)
+        """
+        summaries = {}
+        for record in self.records:
+            key = (record["node"], record["receptor"])
+            summary = summaries.get(key)
+            if summary is None:
+                summary = {"node": record["node"],
+                           "receptor": record["receptor"],
+                           "calls": 0, "wall": 0.0, "cpu": 0.0}
+                summaries[key] = summary
+            summary["calls"] += 1
+            summary["wall"] += record["wall"]
+            summary["cpu"] += record["cpu"]
+            summary.update(record["outputs"])
+        for summary in summaries.values():
+            summary["mean_wall"] = summary["wall"] / summary["calls"]
+        return sorted(summaries.values(), key=lambda s: s["wall"],
+                      reverse=True)
+
+    def table(self):
+        """Get human readable table of :meth:`summary`."""
+        header = "{:<24} {:<10} {:>6} {:>10} {:>10} {:>10} {:<16} {:>5} " \
+            "{:>12} {:>5}"
+        lines = [header.format("node", "receptor", "calls", "wall(s)",
+                               "mean(s)", "cpu(s)", "shape", "cts", "bytes",
+                               "level")]
+        for s in self.summary():
+            lines.append(header.format(
+                str(s["node"])[:24], str(s["receptor"])[:10], s["calls"],
+                "{:.6f}".format(s["wall"]), "{:.6f}".format(s["mean_wall"]),
+                "{:.6f}".format(s["cpu"]), str(s["shape"])[:16],
+                s["cyphertexts"], s["bytes"],
+                "" if s["level"] is None else s["level"]))
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """Get records as Chrome trace event format.
+
+        Load the saved json in ``chrome://tracing`` or Perfetto to see each
+        node as a slice on the process and thread it fired on.
+
+        :return: json serialisable trace
+        :rtype: dict
+        """
+        events = []
+        for record in self.records:
+            events.append({
+                "name": str(record["node"]),
+                "cat": record["receptor"],
+                "ph": "X",
+                "ts": record["start"] * 1e6,
+                "dur": record["wall"] * 1e6,
+                "pid": record["pid"],
+                "tid": record["tid"],
+                "args": {
+                    "cpu": record["cpu"],
+                    "inputs": _jsonable(record["inputs"]),
+                    "outputs": _jsonable(record["outputs"]),
+                },
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save_chrome_trace(self, path):
+        """Save :meth:`chrome_trace` as json to path."""
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def _jsonable(description):
+    """Get description with shape as a list so it can be json dumped."""
+    description = dict(description)
+    if description["shape"] is not None:
+        description["shape"] = [int(i) for i in description["shape"]]
+    description["bytes"] = int(description["bytes"])
+    return description
@@ -0,0 +1,94 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-25T09:12:03+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-25T09:12:03+01:00
+
+import os
+import json
+import time
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from fhez.nn.graph.prefab import cnn_classifier
+from fhez.nn.traverse.firing import Firing
+from fhez.nn.traverse.profiler import Profiler, describe
+
+
+class ProfilerTest(unittest.TestCase):
+    """Test profiling of graph traversal."""
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.start_time = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.start_time
+        print('%s: %.3f' % (self.id(), t))
+
+    @property
+    def data(self):
+        """Get some generated data."""
+        return np.random.rand(28, 28)
+
+    def test_describe(self):
+        """Check signals are described by shape and bytes."""
+        description = describe(np.zeros((3, 4)))
+        self.assertEqual(description["shape"], (3, 4))
+        self.assertEqual(description["bytes"], 3 * 4 * 8)
+        self.assertEqual(description["cyphertexts"], 0)
+        description = describe([np.zeros(2), np.zeros(2)])
+        self.assertEqual(description["shape"], (2, 2))
+        self.assertEqual(description["bytes"], 2 * 2 * 8)
+        self.assertEqual(describe(None)["shape"], None)
+
+    def test_record(self):
+        """Check every node fired is recorded with its shapes."""
+        graph = cnn_classifier(10, dense=True)
+        profiler = Profiler()
+        Firing(graph=graph, profiler=profiler).stimulate(
+            neurons=["x", "y"], signals=[self.data, 1])
+        self.assertEqual(len(profiler.records), graph.number_of_nodes())
+        summary = {s["node"]: s for s in profiler.summary()}
+        self.assertEqual(summary["x"]["shape"], (28, 28))
+        self.assertEqual(summary["Dense"]["shape"], (10,))
+        # each yielded output of a dequeue is recorded
+        self.assertEqual(summary["CC-dequeue"]["shape"][0],
+                         graph.out_degree("CC-dequeue"))
+        for s in summary.values():
+            self.assertEqual(s["calls"], 1)
+            self.assertGreaterEqual(s["wall"], 0)
+        self.assertIn("CC-products", profiler.table())
+
+    def test_chrome_trace(self):
+        """Check chrome trace has an event per node and can be saved."""
+        graph = cnn_classifier(10)
+        profiler = Profiler()
+        with ThreadPoolExecutor(2) as executor:
+            Firing(graph=graph, profiler=profiler,
+                   executor=executor).stimulate(neurons=["x", "y"],
+                                                signals=[self.data, 1])
+        trace = profiler.chrome_trace()
+        self.assertEqual(len(trace["traceEvents"]), graph.number_of_nodes())
+        for event in trace["traceEvents"]:
+            self.assertEqual(event["ph"], "X")
+            self.assertEqual(event["cat"], "forward")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            profiler.save_chrome_trace(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f), json.loads(json.dumps(trace)))
+
+    def test_disabled(self):
+        """Check nothing is recorded unless a profiler is given."""
+        f = Firing(graph=cnn_classifier(10))
+        self.assertIsNone(f.profiler)
+        f.stimulate(neurons=["x", "y"], signals=[self.data, 1])
+        profiler = Profiler()
+        f.profiler = profiler
+        f.stimulate(neurons=["x", "y"], signals=[self.data, 1])
+        f.profiler = None
+        f.stimulate(neurons=["x", "y"], signals=[self.data, 1])
+        self.assertEqual(len(profiler.records), f.graph.number_of_nodes())
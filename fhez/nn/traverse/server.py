@@ -0,0 +1,329 @@
+"""Dynamically batching inference server of a graph, over a local socket."""
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-28T11:40:52+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-28T11:40:52+01:00
+
+import os
+import time
+import pickle
+import struct
+import numbers
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from fhez.nn.traverse.firing import Firing
+from fhez.nn.traverse.distributed import PickleCodec
+
+
+async def _send(writer, message, codec):
+    """Write message encoded by codec with its length prefixed."""
+    data = codec.encode(message)
+    writer.write(struct.pack(">Q", len(data)) + data)
+    await writer.drain()
+
+
+async def _recv(reader, codec):
+    """Read length prefixed message decoded by codec, None once closed."""
+    try:
+        header = await reader.readexactly(8)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = struct.unpack(">Q", header)
+    return codec.decode(await reader.readexactly(length))
+
+
+def _is_plaintext(signal):
+    """Get if signal is plaintext numbers, which can be stacked."""
+    if isinstance(signal, (list, tuple)):
+        return all(_is_plaintext(s) for s in signal)
+    if isinstance(signal, np.ndarray):
+        return signal.dtype != object
+    return isinstance(signal, numbers.Number)
+
+
+class InferenceServer(object):
+    """Long running inference of one graph, coalescing requests into batches.
+
+    The graph, and so any keys and contexts of its nodes, is loaded once and
+    kept warm for every request. Requests that arrive while a batch is
+    waiting, up to max_batch of them or until deadline seconds after the
+    first, are stacked and fired through the graph together, using each
+    nodes vectorised "forwards". Cyphertexts, such as
+    :class:`fhez.rearray.ReArray` signals, cannot be stacked without
+    decrypting them, so batches with any encrypted request are fired one
+    request at a time instead. Only one batch is fired at a time, in a
+    background thread, so the event loop keeps accepting requests.
+
+    .. warning::
+
+        Requests are decoded by a :class:`fhez.nn.traverse.distributed.Codec`
+        defaulting to :class:`fhez.nn.traverse.distributed.PickleCodec`,
+        which trusts whoever is on the other end, as decoding a malicious
+        request can run arbitrary code in the process holding the keys. The
+        socket is only accessible by its owner, so only trusted local peers
+        of the same user are supported with it, anything else needs a codec
+        that is safe to decode untrusted bytes.
+    """
+
+    def __init__(self, graph=None, neurons: list = None,
+                 max_batch: int = None, deadline: float = None,
+                 batched: bool = None, validation: str = None,
+                 codec=None):
+        """Initialise server of graph.
+
+        :arg neurons: names of input neurons each request gives a signal for
+        :type neurons: list(str)
+        :arg max_batch: maximum number of requests fired together
+        :type max_batch: int
+        :arg deadline: seconds the first request of a batch may wait for more
+        :type deadline: float
+        :arg batched: fire batches with "forwards", else each request in turn
+        :type batched: bool
+        :arg validation: see :attr:`fhez.nn.traverse.firing.Firing.validation`
+        :type validation: str
+        :arg codec: codec of requests and responses, defaults to
+            :class:`fhez.nn.traverse.distributed.PickleCodec`
+        :type codec: fhez.nn.traverse.distributed.Codec
+        """
+        self.graph = graph
+        self.codec = codec if codec is not None else PickleCodec()
+        self.neurons = neurons if neurons is not None else ["x"]
+        self.max_batch = max_batch if max_batch is not None else 32
+        self.deadline = deadline if deadline is not None else 0.01
+        self.batched = batched if batched is not None else True
+        for (_, data) in graph.nodes(data=True):
+            # inference never backpropagates so do not hold inputs for it
+            data["node"].disable_cache()
+        self.firing = Firing(graph=graph, free_signals=True,
+                             validation=validation if validation is not None
+                             else "terminal")
+        self.latencies = deque(maxlen=10000)
+        self.requests = 0
+        self.batches = 0
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Get server of pickled graph at path.
+
+        :arg path: path to graph pickled with :func:`pickle.dump`
+        :type path: str
+        """
+        with open(path, "rb") as f:
+            graph = pickle.load(f)
+        return cls(graph=graph, **kwargs)
+
+    @property
+    def queue(self):
+        """Get queue of requests waiting to be batched, in the running loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if self.__dict__.get("_queue") is None or (
+                loop is not None and loop is not self._loop):
+            self._queue = asyncio.Queue()
+            self._loop = loop
+        return self._queue
+
+    def warmup(self, signals):
+        """Fire a request through the graph before serving.
+
+        Compiles the graphs plan, and forces any lazily generated keys or
+        contexts, so the first real request does not pay for them.
+        """
+        return self._fire([signals])[0]
+
+    async def infer(self, signals):
+        """Get outputs of graph for one request of positional signals.
+
+        :arg signals: one signal per input neuron
+        :type signals: list
+        :return: dictionary of output neuron names to activations
+        :rtype: dict
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((signals, future, time.perf_counter()))
+        return await future
+
+    def stats(self):
+        """Get queue depth, throughput, and latency percentiles in seconds."""
+        latencies = np.array(self.latencies)
+        return {
+            "queue_depth": self.queue.qsize(),
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch": self.requests / self.batches if self.batches
+            else 0.0,
+            "p50": float(np.percentile(latencies, 50)) if len(latencies)
+            else None,
+            "p99": float(np.percentile(latencies, 99)) if len(latencies)
+            else None,
+        }
+
+    async def batcher(self):
+        """Coalesce queued requests into batches and fire them, forever."""
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(1) as executor:
+            while True:
+                batch = [await self.queue.get()]
+                close = loop.time() + self.deadline
+                while len(batch) < self.max_batch:
+                    timeout = close - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(
+                            self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                signals = [signals for (signals, _, _) in batch]
+                outputs = await loop.run_in_executor(
+                    executor, self._isolate, signals)
+                self.batches += 1
+                end = time.perf_counter()
+                for ((_, future, start), out) in zip(batch, outputs):
+                    self.requests += 1
+                    self.latencies.append(end - start)
+                    if future.cancelled():
+                        continue
+                    if isinstance(out, Exception):
+                        future.set_exception(out)
+                    else:
+                        future.set_result(out)
+
+    def _isolate(self, batch):
+        """Fire batch, refiring each alone if it fails to find which did."""
+        try:
+            return self._fire(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                return [e]
+        outputs = []
+        for signals in batch:
+            try:
+                outputs.extend(self._fire([signals]))
+            except Exception as e:
+                outputs.append(e)
+        return outputs
+
+    def _fire(self, batch):
+        """Fire batch of requests through graph, getting each ones outputs."""
+        if self.batched is not True or not all(
+                _is_plaintext(signal) for signals in batch
+                for signal in signals):
+            return [self.firing.stimulate(neurons=self.neurons,
+                                          signals=list(signals),
+                                          receptor="forward")
+                    for signals in batch]
+        stacked = [np.stack(column) for column in zip(*batch)]
+        out = self.firing.stimulate(neurons=self.neurons, signals=stacked,
+                                    receptor="forwards")
+        keys = list(out.keys())
+        return [dict(zip(keys, values)) for values in zip(*out.values())]
+
+    async def handle(self, reader, writer):
+        """Answer each ("infer", signals) or ("stats", None) of a client."""
+        try:
+            while True:
+                request = await _recv(reader, self.codec)
+                if request is None:
+                    break
+                kind, signals = request
+                try:
+                    if kind == "stats":
+                        response = (self.stats(), None)
+                    else:
+                        response = (await self.infer(signals), None)
+                except Exception as e:
+                    response = (None, e)
+                await _send(writer, response, self.codec)
+        finally:
+            writer.close()
+
+    async def serve(self, path):
+        """Serve requests on a unix socket at path until cancelled.
+
+        The socket is created readable and writable only by its owner.
+        """
+        batcher = asyncio.ensure_future(self.batcher())
+        # never let the socket exist with wider permissions, even briefly
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path=path)
+        finally:
+            os.umask(umask)
+        os.chmod(path, 0o600)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+class Client(object):
+    """Client of an :class:`InferenceServer` on a unix socket."""
+
+    def __init__(self, path, codec=None):
+        """Initialise client of server at path, connecting on first use.
+
+        :arg codec: codec of the server, defaults to
+            :class:`fhez.nn.traverse.distributed.PickleCodec`
+        :type codec: fhez.nn.traverse.distributed.Codec
+        """
+        self.path = path
+        self.codec = codec if codec is not None else PickleCodec()
+
+    async def _request(self, kind, signals=None):
+        """Send request, get its response or raise its error."""
+        if self.__dict__.get("_writer") is None:
+            self._reader, self._writer = await asyncio.open_unix_connection(
+                self.path)
+        await _send(self._writer, (kind, signals), self.codec)
+        response, error = await _recv(self._reader, self.codec)
+        if error is not None:
+            raise error
+        return response
+
+    async def infer(self, signals):
+        """Get outputs of served graph for one request of signals."""
+        return await self._request("infer", signals)
+
+    async def stats(self):
+        """Get stats of server, see :meth:`InferenceServer.stats`."""
+        return await self._request("stats")
+
+    async def close(self):
+        """Close connection to server."""
+        if self.__dict__.get("_writer") is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+
+def main(argv=None):
+    """Serve pickled graph from the command line."""
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        epilog="warning: requests are unpickled, which can run arbitrary "
+        "code, so only serve trusted local peers of the same user. The "
+        "socket is created accessible only by its owner.")
+    parser.add_argument("graph", help="path to pickled graph")
+    parser.add_argument("--socket", default="fhez.sock",
+                        help="path of unix socket to serve on")
+    parser.add_argument("--neurons", nargs="+", default=["x"],
+                        help="input neurons of each request")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--deadline", type=float, default=0.01,
+                        help="seconds a request may wait to be batched")
+    args = parser.parse_args(argv)
+    server = InferenceServer.load(args.graph, neurons=args.neurons,
+                                  max_batch=args.max_batch,
+                                  deadline=args.deadline)
+    asyncio.run(server.serve(args.socket))
+
+
+if __name__ == "__main__":
+    main()
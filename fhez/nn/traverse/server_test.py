@@ -0,0 +1,170 @@
+# @Author: George Onoufriou <archer>
+# @Date:   2021-10-28T11:40:52+01:00
+# @Last modified by:   archer
+# @Last modified time: 2021-10-28T11:40:52+01:00
+
+import os
+import stat
+import time
+import pickle
+import asyncio
+import tempfile
+import unittest
+import importlib.util
+import numpy as np
+
+from fhez.nn.graph.prefab import cnn_classifier
+from fhez.nn.traverse.firing import Firing
+from fhez.nn.traverse.distributed import PickleCodec
+from fhez.nn.traverse.server import InferenceServer, Client
+
+
+class Tagged(PickleCodec):
+    """Codec that tags messages so any other codec cannot decode them."""
+
+    def encode(self, message):
+        """Get tagged pickle of message."""
+        return b"tag" + super().encode(message)
+
+    def decode(self, data: bytes):
+        """Untag and unpickle message."""
+        if not data.startswith(b"tag"):
+            raise ValueError("untagged message")
+        return super().decode(data[3:])
+
+
+class ServerTest(unittest.TestCase):
+    """Test dynamically batching inference server."""
+
+    def setUp(self):
+        """Start timer and init variables."""
+        self.start_time = time.time()
+
+    def tearDown(self):
+        """Calculate and print time delta."""
+        t = time.time() - self.start_time
+        print('%s: %.3f' % (self.id(), t))
+
+    @property
+    def data_shape(self):
+        """Define desired data shape."""
+        return (28, 28)
+
+    @property
+    def reseal_args(self):
+        """Get some reseal arguments for encryption."""
+        return {
+            "scheme": 2,  # seal.scheme_type.CKK,
+            "poly_modulus_degree": 8192*2,  # 438
+            # "coefficient_modulus": [60, 40, 40, 60],
+            "coefficient_modulus":
+                [45, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 45],
+            "scale": pow(2.0, 30),
+            "cache": True,
+        }
+
+    @unittest.skipIf(importlib.util.find_spec("seal") is None,
+                     "encrypted requests need SEAL python bindings")
+    def test_infer_encrypted(self):
+        """Check encrypted requests are fired alone rather than stacked."""
+        from fhez.rearray import ReArray
+        graph = cnn_classifier(10)
+        xs = np.random.rand(3, *self.data_shape)
+        truth = [Firing(graph=graph).stimulate(neurons=["x"], signals=[x])
+                 for x in xs]
+        cyphertexts = [ReArray(x, **self.reseal_args) for x in xs]
+        server = InferenceServer(graph=graph, neurons=["x"], max_batch=4,
+                                 deadline=0.05)
+
+        async def run():
+            batcher = asyncio.ensure_future(server.batcher())
+            outputs = await asyncio.gather(
+                *[server.infer([c]) for c in cyphertexts])
+            batcher.cancel()
+            return outputs
+
+        outputs = asyncio.run(run())
+        for (out, true) in zip(outputs, truth):
+            self.assertEqual(out["y_hat"], true["y_hat"])
+        # still coalesced into one batch, just not stacked
+        self.assertEqual(server.stats()["batches"], 1)
+
+    def test_infer(self):
+        """Check concurrent requests are batched and match firing each."""
+        graph = cnn_classifier(10)
+        xs = np.random.rand(8, *self.data_shape)
+        truth = [Firing(graph=graph).stimulate(neurons=["x"], signals=[x])
+                 for x in xs]
+        server = InferenceServer(graph=graph, neurons=["x"], max_batch=4,
+                                 deadline=0.05)
+        server.warmup([xs[0]])
+
+        async def run():
+            batcher = asyncio.ensure_future(server.batcher())
+            outputs = await asyncio.gather(*[server.infer([x]) for x in xs])
+            batcher.cancel()
+            return outputs
+
+        outputs = asyncio.run(run())
+        for (out, true) in zip(outputs, truth):
+            np.testing.assert_array_almost_equal(out["y_hat"], true["y_hat"],
+                                                 decimal=4,
+                                                 verbose=True)
+        stats = server.stats()
+        self.assertEqual(stats["requests"], len(xs))
+        self.assertEqual(stats["batches"], 2)
+
+        async def bad():
+            batcher = asyncio.ensure_future(server.batcher())
+            # too small for the convolution
+            outputs = await asyncio.gather(
+                server.infer([xs[0]]), server.infer([np.zeros((3, 3))]),
+                return_exceptions=True)
+            batcher.cancel()
+            return outputs
+
+        (good, error) = asyncio.run(bad())
+        # one bad request does not fail the others batched with it
+        self.assertIsInstance(error, ValueError)
+        np.testing.assert_array_almost_equal(good["y_hat"],
+                                             truth[0]["y_hat"],
+                                             decimal=4,
+                                             verbose=True)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertLessEqual(stats["p50"], stats["p99"])
+
+    def test_socket(self):
+        """Check requests over a unix socket, serving a pickled graph."""
+        graph = cnn_classifier(10)
+        x = np.random.rand(*self.data_shape)
+        truth = Firing(graph=graph).stimulate(neurons=["x"], signals=[x])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "graph.pkl")
+            with open(path, "wb") as f:
+                pickle.dump(graph, f)
+            server = InferenceServer.load(path, neurons=["x"],
+                                          codec=Tagged())
+            socket = os.path.join(directory, "fhez.sock")
+
+            async def run():
+                serving = asyncio.ensure_future(server.serve(socket))
+                while not os.path.exists(socket):
+                    await asyncio.sleep(0.01)
+                # only the owner may connect to the socket
+                self.assertEqual(stat.S_IMODE(os.stat(socket).st_mode),
+                                 0o600)
+                client = Client(socket, codec=Tagged())
+                out = await client.infer([x])
+                with self.assertRaises(ValueError):
+                    # too small for the convolution
+                    await client.infer([np.zeros((3, 3))])
+                stats = await client.stats()
+                await client.close()
+                serving.cancel()
+                return out, stats
+
+            out, stats = asyncio.run(run())
+        np.testing.assert_array_almost_equal(out["y_hat"], truth["y_hat"],
+                                             decimal=4,
+                                             verbose=True)
+        self.assertEqual(stats["requests"], 2)
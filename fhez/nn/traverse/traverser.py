@@ -8,3 +8,15 @@ import abc
 
 class Traverser(abc.ABC):
     """Abstract base class for API uniformity and general utilities."""
+
+    @property
+    def profiler(self):
+        """Get profiler to record each node fired by, None to not profile.
+
+        See :class:`fhez.nn.traverse.profiler.Profiler`.
+        """
+        return self.__dict__.get("_profiler")
+
+    @profiler.setter
+    def profiler(self, profiler):
+        self._profiler = profiler
@@ -35,6 +35,19 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
     optimise somewhat during serialisation as we can handle the duplicate data
     ourselves and not worry the user with the intricacies of serialising this
     encryption.
+
+    By default each example is encrypted in its own cyphertext, padded to the
+    full number of slots. If packed=True examples are instead concatenated
+    into as few cyphertexts as possible, each example occupying a block of
+    stride slots (the examplesize rounded up to a power of 2) so a
+    cyphertext of S slots holds S // stride examples. E.G 30 features on 4096
+    slots gives stride 32, and 128 examples per cyphertext. The logical shape
+    is unchanged, the layout is recorded in origin.
+
+    Sums over example axes (axis > 0) stay encrypted, they are folded inside
+    each cyphertext by rotate and add. The sums are left in place rather than
+    compacted so origin also records the slot_strides between consecutive
+    elements of each example axis.
     """
 
     # numpy remap class attribute NOT instance attribute!!!
@@ -46,9 +59,12 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
         seed: ReSeal = None,
         clone=None,
         cyphertext=None,
+        packed: bool = None,
         **reseal_args
     ):
         if clone is None:
+            # layout must be known before encryption
+            self.packed = packed
             # automatic seed generation for encryption
             self.seed = reseal_args if seed is None else seed
             # automatic encryption
@@ -91,6 +107,15 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
         # call encryptor to test if it exists or to generate it
         self.seed.encryptor
 
+    @property
+    def packed(self):
+        """Get if many examples are packed into each cyphertext."""
+        return bool(self.__dict__.get("_packed"))
+
+    @packed.setter
+    def packed(self, packed: bool):
+        self._packed = packed
+
     @property
     def cyphertext(self):
         return self._cyphertext
@@ -99,29 +124,25 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
     def cyphertext(self, data):
         if isinstance(data, np.ndarray):
             self._cyphertext = []
-            view = data.view()
-            # capture original data form so we can return to it later
-            # and use it to interpret multidimensional operations
-            self.origin = {
-                "shape": data.shape,
-                "size": data.size,
-            }
-            # reshape data to (batchsize, examplesize)
-            view.shape = (
-                self.origin["shape"][0],
-                int(self.origin["size"] / self.origin["shape"][0]),
-            )
+            example_size = int(data.size / data.shape[0])
             # checking if cyphertext is too small to fit data into
-            if view.shape[1] > len(self.seed):
+            if example_size > len(self.seed):
                 raise OverflowError(
                     "Data too big or encryption too small to fit:",
                     "data {} -> {} > {} reseal.len".format(
-                        self.origin["shape"][1:], view.shape[1], len(self.seed)
+                        data.shape[1:], example_size, len(self.seed)
                     ),
                 )
+            # capture original data form so we can return to it later
+            # and use it to interpret multidimensional operations
+            self.origin = {
+                "shape": data.shape,
+                "size": data.size,
+            }
+            self.origin.update(self._layout(example_size))
             # iterate through, encrypt (using same seed), and append to list
             # for later use
-            for sample in view:
+            for sample in self._pack(data):
                 seedling = self.seedling
                 seedling.ciphertext = sample
                 self.cyphertext.append(seedling)
@@ -142,6 +163,70 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
     def shape(self):
         return self.origin["shape"]
 
+    @property
+    def example_size(self):
+        """Number of values in each individual example."""
+        return self.origin["size"] // self.origin["shape"][0]
+
+    @property
+    def stride(self):
+        """Number of slots between the start of each packed example."""
+        return self.origin.get("stride", self.example_size)
+
+    @property
+    def per_cyphertext(self):
+        """Number of examples held by each cyphertext."""
+        return self.origin.get("per_cyphertext", 1)
+
+    @property
+    def slot_strides(self):
+        """Slots between consecutive elements of each example axis."""
+        strides = self.origin.get("slot_strides")
+        if strides is None:
+            # contiguous row major layout
+            strides = ()
+            step = 1
+            for dim in reversed(self.shape[1:]):
+                strides = (step,) + strides
+                step *= dim
+        return tuple(strides)
+
+    @property
+    def slots(self):
+        """Slot of each element of an example within its block (flat)."""
+        slots = np.zeros(self.shape[1:], dtype=int)
+        for axis, step in enumerate(self.slot_strides):
+            index_shape = [1] * len(self.shape[1:])
+            index_shape[axis] = self.shape[axis + 1]
+            slots = slots + np.arange(self.shape[axis + 1]).reshape(index_shape) * step
+        return slots.reshape(-1)
+
+    @property
+    def is_contiguous(self):
+        """Check if examples are laid out contiguously from slot 0."""
+        return self.origin.get("slot_strides") is None or np.array_equal(
+            self.slots, np.arange(self.example_size)
+        )
+
+    def _layout(self, example_size):
+        """Calculate slot layout of examples of a given size."""
+        if not self.packed:
+            return {"stride": example_size, "per_cyphertext": 1}
+        # power of two strides keep blocks aligned under rotation
+        stride = 1 << max(example_size - 1, 0).bit_length()
+        return {"stride": stride, "per_cyphertext": len(self.seed) // stride}
+
+    def _pack(self, data):
+        """Lay plaintext of our shape out as (cyphertexts, slots) to encode."""
+        view = np.reshape(data, (self.shape[0], self.example_size))
+        per = self.per_cyphertext
+        if per == 1 and self.stride == self.example_size and self.is_contiguous:
+            return view  # unpacked layout, one example per cyphertext
+        n_cyphertexts = -(-self.shape[0] // per)  # ceiling division
+        packed = np.zeros((n_cyphertexts * per, self.stride), dtype=view.dtype)
+        packed[: self.shape[0], self.slots] = view
+        return packed.reshape(n_cyphertexts, per * self.stride)
+
     # @shape.setter
     # def shape(self, shape):
     #     return self.origin["shape"]
@@ -182,12 +267,14 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
 
     def __array__(self, dtype=None):
         accumulator = []
-        for example in self.cyphertext:
-            accumulator.append(
-                # cutting off padding/ excess
-                example.plaintext[: self.origin["size"] // self.origin["shape"][0]]
-            )
-        data = np.array(accumulator)
+        block = self.per_cyphertext * self.stride
+        slots = self.slots
+        for cyphertext in self.cyphertext:
+            examples = cyphertext.plaintext[:block]
+            examples.shape = (self.per_cyphertext, self.stride)
+            # cutting off padding/ excess
+            accumulator.append(examples[:, slots])
+        data = np.concatenate(accumulator)[: self.shape[0]]
         data.shape = self.origin["shape"]
         return data.astype(dtype) if dtype is not None else data
 
@@ -198,31 +285,51 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
             raise ValueError("More inputs than expected 2 in ufunc")
         # if inputs are wrong way around flip and call again
         elif not isinstance(inputs[0], ReArray):
+            if ufunc is np.matmul:
+                return NotImplemented  # matmul does not commute
             return self.__array_ufunc__(ufunc, method, *inputs[::-1], **kwargs)
         # using ReArray objects remap class attribute to dispatch properly
+        # reductions need to know which axis to reduce
+        options = {"axis": kwargs.get("axis", 0)} if method == "reduce" else {}
         try:
             # assuming inputs[0] == self then look up function remap
             # return inputs[0].remap[method][ufunc](inputs[0], inputs[1])
-            return inputs[0].remap[method][ufunc](*inputs)
+            func = inputs[0].remap[method][ufunc]
         except KeyError:
-            pass
+            func = None
+        if func is not None:
+            return func(*inputs, **options)
         # everything else should bottom out as we do not implement
         # e.g floor_divide, true_divide, etc
         return NotImplemented
 
+    def __array_function__(self, func, types, args, kwargs):
+        """numpy non element wise functions, E.G np.dot."""
+        try:
+            func = self.remap["__array_function__"][func]
+        except KeyError:
+            # numpys own implementation, which in turn uses our methods
+            # and ufuncs e.g np.sum -> ReArray.sum
+            return func._implementation(*args, **kwargs)
+        return func(*args, **kwargs)
+
     def _broadcast(self, other):
         """Broadcast shape to our current shape."""
         return np.broadcast_to(other, self.shape)
         # return np.broadcast_to(other, (1,) + self.shape[1:])
 
     def _pre_process_other(self, other):
+        """Get other as a list of operands, one per cyphertext of ours."""
+        if isinstance(other, ReArray) and other.origin == self.origin:
+            # identical layouts can operate cyphertext to cyphertext
+            return other.cyphertext
         try:
             other = self._broadcast(other)
         except ValueError:
             raise ArithmeticError(
                 "shapes: {}, {} not broadcastable".format(self.shape, other.shape)
             )
-        return other
+        return self._pack(other)
 
     def implements(remap, np_func, method):
         """Python decorator to remap numpy functions to our own funcs."""
@@ -245,11 +352,14 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
         for i in range(len(self.cyphertext)):
             if isinstance(other[i], ReSeal):
                 t = self[i] * other[i]
-            else:
+            elif not np.any(other[i]):
                 # small nonzero systematic random uniform bias e
                 # prevents "RuntimeError: result ciphertext is transparent"
-                e = np.random.uniform(-1, 1, other[i].shape).flatten() * 1e-8
-                t = self[i] * (other[i].flatten() + e)
+                e = np.random.uniform(-1, 1, other[i].shape) * 1e-8
+                t = self[i] * (other[i] + e)
+            else:
+                # left exactly as is so its encoding can be cached
+                t = self[i] * other[i]
             accumulator.append(t)
         return ReArray(clone=self, cyphertext=accumulator)
 
@@ -262,7 +372,7 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
             if isinstance(other[i], ReSeal):
                 t = self[i] + other[i]
             else:
-                t = self[i] + other[i].flatten()
+                t = self[i] + other[i]
             accumulator.append(t)
         return ReArray(clone=self, cyphertext=accumulator)
         # for row_s, row_o in zip(self.cyphertext, other):
@@ -272,27 +382,187 @@ class ReArray(np.lib.mixins.NDArrayOperatorsMixin):
 
     @implements(remap, np.add, "reduce")
     def sum(self, axis=None, out=None):
-        """Reduce sum of cyphertext."""
-        if axis == 0:
-            # print("origin", np.array(self), self.shape, self.size)
-            cyphertext = functools.reduce(lambda x, y: x + y, self.cyphertext)
-            # print("summation", cyphertext,
-            # np.array(cyphertext.plaintext).shape)
-            # print("preview", np.array(cyphertext.plaintext))
-            result = ReArray(cyphertext=cyphertext, clone=self)
-            # create a copy of shape, and change it to be summed version
-            shape = list(self.shape)
-            shape[0] = 1
-            shape = tuple(shape)
-            # modify origin of this new object as it is different
-            result.origin = {"shape": shape, "size": self.size // len(self.cyphertext)}
-            # print("out shape", result.shape, result.size)
-            return result
-        else:
-            # we CANNOT fold a single cyphertext, can only sum between
-            # cyphertests which for us is axis 0 since we store cyphertexts
-            # as a list anything else is impossible
+        """Reduce sum of cyphertext.
+
+        Axis 0 (batch) sums between cyphertexts (and between the blocks of
+        packed cyphertexts), any other axis is folded inside each cyphertext
+        using rotations. Axis None sums over every axis.
+        """
+        if axis is None:
+            axis = tuple(range(len(self.shape)))
+        axes = axis if isinstance(axis, tuple) else (axis,)
+        axes = sorted({i % len(self.shape) for i in axes}, reverse=True)
+        # fold example axes first, since batch sums collapse the layout
+        result = self
+        for i in axes:
+            if i == 0:
+                result = result._sum_batch()
+            else:
+                result = result._sum_example_axis(i)
+        return result
+
+    def _sum_batch(self):
+        """Sum over the batch axis (0)."""
+        # print("origin", np.array(self), self.shape, self.size)
+        cyphertext = functools.reduce(lambda x, y: x + y, self.cyphertext)
+        # packed examples still sit in their own blocks of the cyphertext
+        # so fold the blocks onto each other, every block then holds the total
+        if self.per_cyphertext > 1:
+            cyphertext = cyphertext.fold(self.per_cyphertext, self.stride)
+        # print("summation", cyphertext,
+        # np.array(cyphertext.plaintext).shape)
+        # print("preview", np.array(cyphertext.plaintext))
+        result = ReArray(cyphertext=cyphertext, clone=self)
+        # create a copy of shape, and change it to be summed version
+        shape = list(self.shape)
+        shape[0] = 1
+        shape = tuple(shape)
+        # modify origin of this new object as it is different
+        result.origin = dict(
+            self.origin,
+            shape=shape,
+            size=self.example_size,
+            stride=self.stride,
+            per_cyphertext=1,
+        )
+        # print("out shape", result.shape, result.size)
+        return result
+
+    def _sum_example_axis(self, axis):
+        """Sum over an example axis inside each cyphertext by rotation."""
+        step = self.slot_strides[axis - 1]
+        cyphertext = [c.fold(self.shape[axis], step) for c in self.cyphertext]
+        result = ReArray(cyphertext=cyphertext, clone=self)
+        # sums are left in the slot of the first element of the summed axis
+        shape = self.shape[:axis] + self.shape[axis + 1 :]
+        strides = self.slot_strides[: axis - 1] + self.slot_strides[axis:]
+        result.origin = dict(
+            self.origin,
+            shape=shape,
+            size=int(np.prod(shape)),
+            stride=self.stride,
+            slot_strides=strides,
+        )
+        return result
+
+    @implements(remap, np.dot, "__array_function__")
+    def dot(self, other):
+        """Dot product of examples (batch, n) with plaintext weights."""
+        if not isinstance(self, ReArray):
             return NotImplemented
+        return self.matmul(other)
+
+    @implements(remap, np.matmul, "__call__")
+    def matmul(self, other):
+        """Matrix product of examples (batch, n) with plaintext (n, k) weights.
+
+        Uses the diagonal method of Halevi and Shoup, generalised to
+        rectangular weights. Each of the k (+k-1 wrapping) generalised
+        diagonals of the weights multiplies a rotation of the examples, then
+        the partial products are folded into the k outputs. Rotations are split
+        into baby steps, computed once per cyphertext and shared between every
+        giant step, so all k outputs cost roughly 3*sqrt(k) + log2(n/k)
+        rotations and one multiplicative level, rather than k full passes of
+        multiply and sum.
+        """
+        other = np.asarray(other)
+        if (
+            len(self.shape) != 2
+            or other.ndim not in (1, 2)
+            or other.shape[0] != self.shape[1]
+        ):
+            raise ArithmeticError(
+                "shapes: {}, {} not aligned for matmul".format(self.shape, other.shape)
+            )
+        if other.ndim == 1:
+            return self.multiply(other).sum(axis=1)
+        if not self.is_contiguous:
+            raise ArithmeticError(
+                "matmul requires contiguous examples, got slot strides {}".format(
+                    self.slot_strides
+                )
+            )
+        n, k = other.shape
+        # pad to powers of 2 so the k outputs tile the n inputs exactly
+        outputs = 1 << max(k - 1, 0).bit_length()
+        width = max(1 << max(n - 1, 0).bit_length(), outputs)
+        block = len(self.seed) // self.per_cyphertext
+        if width > block:
+            raise OverflowError(
+                "matmul {} -> {} needs {} slots per example, only have {}".format(
+                    n, k, width, block
+                )
+            )
+        weights = np.zeros((width, outputs))
+        weights[:n, :k] = other
+        plan = self._matmul_plan(weights, block)
+        if not plan:
+            # zero, E.G pruned, weights still give encrypted zero outputs
+            result = self.multiply(np.zeros(self.shape))
+        else:
+            result = self._matmul_diagonal(plan, width, outputs)
+        origin = {key: v for key, v in self.origin.items() if key != "slot_strides"}
+        # outputs may outgrow an unpacked examples stride
+        origin.update(
+            shape=(self.shape[0], k),
+            size=self.shape[0] * k,
+            stride=max(self.stride, k),
+        )
+        result.origin = origin
+        return result
+
+    def _matmul_diagonal(self, plan, width, outputs):
+        """Sum the products of each diagonal of plan with rotated examples."""
+        babies = sorted({b for _, terms in plan for b, _ in terms})
+        giants = [giant for giant, _ in plan]
+        count = width // outputs  # partial products per output
+        # generate every galois key needed at once
+        self.cyphertext[0].require_rotations(
+            babies + giants + ReSeal.fold_steps(count, outputs)
+        )
+        accumulator = []
+        for cyphertext in self.cyphertext:
+            rotated = {b: cyphertext.rotate(b) if b else cyphertext for b in babies}
+            total = None
+            for giant, terms in plan:
+                inner = functools.reduce(
+                    lambda x, y: x + y, [rotated[b] * d for b, d in terms]
+                )
+                inner = inner.rotate(giant) if giant else inner
+                total = inner if total is None else total + inner
+            accumulator.append(total.fold(count, outputs))
+        return ReArray(clone=self, cyphertext=accumulator)
+
+    def _matmul_plan(self, weights, block):
+        """Get baby step giant step plan of diagonals for matmul.
+
+        Slot s of a block holds input s, diagonal j pairs it with the weight
+        of input s+j (wrapping from j-width) to output s % outputs.
+        Diagonals are pre-rotated by their giant step, so
+        rot(sum_b(diag * rot(x, b)), giant) == sum_j(diag_j * rot(x, j)).
+
+        :return: list of (giant step, [(baby step, plaintext diagonal)])
+        :rtype: list
+        """
+        width, outputs = weights.shape
+        baby = 1 << ((outputs.bit_length()) // 2)  # ~sqrt(outputs)
+        slots = np.arange(len(self.seed))
+        inputs = slots % block
+        in_block = (slots // block < self.per_cyphertext) & (inputs < width)
+        plan = []
+        for wrap in (0, -width):
+            for giant in range(wrap, wrap + outputs, baby):
+                terms = []
+                for b in range(min(baby, outputs)):
+                    column = inputs + giant + b
+                    mask = in_block & (column >= 0) & (column < width)
+                    diagonal = np.zeros(len(slots))
+                    diagonal[mask] = weights[column[mask], inputs[mask] % outputs]
+                    if np.any(diagonal):
+                        terms.append((b, np.roll(diagonal, giant)))
+                if terms:
+                    plan.append((giant, terms))
+        return plan
 
     @implements(remap, np.equal, "__call__")
     def equal(self, other):
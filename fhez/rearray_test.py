@@ -306,6 +306,110 @@ class ReArray_tests(unittest.TestCase):
         truth = np.sum(data, axis=0)
         np.testing.assert_array_almost_equal(plain_sum, truth, decimal=1, verbose=True)
 
+    # packed layout
+
+    @property
+    def small_data(self):
+        array = np.arange(300 * 30) / 100
+        array.shape = (300, 30)
+        return array
+
+    def test_packed_layout(self):
+        """Many small examples should share few cyphertexts."""
+        re = ReArray(plaintext=self.small_data, packed=True, **self.reseal_args)
+        self.assertEqual(re.shape, self.small_data.shape)
+        self.assertEqual(re.stride, 32)
+        self.assertEqual(re.per_cyphertext, 4096 // 32)
+        self.assertEqual(len(re.cyphertext), 3)
+
+    def test_packed_decrypt(self):
+        re = ReArray(plaintext=self.small_data, packed=True, **self.reseal_args)
+        np.testing.assert_array_almost_equal(
+            np.array(re), self.small_data, decimal=1, verbose=True
+        )
+
+    def test_packed_multiply_add(self):
+        re = ReArray(plaintext=self.small_data, packed=True, **self.reseal_args)
+        other = np.arange(30) / 10
+        out = np.add(np.multiply(re, other), 2)
+        self.assertIsInstance(out, ReArray)
+        np.testing.assert_array_almost_equal(
+            np.array(out), self.small_data * other + 2, decimal=1, verbose=True
+        )
+
+    def test_packed_multiply_re(self):
+        re = ReArray(plaintext=self.small_data, packed=True, **self.reseal_args)
+        out = np.multiply(re, re)
+        np.testing.assert_array_almost_equal(
+            np.array(out), self.small_data * self.small_data, decimal=1, verbose=True
+        )
+
+    def test_packed_sum(self):
+        re = ReArray(plaintext=self.small_data, packed=True, **self.reseal_args)
+        sum = np.sum(re, axis=0)
+        self.assertIsInstance(sum, ReArray)
+        truth = np.sum(self.small_data, axis=0, keepdims=True)
+        np.testing.assert_array_almost_equal(
+            np.array(sum), truth, decimal=1, verbose=True
+        )
+
+    def test_sum_example_axis(self):
+        """Sum inside each cyphertext without decrypting."""
+        data = np.arange(2 * 3 * 5, dtype=float).reshape(2, 3, 5) / 10
+        re = ReArray(plaintext=data, **self.reseal_args)
+        for axis in [1, 2, -1]:
+            sum = np.sum(re, axis=axis)
+            self.assertIsInstance(sum, ReArray)
+            np.testing.assert_array_almost_equal(
+                np.array(sum), np.sum(data, axis=axis), decimal=1, verbose=True
+            )
+
+    def test_sum_all(self):
+        data = np.arange(2 * 3 * 5, dtype=float).reshape(2, 3, 5) / 10
+        re = ReArray(plaintext=data, packed=True, **self.reseal_args)
+        sum = np.sum(re, axis=None)
+        np.testing.assert_array_almost_equal(
+            np.array(sum).flatten(), [np.sum(data)], decimal=1, verbose=True
+        )
+
+    def test_dot_encrypted(self):
+        """Dot product of each example with plaintext weights."""
+        weights = np.arange(30) / 30
+        re = ReArray(plaintext=self.small_data, packed=True, **self.reseal_args)
+        dot = np.sum(np.multiply(re, weights), axis=1)
+        np.testing.assert_array_almost_equal(
+            np.array(dot), self.small_data @ weights, decimal=1, verbose=True
+        )
+
+    def test_matmul(self):
+        """Matrix product of encrypted examples with plaintext weights."""
+        weights = np.random.rand(30, 10)
+        for packed in [False, True]:
+            re = ReArray(plaintext=self.small_data, packed=packed, **self.reseal_args)
+            out = np.matmul(re, weights)
+            self.assertIsInstance(out, ReArray)
+            self.assertEqual(out.shape, (300, 10))
+            np.testing.assert_array_almost_equal(
+                np.array(out), self.small_data @ weights, decimal=1, verbose=True
+            )
+        np.testing.assert_array_almost_equal(
+            np.array(np.dot(re, weights)),
+            self.small_data @ weights,
+            decimal=1,
+            verbose=True,
+        )
+
+    def test_matmul_zero(self):
+        """Matrix product with all zero weights is encrypted zeros."""
+        for packed in [False, True]:
+            re = ReArray(plaintext=self.small_data, packed=packed, **self.reseal_args)
+            out = np.matmul(re, np.zeros((30, 10)))
+            self.assertIsInstance(out, ReArray)
+            self.assertEqual(out.shape, (300, 10))
+            np.testing.assert_array_almost_equal(
+                np.array(out), np.zeros((300, 10)), decimal=1, verbose=True
+            )
+
     def test_equality(self):
         """Check that ReArray param equality is being calculated properly."""
         a_arg = self.reseal_args = {
@@ -4,6 +4,9 @@
 # @Last modified time: 2021-02-11T11:32:09+00:00
 # @License: please see LICENSE file in project root
 
+import collections
+import threading
+
 
 class ReCache:
     """Core caching object for ReSeal.
@@ -15,14 +18,60 @@ class ReCache:
     at the point of need. Thus this class caches the generated intermediaries
     so they can be re-used rather than commiting compute power every time they
     are called. E.G seal.Encryptor and seal.Decryptor are examples of cached
-    objects."""
-
-    def __init__(self, enable=None):
+    objects.
+
+    Enabled caches are shared process wide, one per ReSeal fingerprint
+    (scheme, poly_modulus_degree, coefficient_modulus, and key identity), so
+    every ReSeal object derived from the same parameters and keys, such as the
+    results of arithmetic, reuse one context and its worker objects. The
+    registry keeps the most recently used registry_size caches.
+
+    Encoded plaintexts, E.G network weights, are also kept so they are not
+    re-encoded every time they are used. These are evicted least recently
+    used first once they exceed plaintext_memory bytes, plaintext_hits and
+    plaintext_misses count how effective this is."""
+
+    # process wide registry class attribute NOT instance attribute!!!
+    _registry = collections.OrderedDict()
+    _registry_lock = threading.Lock()
+    registry_size = 64
+    # default memory cap of encoded plaintexts per cache in bytes
+    plaintext_memory = 256 * 2 ** 20
+
+    def __init__(self, enable=None, plaintext_memory=None):
         """Object caching.
 
         If enabled will cache all ReSeal objects not already stored,
         to avoid having to regenrate them."""
         self.enabled = enable if enable is not None else True
+        if plaintext_memory is not None:
+            self.plaintext_memory = plaintext_memory
+        self._plaintexts = collections.OrderedDict()
+        self._plaintexts_lock = threading.Lock()
+        self.plaintext_bytes = 0
+        self.plaintext_hits = 0
+        self.plaintext_misses = 0
+
+    @classmethod
+    def shared(cls, fingerprint):
+        """Get the process wide cache for this fingerprint, creating if new."""
+        with cls._registry_lock:
+            cache = cls._registry.get(fingerprint)
+            if cache is None:
+                cache = cls()
+                cls._registry[fingerprint] = cache
+                # evict least recently used caches beyond our size limit
+                while len(cls._registry) > cls.registry_size:
+                    cls._registry.popitem(last=False)
+            else:
+                cls._registry.move_to_end(fingerprint)
+            return cache
+
+    @classmethod
+    def clear_registry(cls):
+        """Drop all process wide shared caches."""
+        with cls._registry_lock:
+            cls._registry.clear()
 
     @property
     def context(self):
@@ -44,6 +93,26 @@ class ReCache:
     def keygen(self, keygen):
         self._keygen = keygen
 
+    @property
+    def galois_keys(self):
+        if self.__dict__.get("_galois_keys") and self.enabled:
+            return self._galois_keys
+        return None
+
+    @galois_keys.setter
+    def galois_keys(self, galois_keys):
+        self._galois_keys = galois_keys
+
+    @property
+    def galois_steps(self):
+        if self.__dict__.get("_galois_steps") and self.enabled:
+            return self._galois_steps
+        return None
+
+    @galois_steps.setter
+    def galois_steps(self, galois_steps):
+        self._galois_steps = galois_steps
+
     @property
     def encoder(self):
         if self.__dict__.get("_encoder") and self.enabled:
@@ -83,3 +152,44 @@ class ReCache:
     @decryptor.setter
     def decryptor(self, decryptor):
         self._decryptor = decryptor
+
+    def get_plaintext(self, key):
+        """Get encoded plaintext by its key, or None if it is not cached.
+
+        :arg key: hashable identity of the plaintext, E.G its content hash,
+            scale, and level
+        """
+        with self._plaintexts_lock:
+            entry = self._plaintexts.get(key)
+            if entry is None or not self.enabled:
+                self.plaintext_misses += 1
+                return None
+            self._plaintexts.move_to_end(key)
+            self.plaintext_hits += 1
+            return entry[0]
+
+    def set_plaintext(self, key, plaintext, size):
+        """Cache encoded plaintext, evicting least recently used beyond cap.
+
+        :arg size: approximate memory used by plaintext in bytes
+        :type size: int
+        """
+        if not self.enabled or size > self.plaintext_memory:
+            return
+        with self._plaintexts_lock:
+            old = self._plaintexts.pop(key, None)
+            if old is not None:
+                self.plaintext_bytes -= old[1]
+            self._plaintexts[key] = (plaintext, size)
+            self.plaintext_bytes += size
+            while self.plaintext_bytes > self.plaintext_memory:
+                _, (_, evicted) = self._plaintexts.popitem(last=False)
+                self.plaintext_bytes -= evicted
+
+    def clear_plaintexts(self):
+        """Drop all cached plaintexts and reset hit/ miss counters."""
+        with self._plaintexts_lock:
+            self._plaintexts.clear()
+            self.plaintext_bytes = 0
+            self.plaintext_hits = 0
+            self.plaintext_misses = 0
@@ -20,6 +20,11 @@ class ReScheme(marshmallow.Schema):
     _poly_modulus_degree = marshmallow.fields.Integer()
     _coefficient_modulus = marshmallow.fields.List(marshmallow.fields.Integer())
     _scale = marshmallow.fields.Float()
+    _compression = marshmallow.fields.Str()
+    _encoding = marshmallow.fields.Str()
+    _key_id = marshmallow.fields.Str()
+    _galois_steps = marshmallow.fields.List(marshmallow.fields.Integer())
+    _lazy = marshmallow.fields.Boolean()
     _parameters = marshmallow.fields.Dict(
         keys=marshmallow.fields.Str(), values=marshmallow.fields.Str()
     )
@@ -32,6 +37,42 @@ class ReScheme(marshmallow.Schema):
     _relin_keys = marshmallow.fields.Dict(
         keys=marshmallow.fields.Str(), values=marshmallow.fields.Str()
     )
+    _switch_keys = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(), values=marshmallow.fields.Str()
+    )
+    _galois_keys = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(), values=marshmallow.fields.Str()
+    )
     _ciphertext = marshmallow.fields.Dict(
         keys=marshmallow.fields.Str(), values=marshmallow.fields.Str()
     )
+
+
+class ReBytesScheme(ReScheme):
+    """Marshmallow serialisation schema of ReSeal with "bytes" encoding.
+
+    As ReScheme but SEAL objects are raw bytes, which unlike hexadecimal
+    strings cannot be dumped to json.
+    """
+
+    _parameters = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(), values=marshmallow.fields.Raw()
+    )
+    _public_key = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(), values=marshmallow.fields.Raw()
+    )
+    _private_key = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(), values=marshmallow.fields.Raw()
+    )
+    _relin_keys = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(), values=marshmallow.fields.Raw()
+    )
+    _switch_keys = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(), values=marshmallow.fields.Raw()
+    )
+    _galois_keys = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(), values=marshmallow.fields.Raw()
+    )
+    _ciphertext = marshmallow.fields.Dict(
+        keys=marshmallow.fields.Str(), values=marshmallow.fields.Raw()
+    )
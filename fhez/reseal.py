@@ -6,11 +6,15 @@
 # @Last modified time: 2021-07-24T15:51:36+01:00
 # @License: please see LICENSE file in project root
 
+import collections
+import contextlib
+import hashlib
 import logging as logger
 import os
 import sys
 import tempfile
 import unittest
+import uuid
 
 import numpy as np
 import seal
@@ -20,42 +24,105 @@ from fhez.recache import ReCache
 from fhez.rescheme import ReScheme
 
 # pyseal does not at this point support pickling, so what you see here is a
-# workaround using seals save and load function to tempfiles so that we can
-# read in those files and uses that as a serialised variant instead.
-# We cannot use bytesio as seal only accepts file names not the file object
-# otherwise this would have been an easy fix to make.
-
-
-def _getstate_normal(self):
-    """Create and return serialised object state."""
-    tf = tempfile.NamedTemporaryFile(prefix="fhe_tmp_get_", delete=False)
-    self.save(tf.name)
-    with open(tf.name, "rb") as file:
-        f = file.read()
-    os.remove(tf.name)
-    # please note this is an incredibly important step!
-    # SEAL uses hexidecimal encoding on its saved files so we decode the bytes
-    # back into hexidecimal when we read form their files, being both smaller,
-    # and more easily serialised with things like marshmallow and json
-    # please do also see _setstate_normal for the encoding stage,
-    # and also ReScheme class included in this repository or in this file
-    f = f.hex()
-    # print(f[:32]) # print the first 32 characters of hexadecimal string
-    return {"file_contents": f}
+# workaround using seals save and load functions to serialise the objects.
+# Objects are saved straight to bytes in memory where the bindings allow it
+# (to_string), otherwise via a file path. SEAL only accepts file names not file
+# objects so we cannot use bytesio, instead on linux we hand SEAL a path to an
+# anonymous in-memory file (memfd) so nothing ever touches the filesystem, and
+# only fall back to real tempfiles where memfd is unavailable.
+
+
+@contextlib.contextmanager
+def _scratch_path(prefix):
+    """Yield a path SEAL can save to/ load from, in memory where possible."""
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create(prefix)
+        try:
+            yield "/proc/self/fd/{}".format(fd)
+        finally:
+            os.close(fd)
+    else:
+        tf = tempfile.NamedTemporaryFile(prefix=prefix, delete=False)
+        tf.close()
+        try:
+            yield tf.name
+        finally:
+            os.remove(tf.name)
+
+
+def _compr_mode(compression=None):
+    """Get seal.compr_mode_type from its name, or None for SEALs default.
+
+    :arg compression: name of compression mode, E.G "none", "zlib", "zstd"
+    :type compression: str
+    """
+    if compression is None:
+        return None
+    try:
+        return getattr(seal.compr_mode_type, compression)
+    except AttributeError:
+        raise ValueError(
+            "SEAL was not built with `{}` compression support".format(compression)
+        )
+
+
+def _save_bytes(obj, compr_mode=None):
+    """Serialise any SEAL object with a save method into raw bytes."""
+    args = (compr_mode,) if compr_mode is not None else ()
+    if hasattr(obj, "to_string"):
+        # in-memory serialisation straight from the bindings
+        return bytes(obj.to_string(*args))
+    with _scratch_path("fhe_tmp_get_") as path:
+        obj.save(path, *args)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def _load_bytes(obj, contents, context=None):
+    """Deserialise raw bytes into any SEAL object with a load method.
+
+    SEAL records the compression used in the serialised header so no
+    compression mode is needed to load.
+    """
+    with _scratch_path("fhe_tmp_set_") as path:
+        with open(path, "wb") as f:
+            f.write(contents)
+        if context is not None:
+            obj.load(context, path)
+        else:
+            obj.load(path)
+
+
+def _getstate_normal(self, compr_mode=None, encoding=None):
+    """Create and return serialised object state.
+
+    :arg compr_mode: SEAL compression mode to save with (default SEALs own)
+    :type compr_mode: seal.compr_mode_type
+    :arg encoding: "hex" (default) for the json friendly hexadecimal string,
+        or "bytes" for raw binary which is half the size.
+    :type encoding: str
+    """
+    contents = _save_bytes(self, compr_mode=compr_mode)
+    if encoding == "bytes":
+        # opt in binary format, please do also see _setstate_normal for
+        # decoding, and also ReBytesScheme class included in this repository
+        return {"file_bytes": contents}
+    # SEAL objects are hexadecimal encoded by default, being easily
+    # serialised with things like marshmallow and json, see ReScheme
+    return {"file_contents": contents.hex()}
 
 
 def _setstate_normal(self, d):
-    """Regenerate object state from serialised object."""
-    tf = tempfile.NamedTemporaryFile(prefix="fhe_tmp_set_", delete=False)
-    contents = bytes.fromhex(d["file_contents"])
-    with open(tf.name, "wb") as f:
-        # back to bytes to write to file
-        f.write(contents)
-    if d.get("context"):
-        self.load(d["context"], tf.name)
+    """Regenerate object state from serialised object.
+
+    Both the binary "file_bytes" and legacy hexadecimal "file_contents"
+    formats are understood.
+    """
+    if d.get("file_bytes") is not None:
+        contents = bytes(d["file_bytes"])
     else:
-        self.load(tf.name)
-    os.remove(tf.name)
+        contents = bytes.fromhex(d["file_contents"])
+    _load_bytes(self, contents, context=d.get("context"))
 
 
 # rebind setstate and getstate to workable versions
@@ -81,6 +148,11 @@ seal.RelinKeys.__setstate__ = _setstate_normal
 seal.GaloisKeys.__getstate__ = _getstate_normal
 seal.GaloisKeys.__setstate__ = _setstate_normal
 
+# deferred arithmetic of lazy ReSeal objects, op is "add" (any number of
+# operands) or "mul" (two operands), operands are seal.Ciphertexts, plaintext
+# data, or further expressions
+_Expression = collections.namedtuple("_Expression", ["op", "operands"])
+
 
 class ReSeal(object):
     """Re-binder/ handler for serialisation of MS-Seal objects.
@@ -146,6 +218,17 @@ class ReSeal(object):
     :type relin_keys: seal.RelinKeys
     :param galois_keys:
     :type galois_keys: seal.GaloisKeys
+    :param compression: SEAL compression to serialise with ("none", "zlib",
+        "zstd"), defaults to SEALs own default.
+    :type compression: str
+    :param encoding: serialised form of SEAL objects, the json friendly
+        "hex" (default), or "bytes" which is half the size but needs
+        :class:`fhez.rescheme.ReBytesScheme` to validate.
+    :type encoding: str
+    :param lazy: record arithmetic and only compute it once the ciphertext
+        or plaintext is needed, so sums of products relinearise and rescale
+        once rather than once per product.
+    :type lazy: bool
     :example: ReSeal(scheme=seal.scheme_type.ckks)
     """
 
@@ -163,6 +246,9 @@ class ReSeal(object):
         relin_keys: seal.RelinKeys = None,
         galois_keys: seal.GaloisKeys = None,
         cache: bool = None,
+        compression: str = None,
+        encoding: str = None,
+        lazy: bool = None,
     ):
         if scheme:
             if scheme == 1:
@@ -190,26 +276,55 @@ class ReSeal(object):
             self._relin_keys = relin_keys
         if galois_keys:
             self._galois_keys = galois_keys
-
-        cache = cache if cache is not None else True
-        self._cache = ReCache(enable=cache)
+        if compression:
+            self._compression = compression
+        if encoding:
+            self._encoding = encoding
+        if lazy:
+            self._lazy = lazy
+
+        # enabled caches are shared process wide and looked up lazily by
+        # fingerprint, only disabled caches are private to this object
+        if cache is False:
+            self._cache = ReCache(enable=False)
 
     def __getstate__(self):
         """Create single unified state to allow serialisation."""
         state = {}
+        # pending arithmetic cannot be serialised, compute it now
+        self._materialise()
+        compr_mode = _compr_mode(self.__dict__.get("_compression"))
+        encoding = self.__dict__.get("_encoding")
         for key in self.__dict__:
             if key in ["_cache"]:
                 pass
-            elif key in ["_poly_modulus_degree", "_coefficient_modulus", "_scale"]:
+            elif key in [
+                "_poly_modulus_degree",
+                "_coefficient_modulus",
+                "_scale",
+                "_compression",
+                "_encoding",
+                "_key_id",
+                "_galois_steps",
+                "_lazy",
+            ]:
                 state[key] = self.__dict__[key]
-            else:
+            elif key in ["_scheme"]:
                 state[key] = self.__dict__[key].__getstate__()
+            else:
+                state[key] = _getstate_normal(
+                    self.__dict__[key], compr_mode=compr_mode, encoding=encoding
+                )
         return state
 
     def __setstate__(self, state):
         """Rebuild all constituent objects from serialised state."""
         # ensuring scheme type is decoded first and must always exist
         self._scheme = seal.scheme_type(state["_scheme"])
+        # key identity must be restored before the context is first used so
+        # we rejoin the shared cache of the keys we were serialised with
+        if state.get("_key_id"):
+            self._key_id = state["_key_id"]
         # the order of the dictionary is very important, we will ensure it is
         # as expected or else we may end up trying to initialise the ciphertext
         # before the context which will fail.
@@ -219,6 +334,12 @@ class ReSeal(object):
             self._poly_modulus_degree = state["_poly_modulus_degree"]
         if state.get("_scale"):
             self._scale = state["_scale"]
+        if state.get("_compression"):
+            self._compression = state["_compression"]
+        if state.get("_encoding"):
+            self._encoding = state["_encoding"]
+        if state.get("_lazy"):
+            self._lazy = state["_lazy"]
         if state.get("_parameters"):
             parameters = seal.EncryptionParameters(self._scheme)
             parameters.__setstate__(state["_parameters"])
@@ -248,6 +369,8 @@ class ReSeal(object):
             state["_relin_keys"].update({"context": self.context})
             relin_keys.__setstate__(state["_relin_keys"])
             self._relin_keys = relin_keys
+        if state.get("_galois_steps"):
+            self._galois_steps = state["_galois_steps"]
         if state.get("_galois_keys"):
             galois_keys = seal.GaloisKeys()
             state["_galois_keys"].update({"context": self.context})
@@ -261,10 +384,14 @@ class ReSeal(object):
         return "{}({})".format(self.__class__.__name__, self.__dict__)
 
     def duplicate(self):
-        """Use state dict to instanciate a new ReSeal without ciphertext."""
+        """Use state dict to instanciate a new ReSeal without ciphertext.
+
+        The (shared) cache is kept so the duplicate does not have to rebuild
+        its context, encoder, evaluator etc.
+        """
         # extract desired keys from out internal dictionary
         d = self.__dict__
-        d = {k: d[k] for k, v in d.items() if k not in ("_ciphertext", "_cache")}
+        d = {k: d[k] for k, v in d.items() if k not in ("_ciphertext", "_expression")}
         # now override new reseal object dict with the keys it should share
         new_reseal = ReSeal()
         for key in d:
@@ -279,61 +406,240 @@ class ReSeal(object):
     # arithmetic operations
 
     def __add__(self, other):
-        if isinstance(other, (ReSeal, seal.Ciphertext)):
+        if self.lazy:
+            return self._defer("add", other)
+        if isinstance(other, ReSeal):
+            other = other.ciphertext
+        # now we take this encrypted result and return it as a new reseal obj
+        # so that it can be used as input to __add__ and __mult__ again
+        new_reseal_object = self.duplicate()
+        new_reseal_object.ciphertext = self._add(self.ciphertext, other)
+        return new_reseal_object
+
+    def __mul__(self, other):
+        if self.lazy:
+            return self._defer("mul", other)
+        if isinstance(other, ReSeal):
+            other = other.ciphertext
+        # now we take this encrypted result and return it as a new reseal obj
+        # so that it can be used as input to __add__ and __mult__ again
+        new_reseal_object = self.duplicate()
+        new_reseal_object.ciphertext = self._multiply(self.ciphertext, other)
+        return new_reseal_object
+
+    def _add(self, ciphertext, other):
+        """Add ciphertext or numeric plaintext to a seal.Ciphertext."""
+        if isinstance(other, seal.Ciphertext):
             # if adding ciphertext + ciphertext
             encrypted_result = seal.Ciphertext()
-            if isinstance(other, ReSeal):
-                other = other.ciphertext
-            ciphertext, other = self._homogenise_parameters(self.ciphertext, other)
+            ciphertext, other = self._homogenise_parameters(ciphertext, other)
             self.evaluator.add(ciphertext, other, encrypted_result)
             # addition of two ciphertexts does not require relinearization
             # or rescaling (by modulus swapping).
         else:
             # if adding ciphertext + numeric plaintext
-            plaintext = self._to_plaintext(other)
+            # encoded straight at the ciphertexts level of the modulus chain
+            plaintext = self._to_plaintext(other, parms_id=ciphertext.parms_id())
             encrypted_result = seal.Ciphertext()
             # switching modulus chain of plaintex to ciphertexts level
             # so computation is possible
             ciphertext, plaintext = self._homogenise_parameters(
-                a=self.ciphertext, b=plaintext
+                a=ciphertext, b=plaintext
             )
             encrypted_result = self.evaluator.add_plain(ciphertext, plaintext)
             # no need to drop modulus chain addition is fairly small
-        # now we take this encrypted result and return it as a new reseal obj
-        # so that it can be used as input to __add__ and __mult__ again
-        new_reseal_object = self.duplicate()
-        new_reseal_object.ciphertext = encrypted_result
-        return new_reseal_object
+        return encrypted_result
 
-    def __mul__(self, other):
-        if isinstance(other, (ReSeal, seal.Ciphertext)):
+    def _multiply(self, ciphertext, other, finish=True):
+        """Multiply a seal.Ciphertext by ciphertext or numeric plaintext.
+
+        :arg finish: relinearise and rescale the product, if False the raw
+            product is left for the caller to sum with others first.
+        :type finish: bool
+        """
+        if isinstance(other, seal.Ciphertext):
             # if multiplying ciphertext * ciphertext
             encrypted_result = seal.Ciphertext()
-            if isinstance(other, ReSeal):
-                other = other.ciphertext
-            ciphertext, other = self._homogenise_parameters(self.ciphertext, other)
+            ciphertext, other = self._homogenise_parameters(ciphertext, other)
             self.evaluator.multiply(ciphertext, other, encrypted_result)
-            self.evaluator.relinearize_inplace(encrypted_result, self.relin_keys)
-            self.evaluator.rescale_to_next_inplace(encrypted_result)
+            if finish:
+                self.evaluator.relinearize_inplace(encrypted_result, self.relin_keys)
         else:
             # if multiplying ciphertext * numeric
-            plaintext = self._to_plaintext(other)
+            plaintext = self._to_plaintext(other, parms_id=ciphertext.parms_id())
             encrypted_result = seal.Ciphertext()
             # switching modulus chain of plaintex to ciphertexts level
             # so computation is possible
             ciphertext, plaintext = self._homogenise_parameters(
-                a=self.ciphertext, b=plaintext
+                a=ciphertext, b=plaintext
             )
             # the computation
             encrypted_result = self.evaluator.multiply_plain(ciphertext, plaintext)
+        if finish:
             # dropping one level of modulus chain to stabalise ciphertext
             self.evaluator.rescale_to_next_inplace(encrypted_result)
-        # now we take this encrypted result and return it as a new reseal obj
-        # so that it can be used as input to __add__ and __mult__ again
+        return encrypted_result
+
+    # lazy arithmetic
+
+    @property
+    def lazy(self):
+        """Get if arithmetic is deferred until the ciphertext is needed."""
+        return bool(self.__dict__.get("_lazy"))
+
+    @lazy.setter
+    def lazy(self, lazy: bool):
+        self._lazy = lazy
+
+    @property
+    def _operand(self):
+        """Get our pending expression, or our ciphertext if there is none."""
+        expression = self.__dict__.get("_expression")
+        return expression if expression is not None else self.ciphertext
+
+    def _defer(self, op, other):
+        """Record arithmetic in a new ReSeal object instead of computing it."""
+        if isinstance(other, ReSeal):
+            other = other._operand
+        operands = (self._operand, other)
+        if op == "add":
+            # flatten chains of additions so their products fuse together
+            flat = ()
+            for operand in operands:
+                if isinstance(operand, _Expression) and operand.op == "add":
+                    flat += operand.operands
+                else:
+                    flat += (operand,)
+            operands = flat
+        new_reseal_object = self.duplicate()
+        new_reseal_object._expression = _Expression(op, operands)
+        return new_reseal_object
+
+    def _materialise(self):
+        """Compute any pending expression into our ciphertext."""
+        expression = self.__dict__.pop("_expression", None)
+        if expression is not None:
+            self._ciphertext = self._evaluate(expression, {})
+
+    def _evaluate(self, expression, memo):
+        """Compute an expression, fusing its sum of products.
+
+        Every product in a sum is computed raw, the products are summed, then
+        relinearised and rescaled once. Ciphertext and plaintext terms are
+        added afterwards. Products of products are computed inside out.
+
+        :arg memo: results by expression id, so shared expressions, E.G x in
+            x * x, are only computed once
+        :type memo: dict
+        :return: relinearised and rescaled ciphertext, or plaintext data
+        """
+        if not isinstance(expression, _Expression):
+            return expression  # ciphertext or plaintext data
+        if id(expression) in memo:
+            return memo[id(expression)]
+        terms = expression.operands if expression.op == "add" else (expression,)
+        products, others = [], []
+        relinearise = False
+        for term in terms:
+            if isinstance(term, _Expression) and term.op == "mul":
+                a, b = (self._evaluate(i, memo) for i in term.operands)
+                if not isinstance(a, seal.Ciphertext):
+                    a, b = b, a
+                relinearise |= isinstance(b, seal.Ciphertext)
+                products.append(self._multiply(a, b, finish=False))
+            else:
+                others.append(self._evaluate(term, memo))
+        result = None
+        if products:
+            # sum products on the lowest level of the modulus chain
+            lowest = min(
+                products,
+                key=lambda p: self.context.get_context_data(p.parms_id()).chain_index(),
+            ).parms_id()
+            for product in products:
+                product = self.evaluator.mod_switch_to(product, lowest)
+                if result is None:
+                    result = product
+                else:
+                    product.scale(result.scale())
+                    self.evaluator.add_inplace(result, product)
+            if relinearise:
+                self.evaluator.relinearize_inplace(result, self.relin_keys)
+            self.evaluator.rescale_to_next_inplace(result)
+        # cyphertexts first, so there is always a ciphertext to add plaintext to
+        others.sort(key=lambda o: not isinstance(o, seal.Ciphertext))
+        for other in others:
+            result = other if result is None else self._add(result, other)
+        memo[id(expression)] = result
+        return result
+
+    def rotate(self, steps: int):
+        """Cyclically rotate encrypted slots left by steps (right if negative).
+
+        Galois keys for this number of steps are generated if not already
+        avaliable.
+
+        :arg steps: number of slots to rotate by
+        :type steps: int
+        :return: new ReSeal object of rotated cyphertext
+        :rtype: ReSeal
+        """
+        self.require_rotations([steps])
+        encrypted_result = self.evaluator.rotate_vector(
+            self.ciphertext, steps, self.galois_keys
+        )
         new_reseal_object = self.duplicate()
         new_reseal_object.ciphertext = encrypted_result
         return new_reseal_object
 
+    @staticmethod
+    def fold_steps(count: int, step: int = 1):
+        """Get the rotation steps fold(count, step) will use."""
+        steps = set()
+        span, offset = 1, 0
+        while count:
+            if count & 1:
+                if offset:
+                    steps.add(offset * step)
+                offset += span
+            count >>= 1
+            if count:
+                steps.add(span * step)
+                span *= 2
+        return sorted(steps)
+
+    def fold(self, count: int, step: int = 1):
+        """Sum count slots, step apart, using log depth rotate and add.
+
+        Every slot i of the result holds the sum of slots
+        i, i+step, ..., i+(count-1)*step (cyclically). Partial sums of
+        power of two spans are built by doubling, then combined according
+        to the binary representation of count, so any count is exact in
+        under 2*log2(count) rotations.
+
+        :arg count: number of slots to sum together
+        :type count: int
+        :arg step: distance between each slot to be summed
+        :type step: int
+        :return: new ReSeal object of summed cyphertext
+        :rtype: ReSeal
+        """
+        # generate all keys at once rather than one rotation at a time
+        self.require_rotations(self.fold_steps(count, step))
+        result = None
+        power = self  # partial sum of span slots
+        span, offset = 1, 0
+        while count:
+            if count & 1:
+                term = power.rotate(offset * step) if offset else power
+                result = term if result is None else result + term
+                offset += span
+            count >>= 1
+            if count:
+                power = power + power.rotate(span * step)
+                span *= 2
+        return result
+
     def __truediv__(self, other):
         """You cannot divide something fully homomorphically encrypted"""
         raise ArithmeticError().with_traceback(sys.exc_info()[2])
@@ -362,7 +668,11 @@ class ReSeal(object):
     def new(self):
         r = ReSeal()
         # r.__dict__ == self.__dict__
-        d = {k: v for (k, v) in self.__dict__.items() if "_ciphertext" not in k}
+        d = {
+            k: v
+            for (k, v) in self.__dict__.items()
+            if k not in ("_ciphertext", "_expression")
+        }
         r.__dict__ = d
         return r
 
@@ -401,7 +711,10 @@ class ReSeal(object):
             # doing both so they are both copied exactly as each other
             # rather than one being a reference, and the other being a new obj
             ciphertext = self.evaluator.mod_switch_to(a, a.parms_id())
-            plaintext = self.evaluator.mod_switch_to(b, a.parms_id())
+            if b.parms_id() == a.parms_id():
+                plaintext = b  # already on the same level, E.G cached
+            else:
+                plaintext = self.evaluator.mod_switch_to(b, a.parms_id())
             ciphertext.scale()
             ciphertext.scale(self.scale)
             plaintext.scale()
@@ -415,7 +728,48 @@ class ReSeal(object):
             # encryption based objects to work with.
             raise TypeError("Neither parameters are ciphertext or plaintext.")
 
-    def _to_plaintext(self, data):
+    def _to_plaintext(self, data, parms_id=None):
+        """Encode data as plaintext operand, on parms_id's level. (cached)
+
+        Operands such as weights tend to be the same every time, so encoded
+        (and modulus switched) plaintexts are cached by content, scale, and
+        level in the shared cache.
+        """
+        if isinstance(data, seal.Plaintext):
+            return data
+        key = self._plaintext_key(data, parms_id)
+        plaintext = self.cache.get_plaintext(key)
+        if plaintext is not None:
+            return plaintext
+        plaintext = self._encode(data)
+        level = key[-1]
+        if parms_id is not None:
+            plaintext = self.evaluator.mod_switch_to(plaintext, parms_id)
+        else:
+            level = len(self.coefficient_modulus) - 2  # first data level
+        # each remaining prime of the chain holds one 64 bit word per coeff
+        size = self.poly_modulus_degree * (level + 1) * 8
+        self.cache.set_plaintext(key, plaintext, size)
+        return plaintext
+
+    def _plaintext_key(self, data, parms_id=None):
+        """Get hashable identity of data encoded at parms_id's level."""
+        level = (
+            self.context.get_context_data(parms_id).chain_index()
+            if parms_id is not None
+            else None
+        )
+        if np.ndim(data) == 0:
+            # scalars are encoded into every slot, unlike length 1 vectors
+            content = ("scalar", float(data))
+        else:
+            array = np.ascontiguousarray(data, dtype=np.float64)
+            digest = hashlib.blake2b(array.tobytes(), digest_size=16).digest()
+            content = ("vector", array.size, digest)
+        return (content, self.scale, level)
+
+    def _encode(self, data):
+        """Encode data as a new plaintext on the first level."""
         plaintext = seal.Plaintext()
         if isinstance(data, np.ndarray):
             data = data.tolist()
@@ -432,14 +786,48 @@ class ReSeal(object):
             plaintext = self.encoder.encode(vector, self.scale)
         return plaintext
 
+    def _new_key_lineage(self, attr, key):
+        """Forget our key identity if a different key replaces an existing one.
+
+        This stops the shared cache of the old keys, E.G their encryptor, from
+        being used with the new keys.
+        """
+        current = self.__dict__.get(attr)
+        if current is not None and current is not key:
+            self.__dict__.pop("_key_id", None)
+            cache = self.__dict__.get("_cache")
+            if cache is not None and cache.enabled:
+                del self._cache
+
+    @property
+    def fingerprint(self):
+        """Hashable identity of these parameters and keys to share caches by.
+
+        Key identity is a token generated once, then shared by every object
+        derived from this one, E.G through duplicate, and serialisation.
+        """
+        if self.__dict__.get("_key_id") is None:
+            self._key_id = uuid.uuid4().hex
+        scheme = self.__dict__.get("_scheme")
+        return (
+            int(scheme) if scheme is not None else None,
+            self.__dict__.get("_poly_modulus_degree"),
+            tuple(self.__dict__.get("_coefficient_modulus") or ()),
+            self._key_id,
+        )
+
     @property
     def cache(self):
-        """ReCache object to store intermediaries so they arent regenerated."""
-        if self.__dict__.get("_cache"):
-            return self._cache
-        else:
-            self._cache = ReCache()
-            return self.cache
+        """ReCache object to store intermediaries so they arent regenerated.
+
+        Unless caching was disabled this is the process wide cache shared by
+        all ReSeal objects with the same fingerprint.
+        """
+        cache = self.__dict__.get("_cache")
+        if cache is None:
+            cache = ReCache.shared(self.fingerprint)
+            self._cache = cache
+        return cache
 
     # # # basic primitive building blocks (scheme, poly-mod, coeff)
     # {
@@ -570,6 +958,7 @@ class ReSeal(object):
 
     @public_key.setter
     def public_key(self, key):
+        self._new_key_lineage("_public_key", key)
         self._public_key = key
 
     @property
@@ -589,6 +978,7 @@ class ReSeal(object):
 
     @private_key.setter
     def private_key(self, key):
+        self._new_key_lineage("_private_key", key)
         self._private_key = key
 
     @property
@@ -608,8 +998,71 @@ class ReSeal(object):
 
     @relin_keys.setter
     def relin_keys(self, key):
+        self._new_key_lineage("_relin_keys", key)
         self._relin_keys = key
 
+    @property
+    def galois_keys(self):
+        """Galois keys to rotate cyphertext slots. (cached)
+
+        Shared through the cache with every object using the same keys so
+        they are only generated once. If no rotations have been required yet
+        SEALs default power of 2 keys (able to make any rotation) are
+        generated from the private key.
+        """
+        self._sync_galois_keys()
+        if self.__dict__.get("_galois_keys"):
+            return self._galois_keys
+        keygen = seal.KeyGenerator(self.context, self.private_key)
+        self.galois_steps = None
+        self.galois_keys = keygen.create_galois_keys()
+        return self.galois_keys
+
+    @galois_keys.setter
+    def galois_keys(self, key):
+        self._galois_keys = key
+        self.cache.galois_keys = key
+
+    @property
+    def galois_steps(self):
+        """Rotation steps covered by galois keys, None if any/ unknown."""
+        return self.__dict__.get("_galois_steps")
+
+    @galois_steps.setter
+    def galois_steps(self, steps):
+        self._galois_steps = steps
+        self.cache.galois_steps = steps
+
+    def _sync_galois_keys(self):
+        """Adopt galois keys another object of the same keys generated."""
+        cached = self.cache.galois_keys
+        if cached is not None and cached is not self.__dict__.get("_galois_keys"):
+            self._galois_keys = cached
+            self._galois_steps = self.cache.galois_steps
+
+    def require_rotations(self, steps):
+        """Ensure galois keys exist for all of the given rotation steps.
+
+        Galois keys are large and slow to generate, so only the steps actually
+        required are generated, on demand. Keys covering any new steps are
+        regenerated for all steps required so far. Keys of unknown coverage,
+        E.G given to us or SEALs defaults, are trusted to cover all steps.
+
+        :arg steps: rotation steps to be made avaliable
+        :type steps: list(int)
+        """
+        self._sync_galois_keys()
+        steps = {int(i) for i in steps} - {0}
+        if self.__dict__.get("_galois_keys") is not None:
+            if self.galois_steps is None or steps <= set(self.galois_steps):
+                return
+        elif not steps:
+            return
+        required = sorted(steps | set(self.galois_steps or ()))
+        keygen = seal.KeyGenerator(self.context, self.private_key)
+        self.galois_steps = required
+        self.galois_keys = keygen.create_galois_keys(required)
+
     # # # workers (encryptor, decryptor, encoder, evaluator)
     @property
     def encoder(self):
@@ -651,18 +1104,23 @@ class ReSeal(object):
     # # # ciphertext
     @property
     def ciphertext(self):
-        """seal.Ciphertext cyphertext object storing encrypted message/data."""
+        """seal.Ciphertext cyphertext object storing encrypted message/data.
+
+        Pending lazy arithmetic is computed on access.
+        """
+        self._materialise()
         return self._ciphertext
 
     @ciphertext.setter
     def ciphertext(self, data):
+        self.__dict__.pop("_expression", None)
         if isinstance(data, seal.Ciphertext):
             self._ciphertext = data
         elif isinstance(data, ReSeal):
             # compatibility so old setter "r.ciphertext = r + 2" still works
             self.ciphertext = data.ciphertext
         else:
-            plaintext = self._to_plaintext(data)
+            plaintext = self._encode(data)
             ciphertext = seal.Ciphertext()
             ciphertext = self.encryptor.encrypt(plaintext)
             self._ciphertext = ciphertext
@@ -672,7 +1130,7 @@ class ReSeal(object):
     def plaintext(self):
         """Polynomial plaintext encoded from complex values."""
         seal_plaintext = seal.Plaintext()
-        self.decryptor.decrypt(self._ciphertext, seal_plaintext)
+        self.decryptor.decrypt(self.ciphertext, seal_plaintext)
         vector_plaintext = self.encoder.decode(seal_plaintext)
         return np.array(vector_plaintext)
 
@@ -3,6 +3,7 @@
 # @Last modified by:   archer
 # @Last modified time: 2021-08-23T15:25:12+01:00
 
+import json
 import time
 import unittest
 
@@ -11,7 +12,7 @@ import seal
 
 # backward compatibility
 from fhez.recache import ReCache
-from fhez.rescheme import ReScheme
+from fhez.rescheme import ReScheme, ReBytesScheme
 from fhez.reseal import ReSeal
 
 
@@ -209,12 +210,195 @@ class ReSeal_tests(unittest.TestCase):
         r = self.gen_reseal(defaults)
         self.assertIsInstance(r.cache, ReCache)
 
+    def test_cache_shared(self):
+        defaults = self.defaults_ckks()
+        r = self.gen_reseal(defaults)
+        r.ciphertext = np.array([1, 2, 3])
+        result = r + r
+        # results of arithmetic should reuse the same context and workers
+        self.assertIs(result.cache, r.cache)
+        self.assertIs(result.evaluator, r.evaluator)
+        # so should objects rebuilt from the serialised state
+        r2 = ReSeal()
+        r2.__setstate__(r.__getstate__())
+        self.assertIs(r2.cache, r.cache)
+
+    def test_cache_shared_distinct_keys(self):
+        defaults = self.defaults_ckks()
+        r = self.gen_reseal(defaults)
+        r2 = self.gen_reseal(defaults)
+        r.ciphertext = np.array([1, 2, 3])
+        r2.ciphertext = np.array([1, 2, 3])
+        self.assertIsNot(r.cache, r2.cache)
+        self.assertNotEqual(r.fingerprint, r2.fingerprint)
+
+    def test_cache_disabled(self):
+        defaults = self.defaults_ckks()
+        r = ReSeal(
+            scheme=defaults["scheme"],
+            poly_modulus_degree=defaults["poly_mod_deg"],
+            coefficient_modulus=defaults["coeff_mod"],
+            scale=defaults["scale"],
+            cache=False,
+        )
+        self.assertFalse(r.cache.enabled)
+        self.assertIsNone(r.cache.context)
+
+    def test_rotate(self):
+        defaults = self.defaults_ckks()
+        r = self.gen_reseal(defaults)
+        data = np.array([1, 2, 3, 4])
+        r.ciphertext = data
+        rotated = r.rotate(1)
+        np.testing.assert_array_almost_equal(
+            rotated.plaintext[:3], data[1:], decimal=1, verbose=True
+        )
+        # only the rotation we asked for should have keys
+        self.assertEqual(r.galois_steps, [1])
+        self.assertIsInstance(r.galois_keys, seal.GaloisKeys)
+
+    def test_fold(self):
+        defaults = self.defaults_ckks()
+        r = self.gen_reseal(defaults)
+        data = np.arange(12)
+        r.ciphertext = data
+        for count, step in [(5, 1), (4, 3)]:
+            result = r.fold(count, step).plaintext
+            truth = np.sum(data[: count * step : step])
+            self.assertAlmostEqual(result[0], truth, places=1)
+        self.assertEqual(
+            set(r.galois_steps), set(ReSeal.fold_steps(5, 1) + ReSeal.fold_steps(4, 3))
+        )
+
+    def test_fold_steps(self):
+        self.assertEqual(ReSeal.fold_steps(1), [])
+        self.assertEqual(ReSeal.fold_steps(8, 2), [2, 4, 8])
+        self.assertEqual(ReSeal.fold_steps(5), [1, 2, 4])
+
+    def test_lazy_arithmetic(self):
+        defaults = self.defaults_ckks()
+        r = ReSeal(
+            scheme=defaults["scheme"],
+            poly_modulus_degree=defaults["poly_mod_deg"],
+            coefficient_modulus=defaults["coeff_mod"],
+            scale=defaults["scale"],
+            lazy=True,
+        )
+        data = np.array([1, 2, 3])
+        r.ciphertext = data
+        # sum of products, relinearised and rescaled once
+        result = (r * r) + (r * r) + (r * 2) + 1
+        self.assertIsInstance(result, ReSeal)
+        np.testing.assert_array_almost_equal(
+            result.plaintext[: data.shape[0]],
+            2 * data * data + 2 * data + 1,
+            decimal=1,
+            verbose=True,
+        )
+
+    def test_lazy_pickle(self):
+        import pickle
+
+        defaults = self.defaults_ckks()
+        r = self.gen_reseal(defaults)
+        r.lazy = True
+        data = np.array([1, 2, 3])
+        r.ciphertext = data
+        rp = pickle.loads(pickle.dumps(r * r + r))
+        self.assertTrue(rp.lazy)
+        np.testing.assert_array_almost_equal(
+            rp.plaintext[: data.shape[0]], data * data + data, decimal=1, verbose=True
+        )
+
+    def test_plaintext_cache(self):
+        defaults = self.defaults_ckks()
+        r = self.gen_reseal(defaults)
+        r.ciphertext = np.array([1, 2, 3])
+        weights = np.array([0.5, 0.25, 2])
+        r.cache.clear_plaintexts()
+        first = r * weights
+        self.assertEqual((r.cache.plaintext_hits, r.cache.plaintext_misses), (0, 1))
+        second = r * weights
+        self.assertEqual((r.cache.plaintext_hits, r.cache.plaintext_misses), (1, 1))
+        np.testing.assert_array_almost_equal(
+            first.plaintext[:3], second.plaintext[:3], decimal=3, verbose=True
+        )
+        # scalars fill every slot so must not share a length 1 vectors entry
+        np.testing.assert_array_almost_equal(
+            (r * 2).plaintext[:3], [2, 4, 6], decimal=1, verbose=True
+        )
+        np.testing.assert_array_almost_equal(
+            (r * np.array([2])).plaintext[:3], [2, 0, 0], decimal=1, verbose=True
+        )
+
+    def test_plaintext_cache_memory(self):
+        cache = ReCache(plaintext_memory=100)
+        cache.set_plaintext("a", "plaintext a", 60)
+        cache.set_plaintext("b", "plaintext b", 60)
+        self.assertIsNone(cache.get_plaintext("a"))
+        self.assertEqual(cache.get_plaintext("b"), "plaintext b")
+        self.assertEqual(cache.plaintext_bytes, 60)
+
     def test_validity(self):
         defaults = self.defaults_ckks()
         r = self.gen_reseal(defaults)
         r.ciphertext = np.array([1, 2, 3])
         ReScheme().validate(r.__getstate__())
 
+    def test_serialise_bytes(self):
+        defaults = self.defaults_ckks()
+        r = ReSeal(
+            scheme=defaults["scheme"],
+            poly_modulus_degree=defaults["poly_mod_deg"],
+            coefficient_modulus=defaults["coeff_mod"],
+            scale=defaults["scale"],
+            encoding="bytes",
+        )
+        data = np.array([1, 2, 3])
+        r.ciphertext = data
+        d = r.__getstate__()
+        self.assertIsInstance(d["_ciphertext"]["file_bytes"], bytes)
+        self.assertEqual(ReBytesScheme().validate(d), {})
+        r2 = ReSeal()
+        r2.__setstate__(d)
+        np.testing.assert_array_almost_equal(
+            r2.plaintext[: data.shape[0]], data, decimal=1, verbose=True
+        )
+
+    def test_serialise_hex(self):
+        defaults = self.defaults_ckks()
+        r = self.gen_reseal(defaults)
+        data = np.array([1, 2, 3])
+        r.ciphertext = data
+        d = r.__getstate__()
+        # hexadecimal strings by default so states stay json friendly
+        self.assertIsInstance(d["_ciphertext"]["file_contents"], str)
+        self.assertEqual(ReScheme().validate(d), {})
+        json.dumps(d)
+        r2 = ReSeal()
+        r2.__setstate__(d)
+        np.testing.assert_array_almost_equal(
+            r2.plaintext[: data.shape[0]], data, decimal=1, verbose=True
+        )
+
+    def test_serialise_compressed(self):
+        defaults = self.defaults_ckks()
+        r = ReSeal(
+            scheme=defaults["scheme"],
+            poly_modulus_degree=defaults["poly_mod_deg"],
+            coefficient_modulus=defaults["coeff_mod"],
+            scale=defaults["scale"],
+            compression="zlib",
+        )
+        data = np.array([1, 2, 3])
+        r.ciphertext = data
+        d = r.__getstate__()
+        r2 = ReSeal()
+        r2.__setstate__(d)
+        np.testing.assert_array_almost_equal(
+            r2.plaintext[: data.shape[0]], data, decimal=1, verbose=True
+        )
+
     def test_len(self):
         defaults = self.defaults_ckks()
         r = self.gen_reseal(defaults)